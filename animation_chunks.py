@@ -0,0 +1,96 @@
+"""
+アニメーションデータの年ごとのチャンク。
+
+output/animation_data.json（マニフェスト、毎晩書き直す）が年ごとのチャンク
+output/animation_chunks/<年>-<ハッシュ>.json を並べ、チャンクがその年の日付・地点データ
+（<年>-points-<ハッシュ>.bin、animation_points.py）・害虫ごとの帯ポリゴン（<年>-<害虫ID>-<ハッシュ>.json、
+contour_vectors.py）・フレーム PNG の版を持つ。ファイル名は内容の SHA-256 の先頭 12 桁を含み、
+一度書いたファイルは変えない（内容が変われば別の名前になる）ので、ブラウザはチャンクをいつまでも
+キャッシュしてよく、毎晩取り直すのはマニフェストと今年のチャンクだけになる。
+
+マニフェストの "chunks": [{"year": 年, "frames": フレーム数, "file": "animation_chunks/..."}, ...]（古い年から順、
+フレーム番号は前のチャンクから続く）
+"""
+
+import os
+import json
+import hashlib
+
+from animation_points import encode_point_temps, points_header
+
+CHUNKS_DIR = 'animation_chunks'
+HASH_LENGTH = 12
+
+
+def write_immutable(output_dir, stem, data, suffix):
+    """data を output_dir/animation_chunks/<stem>-<ハッシュ><suffix> に書き（同じ内容のファイルがあれば書かない）、
+    output_dir からの相対パスを返す"""
+    name = f"{CHUNKS_DIR}/{stem}-{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{suffix}"
+    path = os.path.join(output_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return name
+
+
+def frame_version(key):
+    """manifest.json の frame_key からフレーム PNG の版（URL の ?v=）を作る。
+    前のフレームのコピー（copy:<key>）はコピー元と同じ版になる"""
+    return key[-HASH_LENGTH:] if key else ""
+
+
+def write_chunk(output_dir, year, dates, coords, temps, vectors=None, frame_versions=None):
+    """1 年分のチャンクを書き、マニフェストの "chunks" の 1 要素を返す。
+    dates: ['YYYY-MM-DD', ...]（F）、coords: [(lat, lon), ...]（N）、temps: (N, F) の積算温度（NaN は欠測）、
+    vectors: {害虫ID: ベクターファイルのバイト列}、frame_versions: {害虫ID: [フレーム PNG の版, ...]}"""
+    points_file = write_immutable(output_dir, f"{year}-points", encode_point_temps(coords, temps, {0}), '.bin')
+    chunk = {
+        "year": year,
+        "dates": list(dates),
+        "points": points_header(len(coords), len(dates), {0}, file=points_file),
+        "vectors": {pest_id: write_immutable(output_dir, f"{year}-{pest_id}", data, '.json')
+                    for pest_id, data in (vectors or {}).items()},
+        "frame_versions": frame_versions or {},
+    }
+    data = json.dumps(chunk, separators=(',', ':')).encode('utf-8')
+    return {"year": year, "frames": len(dates), "file": write_immutable(output_dir, str(year), data, '.json')}
+
+
+def load_chunk(output_dir, entry):
+    """マニフェストの "chunks" の要素が指すチャンクを読む"""
+    with open(os.path.join(output_dir, entry["file"]), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def referenced_files(output_dir, manifest):
+    """マニフェストから参照されるチャンクのファイル（output_dir からの相対パス）"""
+    files = set()
+    for entry in manifest.get("chunks", []):
+        files.add(entry["file"])
+        try:
+            chunk = load_chunk(output_dir, entry)
+        except (OSError, ValueError):
+            continue
+        files.add(chunk["points"]["file"])
+        files.update(chunk.get("vectors", {}).values())
+    return files
+
+
+def prune_chunks(output_dir, *manifests):
+    """どのマニフェストからも参照されないチャンクのファイル（.json / .bin）を消す。
+    直前のマニフェストも渡せば、更新前のページが読み込み中のファイルを 1 世代残せる。
+    残った圧縮版は python static_assets.py（Render のビルド）が消す"""
+    chunks_dir = os.path.join(output_dir, CHUNKS_DIR)
+    if not os.path.isdir(chunks_dir):
+        return 0
+    keep = set()
+    for manifest in manifests:
+        keep |= referenced_files(output_dir, manifest)
+    removed = 0
+    for name in os.listdir(chunks_dir):
+        if name.endswith(('.json', '.bin')) and f"{CHUNKS_DIR}/{name}" not in keep:
+            os.remove(os.path.join(chunks_dir, name))
+            removed += 1
+    return removed
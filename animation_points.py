@@ -0,0 +1,71 @@
+"""
+アニメーションの地点 × フレームの積算温度（0℃基準）のバイナリ形式。
+
+年ごとのチャンクの地点データ（animation_chunks.py、リトルエンディアン）:
+  float32 lat[N], float32 lon[N], uint16 値[N × F]（地点ごとに F フレーム分が連続）
+値は 0.1℃日単位に量子化し、時間方向に差分をとって zigzag 符号化する
+（restart_frames のフレーム＝各年の最初のフレームは差分ではなく値そのもの）。
+欠測は 0xFFFF で、差分の計算では直前の値を引き継ぐ（欠測の前後で差分が大きくならない）。
+地点数・フレーム数などはチャンクの "points" に入れる（points_header）。
+"""
+
+import numpy as np
+
+POINTS_SCALE = 0.1
+POINTS_VERSION = 1
+MISSING = 0xffff
+
+
+def points_header(count, frames, restart_frames, file=None):
+    """チャンクに入れるバイナリの説明（file は output/ からの相対パス）"""
+    return {
+        "file": file,
+        "version": POINTS_VERSION,
+        "count": count,
+        "frames": frames,
+        "scale": POINTS_SCALE,
+        "restart_frames": sorted(restart_frames),
+    }
+
+
+def encode_point_temps(coords, temps, restart_frames):
+    """coords: [(lat, lon), ...]（N）、temps: (N, F) の積算温度（NaN は欠測）→ バイト列"""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    temps = np.asarray(temps, dtype=np.float64).reshape(len(coords), -1)
+    missing = np.isnan(temps)
+    quantized = np.rint(np.nan_to_num(temps) / POINTS_SCALE).astype(np.int64)
+    restart = set(restart_frames) | {0}
+    # 欠測は直前の値（年の最初なら 0）を引き継いで差分をとる
+    filled = quantized.copy()
+    for f in range(temps.shape[1]):
+        previous = 0 if f in restart else filled[:, f - 1]
+        filled[:, f] = np.where(missing[:, f], previous, quantized[:, f])
+    deltas = np.diff(filled, axis=1, prepend=0)
+    deltas[:, sorted(restart)] = filled[:, sorted(restart)]
+    if deltas.size and np.abs(deltas).max() > 0x7fff:
+        raise ValueError(f"差分が uint16 に収まりません: {np.abs(deltas).max() * POINTS_SCALE:.1f}")
+    zigzag = np.where(deltas >= 0, deltas * 2, -deltas * 2 - 1)
+    zigzag[missing] = MISSING
+    return b''.join([
+        coords[:, 0].astype('<f4').tobytes(),
+        coords[:, 1].astype('<f4').tobytes(),
+        zigzag.astype('<u2').tobytes(),
+    ])
+
+
+def decode_point_temps(data, header):
+    """encode_point_temps の逆。戻り値: (coords (N, 2) float32, temps (N, F) float64、欠測は NaN)"""
+    count, frames = header["count"], header["frames"]
+    lat = np.frombuffer(data, dtype='<f4', count=count)
+    lon = np.frombuffer(data, dtype='<f4', count=count, offset=4 * count)
+    zigzag = np.frombuffer(data, dtype='<u2', count=count * frames, offset=8 * count)
+    zigzag = zigzag.astype(np.int64).reshape(count, frames)
+    missing = zigzag == MISSING
+    deltas = np.where(missing, 0, np.where(zigzag % 2 == 0, zigzag // 2, -(zigzag + 1) // 2))
+    quantized = np.empty_like(deltas)
+    bounds = sorted(set(header["restart_frames"]) | {0}) + [frames]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        quantized[:, start:end] = np.cumsum(deltas[:, start:end], axis=1)
+    temps = quantized * header["scale"]
+    temps[missing] = np.nan
+    return np.column_stack([lat, lon]), temps
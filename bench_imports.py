@@ -0,0 +1,116 @@
+"""
+起動時の import のベンチマークと予算。
+
+各対象の import を新しいインタープリタで `python -X importtime` つきで実行し、合計時間（中央値）と
+時間のかかったパッケージを表示する。合計が予算を超えるか、読み込んではいけないパッケージ
+（pandas・matplotlib など）を読み込んでいれば終了コード 1 を返す。
+  python bench_imports.py [--runs 5]
+
+対象:
+  web            app.py の先頭で import しているモジュール（app 自体は読み込み時に DB へ接続するので除く）
+  pipeline       fetch_and_update（matplotlib の描画プロセスは spawn でこれを読み直す）
+  render-worker  frame_renderer（描画プロセスが読み込む）
+"""
+
+import os
+import ast
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY = ('pandas', 'matplotlib', 'scipy', 'folium', 'contourpy')
+# 対象 → (合計時間の予算 ms, 読み込んではいけないパッケージ)
+BUDGETS = {
+    'web': (500, HEAVY),
+    'pipeline': (450, HEAVY),
+    'render-worker': (250, HEAVY),
+}
+
+
+def top_level_imports(path):
+    """モジュールの先頭（関数の外）で import しているモジュール名"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def targets():
+    return {
+        'web': top_level_imports(os.path.join(BASE_DIR, 'app.py')),
+        'pipeline': ['fetch_and_update'],
+        'render-worker': ['frame_renderer'],
+    }
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力 → (合計 µs, {トップレベルのパッケージ: 累積 µs})"""
+    total = 0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        cumulative = int(cumulative)
+        if depth == 0:
+            total += cumulative
+        package = name.strip().split('.')[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    return total, packages
+
+
+def measure(modules):
+    """modules を新しいインタープリタで import する。戻り値: (合計 µs, パッケージごとの µs, 読み込まれたモジュール)"""
+    code = f"import sys; import {', '.join(modules)}; print(' '.join(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=BASE_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    # 読み込み時にファイルを作るモジュールがあっても作業ツリーを汚さないよう、一時ディレクトリで実行する
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=env,
+                                capture_output=True, text=True, check=True)
+    total, packages = parse_importtime(result.stderr)
+    return total, packages, set(result.stdout.split())
+
+
+def check(name, runs=5):
+    """対象 name を runs 回計測する。戻り値: (合計 ms の中央値, 時間のかかったパッケージ, 予算違反のリスト)"""
+    budget_ms, forbidden = BUDGETS[name]
+    modules = targets()[name]
+    samples = [measure(modules) for _ in range(runs)]
+    total_ms = statistics.median(total for total, _, _ in samples) / 1000
+    packages = samples[-1][1]
+    loaded = samples[-1][2]
+    problems = [f"{name}: {package} を読み込んでいます" for package in forbidden if package in loaded]
+    if total_ms > budget_ms:
+        problems.append(f"{name}: {total_ms:.0f} ms（予算 {budget_ms} ms）")
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:5]
+    return total_ms, heaviest, problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    problems = []
+    for name in BUDGETS:
+        total_ms, heaviest, target_problems = check(name, args.runs)
+        problems += target_problems
+        top = ', '.join(f"{package} {us / 1000:.0f}" for package, us in heaviest)
+        print(f"{name:<14} {total_ms:7.0f} ms (budget {BUDGETS[name][0]} ms)  [{top}]")
+    for problem in problems:
+        print(f"NG {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
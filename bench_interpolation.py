@@ -0,0 +1,59 @@
+"""
+等値線用補間のベンチマーク: griddata（毎フレーム三角形分割）と GridInterpolator（1 回だけ構築）の比較。
+
+data/grid_points.csv の地点に乱数の積算温度を与え、frames 枚分の 200×200 補間を時間計測する。
+  python bench_interpolation.py [--frames 60]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import griddata
+
+from grid_interpolator import GridInterpolator, GRID_RESOLUTION
+
+
+def griddata_frame(lat, lon, values):
+    """従来の方法（linear → nearest で NaN 穴埋め）"""
+    step = complex(0, GRID_RESOLUTION)
+    grid_lat, grid_lon = np.mgrid[lat.min():lat.max():step, lon.min():lon.max():step]
+    grid = griddata((lat, lon), values, (grid_lat, grid_lon), method="linear")
+    nan_mask = np.isnan(grid)
+    if np.any(nan_mask):
+        grid[nan_mask] = griddata((lat, lon), values, (grid_lat, grid_lon), method="nearest")[nan_mask]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=60)
+    args = parser.parse_args()
+
+    grid_df = pd.read_csv('data/grid_points.csv')
+    lat = grid_df['lat'].to_numpy(dtype=float)
+    lon = grid_df['lon'].to_numpy(dtype=float)
+    rng = np.random.default_rng(0)
+    frames = [rng.uniform(0, 2000, len(lat)) for _ in range(args.frames)]
+
+    started = time.perf_counter()
+    expected = [griddata_frame(lat, lon, v) for v in frames]
+    before = (time.perf_counter() - started) / args.frames
+
+    started = time.perf_counter()
+    interpolator = GridInterpolator(lat, lon)
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    got = [interpolator(v) for v in frames]
+    after = (time.perf_counter() - started) / args.frames
+
+    max_diff = max(float(np.abs(e - g).max()) for e, g in zip(expected, got))
+    print(f"points={len(lat)}, grid={GRID_RESOLUTION}x{GRID_RESOLUTION}, frames={args.frames}")
+    print(f"griddata:          {before * 1000:8.2f} ms/frame")
+    print(f"GridInterpolator:  {after * 1000:8.2f} ms/frame (+ {build * 1000:.1f} ms build once)")
+    print(f"speedup:           {before / after:8.1f}x, max |diff| = {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
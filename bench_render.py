@@ -0,0 +1,69 @@
+"""
+フレーム描画のベンチマーク: matplotlib（contourf + contour + clabel + savefig）・raster（帯塗り PNG を直接書く）・
+vector（帯ポリゴンを量子化した JSON）の比較。
+
+data/grid_points.csv の地点に、南ほど高い積算温度（全閾値にかかる勾配＋乱数）を与えて平滑化した場を、
+pests.json の最初の害虫の閾値で描く。
+  python bench_render.py [--frames 20]
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from contour_vectors import band_regions, encode_regions, vector_transform
+from frame_renderer import field_grid, render_contour_frame, render_raster_frame
+from generate_animation_data import load_pests_from_json, pest_levels, smoothed_field
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    grid_df = pd.read_csv('data/grid_points.csv')
+    lat = grid_df['lat'].to_numpy(dtype=float)
+    lon = grid_df['lon'].to_numpy(dtype=float)
+    levels, colors = pest_levels(load_pests_from_json()[0])
+    rng = np.random.default_rng(0)
+    gradient = (lat.max() - lat) / (lat.max() - lat.min()) * levels[-2] * 1.2
+    fields = [smoothed_field(lat, lon, gradient + rng.normal(0, levels[-2] * 0.05, len(lat)))[2]
+              for _ in range(args.frames)]
+    bounds = (lat.min(), lat.max(), lon.min(), lon.max())
+    grid_lat, grid_lon = field_grid(bounds)
+    transform = vector_transform(bounds, grid_lat.shape[0])
+
+    def write_vector(field, path):
+        with open(path, 'w') as f:
+            json.dump(encode_regions(band_regions(grid_lat, grid_lon, field, levels), transform), f,
+                      separators=(',', ':'))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {}
+        for name, render in [
+            ('matplotlib', lambda field, path: render_contour_frame(grid_lat, grid_lon, field, levels, colors, path)),
+            ('raster', lambda field, path: render_raster_frame(field, levels, colors, path)),
+            ('vector', write_vector),
+        ]:
+            path = os.path.join(tmpdir, f'{name}.png')
+            started = time.perf_counter()
+            for field in fields:
+                render(field, path)
+            results[name] = ((time.perf_counter() - started) / args.frames, os.path.getsize(path))
+
+    print(f"frames={args.frames}, levels={levels}")
+    for name, (seconds, size) in results.items():
+        print(f"{name:<11} {seconds * 1000:8.1f} ms/frame, {size / 1024:6.1f} KB/frame")
+    for name in ('raster', 'vector'):
+        print(f"speedup ({name}): {results['matplotlib'][0] / results[name][0]:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
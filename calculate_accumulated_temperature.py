@@ -1,8 +1,11 @@
 import pandas as pd
 from datetime import datetime, date
+import time
+import argparse
 import logging
 from pathlib import Path
-from database import Database, get_connection
+from database import Database
+from gdd_store import load_base_temps
 import os
 from dotenv import load_dotenv
 import psycopg2.extras
@@ -11,18 +14,157 @@ import psycopg2.extras
 load_dotenv()
 
 # ログの設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('temperature_calculation.log'),
-        logging.StreamHandler()
-    ]
-)
+# 積算温度の基準日（この日付から積算を開始する）
+BASE_DATE = '2026-01-01'
 
-def calculate_accumulated_temperature_optimized():
-    """最適化された積算温度計算（データベース内で直接計算）"""
-    db = Database()
+
+def rebuild_accumulated_temperature(db, base_temps=None):
+    """積算温度と累積GDDストアを全期間作り直す（明示的な全再計算用）"""
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM accumulated_temperature')
+            cur.execute('DELETE FROM gdd_cumulative')
+            cur.execute('DELETE FROM temperature_revisions')
+        return update_accumulated_temperature(db, base_temps)
+
+
+def update_accumulated_temperature(db, base_temps=None):
+    """積算温度（基準日からの気温の合計）と基準温度ごとの累積GDDを差分更新する。
+
+    地点ごとに「最終日の翌日」と「temperature_revisions に記録された再計算開始日」の
+    早い方から計算し直し、その前日の累積値を引き継いで足し込む。
+    temperature_data は両テーブル分をまとめて 1 回だけ読み、全基準温度を同時に計算する。
+    pests.json から消えた基準温度の行は削除する。
+    戻り値: (accumulated_temperature の書き込み行数, gdd_cumulative の書き込み行数)
+    """
+    base_temps = base_temps if base_temps is not None else load_base_temps()
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'DELETE FROM gdd_cumulative WHERE NOT (base_temp = ANY(%s::double precision[]))',
+                (base_temps,)
+            )
+            cur.execute('''
+                WITH revisions AS (
+                    DELETE FROM temperature_revisions
+                    RETURNING latitude, longitude, from_date
+                ),
+                bases AS (
+                    SELECT unnest(%(bases)s::double precision[]) AS base_temp
+                ),
+                points AS (
+                    SELECT latitude, longitude FROM grid_points
+                    UNION
+                    SELECT latitude, longitude FROM revisions
+                ),
+                starts AS (
+                    SELECT
+                        p.latitude,
+                        p.longitude,
+                        GREATEST(%(base)s::date, COALESCE(LEAST(a.date::date + 1, r.from_date), %(base)s::date)) AS acc_start,
+                        LEAST(g.next_date, r.from_date) AS gdd_start
+                    FROM points p
+                    LEFT JOIN revisions r ON r.latitude = p.latitude AND r.longitude = p.longitude
+                    LEFT JOIN LATERAL (
+                        SELECT date FROM accumulated_temperature a
+                        WHERE a.latitude = p.latitude AND a.longitude = p.longitude
+                        ORDER BY date DESC LIMIT 1
+                    ) a ON true
+                    CROSS JOIN LATERAL (
+                        -- 基準温度のうち最も遅れているものに合わせる（未計算の基準温度があれば最初から）
+                        SELECT MIN(COALESCE(l.date + 1, '-infinity'::date)) AS next_date
+                        FROM bases b
+                        LEFT JOIN LATERAL (
+                            SELECT date FROM gdd_cumulative g
+                            WHERE g.latitude = p.latitude AND g.longitude = p.longitude AND g.base_temp = b.base_temp
+                            ORDER BY date DESC LIMIT 1
+                        ) l ON true
+                    ) g
+                ),
+                raw AS MATERIALIZED (
+                    SELECT t.date::date AS date, t.latitude, t.longitude, t.temperature
+                    FROM starts s
+                    JOIN temperature_data t
+                      ON t.latitude = s.latitude AND t.longitude = s.longitude
+                     AND t.date >= LEAST(s.acc_start, s.gdd_start)
+                    WHERE t.temperature > -900
+                ),
+                acc_carry AS (
+                    SELECT s.latitude, s.longitude, s.acc_start, COALESCE(c.accumulated_temp, 0) AS prev_acc
+                    FROM starts s
+                    LEFT JOIN LATERAL (
+                        SELECT accumulated_temp FROM accumulated_temperature a
+                        WHERE a.latitude = s.latitude AND a.longitude = s.longitude AND a.date < s.acc_start
+                        ORDER BY date DESC LIMIT 1
+                    ) c ON true
+                ),
+                acc_written AS (
+                    INSERT INTO accumulated_temperature (date, latitude, longitude, accumulated_temp, created_at)
+                    SELECT
+                        r.date,
+                        r.latitude,
+                        r.longitude,
+                        c.prev_acc + SUM(r.temperature) OVER (
+                            PARTITION BY r.latitude, r.longitude
+                            ORDER BY r.date
+                            ROWS UNBOUNDED PRECEDING
+                        ),
+                        NOW()
+                    FROM raw r
+                    JOIN acc_carry c ON c.latitude = r.latitude AND c.longitude = r.longitude
+                    WHERE r.date >= c.acc_start
+                    ON CONFLICT (date, latitude, longitude) DO UPDATE SET
+                        accumulated_temp = EXCLUDED.accumulated_temp,
+                        created_at = EXCLUDED.created_at
+                    WHERE accumulated_temperature.accumulated_temp IS DISTINCT FROM EXCLUDED.accumulated_temp
+                    RETURNING 1
+                ),
+                gdd_carry AS (
+                    SELECT s.latitude, s.longitude, b.base_temp, s.gdd_start,
+                           COALESCE(c.cum_gdd, 0) AS prev_cum, COALESCE(c.day_count, 0) AS prev_days
+                    FROM starts s
+                    CROSS JOIN bases b
+                    LEFT JOIN LATERAL (
+                        SELECT cum_gdd, day_count FROM gdd_cumulative g
+                        WHERE g.latitude = s.latitude AND g.longitude = s.longitude
+                          AND g.base_temp = b.base_temp AND g.date < s.gdd_start
+                        ORDER BY date DESC LIMIT 1
+                    ) c ON true
+                ),
+                gdd_written AS (
+                    INSERT INTO gdd_cumulative (latitude, longitude, base_temp, date, cum_gdd, day_count)
+                    SELECT
+                        r.latitude,
+                        r.longitude,
+                        c.base_temp,
+                        r.date,
+                        c.prev_cum + SUM(GREATEST(0, r.temperature - c.base_temp)) OVER w,
+                        c.prev_days + COUNT(*) OVER w
+                    FROM raw r
+                    JOIN gdd_carry c ON c.latitude = r.latitude AND c.longitude = r.longitude
+                    WHERE r.date >= c.gdd_start
+                    WINDOW w AS (PARTITION BY r.latitude, r.longitude, c.base_temp ORDER BY r.date ROWS UNBOUNDED PRECEDING)
+                    ON CONFLICT (latitude, longitude, base_temp, date) DO UPDATE SET
+                        cum_gdd = EXCLUDED.cum_gdd,
+                        day_count = EXCLUDED.day_count
+                    WHERE gdd_cumulative.cum_gdd IS DISTINCT FROM EXCLUDED.cum_gdd
+                       OR gdd_cumulative.day_count IS DISTINCT FROM EXCLUDED.day_count
+                    RETURNING 1
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM acc_written) AS acc_rows,
+                    (SELECT COUNT(*) FROM gdd_written) AS gdd_rows
+            ''', {'base': BASE_DATE, 'bases': base_temps})
+            result = cur.fetchone()
+        conn.commit()
+    return result['acc_rows'], result['gdd_rows']
+
+
+def calculate_accumulated_temperature_optimized(full_rebuild=False, db=None):
+    """最適化された積算温度計算（データベース内で直接計算）。既定は差分更新。
+    積算温度と、pests.json の基準温度ごとの累積GDDストアを同じ走査で更新する。
+    戻り値: 書き込んだ行数（積算温度 + 累積GDD）"""
+    db = db or Database()
     try:
         logging.info("積算温度計算を開始します")
         
@@ -36,86 +178,25 @@ def calculate_accumulated_temperature_optimized():
         
         if not latest_temp_date:
             logging.warning("気温データが見つかりません")
-            return
-        
-        # 積算温度の基準日（この日付から積算を開始する）
-        BASE_DATE = '2026-01-01'
-        
-        # データベース内で直接積算温度を計算
-        logging.info("データベース内で積算温度を計算中...")
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                # 基準日より前のデータが存在する場合、または既存データがある場合の処理
-                if latest_accumulated_date:
-                    # 基準日より前のデータが含まれている場合は全クリアして再計算
-                    if isinstance(latest_accumulated_date, str):
-                        latest_date_str = latest_accumulated_date
-                    else:
-                        latest_date_str = latest_accumulated_date.strftime('%Y-%m-%d')
-                    
-                    if latest_date_str < BASE_DATE:
-                        cur.execute('DELETE FROM accumulated_temperature')
-                        logging.info(f"基準日({BASE_DATE})より前のデータを検出。全データをクリアして再計算します")
-                        start_date = BASE_DATE
-                    else:
-                        cur.execute('''
-                            DELETE FROM accumulated_temperature 
-                            WHERE date > %s::date
-                        ''', (latest_accumulated_date,))
-                        logging.info(f"最新の積算温度データ以降（{latest_accumulated_date}）のデータをクリアしました")
-                        start_date = latest_date_str
-                else:
-                    start_date = BASE_DATE
+            return 0
 
-                # データベース内で積算温度を計算して挿入
-                cur.execute('''
-                    INSERT INTO accumulated_temperature (date, latitude, longitude, accumulated_temp, created_at)
-                    WITH temp_ordered AS (
-                        SELECT 
-                            date::date,
-                            latitude::numeric,
-                            longitude::numeric,
-                            temperature::numeric,
-                            ROW_NUMBER() OVER (
-                                PARTITION BY latitude, longitude 
-                                ORDER BY date
-                            ) as rn
-                        FROM temperature_data
-                        WHERE date >= %s::date
-                        ORDER BY latitude, longitude, date
-                    ),
-                    temp_cumsum AS (
-                        SELECT 
-                            date,
-                            latitude,
-                            longitude,
-                            temperature,
-                            SUM(temperature) OVER (
-                                PARTITION BY latitude, longitude 
-                                ORDER BY date 
-                                ROWS UNBOUNDED PRECEDING
-                            ) as accumulated_temp
-                        FROM temp_ordered
-                    )
-                    SELECT 
-                        date,
-                        latitude,
-                        longitude,
-                        accumulated_temp::numeric,
-                        NOW() as created_at
-                    FROM temp_cumsum
-                    ON CONFLICT (date, latitude, longitude) DO UPDATE SET
-                        accumulated_temp = EXCLUDED.accumulated_temp,
-                        created_at = EXCLUDED.created_at
-                ''', (start_date,))
-                
-                # 挿入されたレコード数を取得
-                inserted_count = cur.rowcount
-                conn.commit()
-                
-                logging.info(f"積算温度計算完了: {inserted_count} レコードを処理しました")
+        # 基準日より前のデータが含まれている場合は全クリアして再計算
+        if latest_accumulated_date and str(latest_accumulated_date)[:10] < BASE_DATE:
+            logging.info(f"基準日({BASE_DATE})より前のデータを検出。全データをクリアして再計算します")
+            full_rebuild = True
+
+        started = time.perf_counter()
+        if full_rebuild:
+            logging.info("積算温度・累積GDDを全期間再計算中...")
+            acc_rows, gdd_rows = rebuild_accumulated_temperature(db)
+        else:
+            logging.info("積算温度・累積GDDを差分更新中...")
+            acc_rows, gdd_rows = update_accumulated_temperature(db)
+        logging.info(f"積算温度計算完了: 積算温度 {acc_rows} レコード, 累積GDD {gdd_rows} レコードを処理しました "
+                     f"({time.perf_counter() - started:.2f}秒)")
         
         logging.info("積算温度計算が完了しました")
+        return acc_rows + gdd_rows
         
     except Exception as e:
         logging.error(f"積算温度の計算中にエラーが発生しました: {str(e)}")
@@ -125,9 +206,21 @@ def calculate_accumulated_temperature_optimized():
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--full', action='store_true', help='積算温度・累積GDDを全期間再計算する')
+    args = parser.parse_args()
+
     logging.info("最適化された積算温度の計算を開始します")
-    calculate_accumulated_temperature_optimized()
+    calculate_accumulated_temperature_optimized(full_rebuild=args.full)
     logging.info("最適化された積算温度の計算が完了しました")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('temperature_calculation.log'),
+            logging.StreamHandler()
+        ]
+    )
+    main()
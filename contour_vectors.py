@@ -0,0 +1,142 @@
+"""
+等値線の帯をベクター（ポリゴン）で出力する。
+
+平滑化済みの場から、閾値ごとに「値が levels[k] 以上の領域」を contourpy で取り出し
+（k=0 は範囲全体）、Douglas-Peucker で間引いて、TopoJSON と同じ要領で量子化・差分符号化する。
+領域は入れ子なので、下の帯から順に不透明で重ね、レイヤー（ペイン）全体に透明度をかけて描く
+（隣り合う帯を別々に間引いても隙間や重なりが見えない）。
+
+ベクターファイル（害虫・年ごと、animation_chunks.py）:
+  {"transform": {"scale": [sx, sy], "translate": [west, south]},
+   "levels": [...], "colors": [帯ごとの色],
+   "frames": [[[帯番号, [ポリゴン, ...]], ...], ...]}
+  ポリゴンは環のリスト（先頭が外周、残りが穴）、環は [x0, y0, dx1, dy1, ...] の整数列
+  （経度 = translate[0] + x * scale[0]、緯度 = translate[1] + y * scale[1]。閉じる点は省略）。
+"""
+
+import json
+
+import numpy as np
+from contourpy import FillType, contour_generator
+
+from frame_renderer import fill_colors
+
+# 量子化の刻みと間引きの許容誤差（いずれも場の格子間隔に対する比）
+QUANTIZE_STEP = 0.1
+SIMPLIFY_TOLERANCE = 0.3
+
+
+def vector_transform(bounds, resolution):
+    """範囲 (south, north, west, east) の場に対する量子化の transform"""
+    south, north, west, east = (float(b) for b in bounds)
+    return {
+        "scale": [(east - west) / (resolution - 1) * QUANTIZE_STEP, (north - south) / (resolution - 1) * QUANTIZE_STEP],
+        "translate": [west, south],
+    }
+
+
+def simplify_ring(ring, tolerance):
+    """閉じた環（先頭と末尾が同じ点）を Douglas-Peucker で間引く。始点と始点から最も遠い点は残す"""
+    if len(ring) <= 4:
+        return ring
+    last = len(ring) - 1
+    far = int(np.argmax(((ring - ring[0]) ** 2).sum(axis=1)))
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[[0, far, last]] = True
+    stack = [(0, far), (far, last)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = ring[end] - ring[start]
+        offsets = ring[start + 1:end] - ring[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            distance = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distance = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            middle = start + 1 + i
+            keep[middle] = True
+            stack += [(start, middle), (middle, end)]
+    return ring[keep]
+
+
+def band_regions(grid_lat, grid_lon, grid_temp, levels):
+    """帯ごとの「値が levels[帯] 以上の領域」（帯 0 は範囲全体）。
+    戻り値: [(帯番号, [ポリゴン（環 (N, 2) の経度・緯度配列のリスト）, ...]), ...]"""
+    generator = contour_generator(x=grid_lon, y=grid_lat, z=grid_temp, fill_type=FillType.OuterOffset)
+    # 範囲外の値も両端の帯に入れる（contourf(extend='both') と同じ）
+    lowest = min(float(np.nanmin(grid_temp)), levels[0]) - 1
+    highest = max(float(np.nanmax(grid_temp)), levels[-1]) + 1
+    regions = []
+    for band in range(len(levels) - 1):
+        points, offsets = generator.filled(lowest if band == 0 else levels[band], highest)
+        polygons = [[polygon[start:end] for start, end in zip(offset[:-1], offset[1:])]
+                    for polygon, offset in zip(points, offsets)]
+        if polygons:
+            regions.append((band, polygons))
+    return regions
+
+
+def encode_ring(ring, transform, tolerance):
+    """環を間引いて量子化・差分符号化する（3 点未満になれば None）"""
+    scale = np.array(transform["scale"])
+    translate = np.array(transform["translate"])
+    ring = simplify_ring(ring, tolerance)
+    quantized = np.rint((ring - translate) / scale).astype(np.int64)
+    # 量子化で重なった連続点と閉じる点を除く
+    quantized = quantized[np.r_[True, (np.diff(quantized, axis=0) != 0).any(axis=1)]]
+    if len(quantized) > 1 and (quantized[0] == quantized[-1]).all():
+        quantized = quantized[:-1]
+    if len(quantized) < 3:
+        return None
+    deltas = np.vstack([quantized[:1], np.diff(quantized, axis=0)])
+    return deltas.ravel().tolist()
+
+
+def encode_regions(regions, transform, tolerance=None):
+    """band_regions の結果をベクターファイルの 1 フレーム分にする"""
+    if tolerance is None:
+        tolerance = max(transform["scale"]) / QUANTIZE_STEP * SIMPLIFY_TOLERANCE
+    frame = []
+    for band, polygons in regions:
+        encoded = []
+        for rings in polygons:
+            outer = encode_ring(rings[0], transform, tolerance)
+            if outer is None:
+                continue
+            holes = [encode_ring(ring, transform, tolerance) for ring in rings[1:]]
+            encoded.append([outer] + [hole for hole in holes if hole is not None])
+        if encoded:
+            frame.append([band, encoded])
+    return frame
+
+
+def encode_vector_file(frames, levels, colors, transform):
+    """ベクターファイルの内容（バイト列）"""
+    return json.dumps({
+        "transform": transform,
+        "levels": list(levels),
+        "colors": fill_colors(levels, colors),
+        "frames": frames,
+    }, separators=(',', ':')).encode('utf-8')
+
+
+def regions_to_geojson(regions, levels, colors, tolerance=0.02):
+    """band_regions の結果を GeoJSON の FeatureCollection にする（帯ごとに MultiPolygon、下の帯から順。
+    環は tolerance 度で間引き、座標は小数 4 桁に丸める）"""
+    band_colors = fill_colors(levels, colors)
+    features = []
+    for band, polygons in regions:
+        features.append({
+            "type": "Feature",
+            "properties": {"band": band, "level": levels[band], "color": band_colors[band]},
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [[np.round(simplify_ring(ring, tolerance), 4).tolist() for ring in rings]
+                                for rings in polygons],
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
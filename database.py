@@ -1,19 +1,60 @@
 from dotenv import load_dotenv
 load_dotenv()
+import io
 import os
+import itertools
+import time
 import psycopg2
+import psycopg2.pool
 from psycopg2.extras import RealDictCursor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-import pandas as pd
+import numpy as np
 import logging
 import threading
-import json
 from urllib.parse import parse_qs, urlparse, unquote
+from migrations import ensure_schema
 
-# ロガーの設定
-logging.basicConfig(level=logging.DEBUG)
+# ロガー（ログの設定は各エントリポイントが行う）
 logger = logging.getLogger(__name__)
 
+# 接続プールの設定（環境変数で上書き可能）
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))  # 空き接続待ちの上限（秒）
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.environ.get("DB_POOL_HEALTHCHECK_INTERVAL", "30"))  # この秒数以上アイドルなら SELECT 1 で確認
+DB_POOL_MAX_LIFETIME = float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800"))  # 接続の最大寿命（秒）
+DB_POOL_MAX_IDLE = float(os.environ.get("DB_POOL_MAX_IDLE", "300"))  # min を超えるアイドル接続を閉じるまでの秒数
+DB_STREAM_CHUNK_ROWS = int(os.environ.get("DB_STREAM_CHUNK_ROWS", "50000"))  # stream_columns が 1 回に取り出す行数
+
+# stream_columns のサーバーサイドカーソルの名前の通し番号
+_stream_ids = itertools.count(1)
+
+# stream_columns で読めるテーブル → ({列名: (SELECT する式, NumPy の dtype)}, テーブルの既定の条件)
+STREAM_TABLES = {
+    'temperature_data': ({
+        'date': ('t.date::date', 'datetime64[D]'),
+        'latitude': ('t.latitude', np.float64),
+        'longitude': ('t.longitude', np.float64),
+        'temperature': ('t.temperature', np.float64),
+        'source': ('t.source', object),
+    }, 't.temperature > -900'),
+    'accumulated_temperature': ({
+        'date': ('t.date::date', 'datetime64[D]'),
+        'latitude': ('t.latitude', np.float64),
+        'longitude': ('t.longitude', np.float64),
+        'accumulated_temp': ('t.accumulated_temp', np.float64),
+    }, None),
+    'gdd_cumulative': ({
+        'date': ('t.date', 'datetime64[D]'),
+        'latitude': ('t.latitude', np.float64),
+        'longitude': ('t.longitude', np.float64),
+        'base_temp': ('t.base_temp', np.float64),
+        'cum_gdd': ('t.cum_gdd', np.float64),
+        'day_count': ('t.day_count', np.int64),
+    }, None),
+}
+
 def get_connection():
     database_url = os.environ.get("DATABASE_URL")
     if not database_url:
@@ -42,6 +83,398 @@ def get_connection():
             cursor_factory=RealDictCursor,
         )
 
+class PoolTimeout(psycopg2.pool.PoolError):
+    """接続プールから制限時間内に接続を取得できなかった"""
+
+
+class ConnectionPool:
+    """スレッドセーフな PostgreSQL 接続プール
+
+    - 接続数は min～max の範囲に制限し、上限到達時は timeout 秒まで空きを待つ
+    - 同一スレッド内で入れ子に connection() を呼ぶと同じ接続を再利用する（dedicated=True を除く）
+    - 一定時間アイドルだった接続は貸し出し前に SELECT 1 でヘルスチェックする
+    - エラーで壊れた接続・寿命を超えた接続は返却時に破棄して作り直す
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL,
+                 max_lifetime=DB_POOL_MAX_LIFETIME, max_idle=DB_POOL_MAX_IDLE,
+                 connect=get_connection):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError(f"Invalid pool bounds: min={minconn}, max={maxconn}")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self._connect = connect
+        self._cond = threading.Condition(threading.Lock())
+        self._reset()
+
+    def _reset(self):
+        """プロセス単位の状態を初期化（fork 後は親の接続を引き継がない）"""
+        self._pid = os.getpid()
+        self._idle = []  # [(conn, created_at, last_used), ...]  末尾が最も新しい
+        self._born = {}  # id(conn) -> created_at
+        self._size = 0
+        self._warmed = False
+        self._local = threading.local()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'connect_failures': 0,
+            'healthcheck_failures': 0,
+            'discarded': 0,
+            'errors': 0,
+        }
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats['connect_failures'] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['connects'] += 1
+            self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _close(self, conn):
+        with self._cond:
+            self._born.pop(id(conn), None)
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _warm(self):
+        """初回利用時に min 本の接続を作成しておく"""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            count = max(0, self.minconn - self._size)
+            self._size += count
+        for _ in range(count):
+            try:
+                conn = self._open()
+            except Exception as e:
+                logger.warning(f"Pool warm-up connection failed: {e}")
+                continue
+            now = time.monotonic()
+            with self._cond:
+                self._idle.append((conn, now, now))
+                self._cond.notify()
+
+    def _healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        created = self._born.get(id(conn), 0.0)
+        now = time.monotonic()
+        if self.max_lifetime and now - created > self.max_lifetime:
+            return False
+        if now - last_used < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pool health check failed, recycling connection: {e}")
+            with self._cond:
+                self._stats['healthcheck_failures'] += 1
+            return False
+
+    def _checkout(self):
+        self._check_fork()
+        self._warm()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_start = None
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    if not waited:
+                        waited = True
+                        wait_start = time.monotonic()
+                        self._stats['waits'] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        self._stats['wait_time_total'] += time.monotonic() - wait_start
+                        raise PoolTimeout(f"No connection available within {self.timeout}s (max={self.maxconn})")
+                    self._cond.wait(remaining)
+                if waited:
+                    self._stats['wait_time_total'] += time.monotonic() - wait_start
+                    waited = False
+                if self._idle:
+                    conn, _, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._size += 1
+            if conn is None:
+                conn = self._open()
+            elif not self._healthy(conn, last_used):
+                self._close(conn)
+                continue
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return conn
+
+    def _checkin(self, conn, discard=False):
+        if self._pid != os.getpid():
+            return
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        created = self._born.get(id(conn), 0.0)
+        if discard or conn.closed or (self.max_lifetime and time.monotonic() - created > self.max_lifetime):
+            self._close(conn)
+            return
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            self._idle.append((conn, created, now))
+            # min 本を超えて長時間アイドルの接続は閉じる（古いものから）
+            while len(self._idle) > self.minconn and now - self._idle[0][2] > self.max_idle:
+                stale.append(self._idle.pop(0)[0])
+            self._cond.notify()
+        for old in stale:
+            self._close(old)
+
+    @contextmanager
+    def connection(self, dedicated=False):
+        """接続を借りて、正常終了時は commit、例外時は rollback してプールに返す。
+        dedicated=True なら同じスレッドが借りている接続とは別の接続を借り、入れ子の connection() とも共有しない
+        （返すまで接続を持ち続けるストリーミング読み出し用）"""
+        self._check_fork()
+        if dedicated:
+            with self._lease() as conn:
+                yield conn
+            return
+        local = self._local
+        if getattr(local, 'conn', None) is not None:
+            local.depth += 1
+            try:
+                yield local.conn
+            finally:
+                local.depth -= 1
+            return
+
+        with self._lease() as conn:
+            local.conn = conn
+            local.depth = 1
+            try:
+                yield conn
+            finally:
+                local.conn = None
+                local.depth = 0
+
+    @contextmanager
+    def _lease(self):
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except GeneratorExit:
+            # 呼び出し側がジェネレーター（stream_columns など）を途中で閉じただけなのでエラーに数えない。
+            # 読みかけのトランザクションは返却時に rollback する
+            raise
+        except BaseException as e:
+            with self._cond:
+                self._stats['errors'] += 1
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)) or conn.closed
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            raise
+        finally:
+            self._checkin(conn, discard=broken)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """監視用のプール統計（スナップショット）"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'min': self.minconn,
+                'max': self.maxconn,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+            })
+        stats['wait_time_total'] = round(stats['wait_time_total'], 3)
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """プロセス共通の接続プールを取得（初回呼び出し時に作成）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def pooled_connection():
+    """プールから接続を借りるコンテキストマネージャ（Database の初期化を伴わない）"""
+    return get_pool().connection()
+
+
+class TemperatureBulkLoader:
+    """気温データのストリーミング一括ロード
+
+    地点ごと（または複数地点）の DataFrame を受け取ってメモリに溜め、
+    flush_rows 件を超えるごとに COPY で一時ステージングテーブルへ流し込み、
+    1 本の INSERT ... ON CONFLICT で temperature_data へマージする。
+    値が変わった行（NASA POWER が直近日を改訂した場合）は上書きする。
+    追加・更新があった地点は temperature_revisions に「この日以降を再計算」として記録する。
+    """
+
+    def __init__(self, db, source='nasa_power', flush_rows=50000):
+        self.db = db
+        self.source = source
+        self.flush_rows = flush_rows
+        self._frames = []
+        self._pending = 0
+        self.rows_received = 0
+        self.rows_loaded = 0
+        self.rows_merged = 0
+        self.load_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def add_frame(self, df, latitude=None, longitude=None, date_col='date', temp_col='temp'):
+        """1地点分（latitude/longitude 指定）または lat/lon 列を持つ複数地点分の DataFrame を追加"""
+        import pandas as pd  # 取り込み時だけ使う（Web ワーカーの起動で読み込まない）
+
+        if df is None or df.empty:
+            return 0
+        frame = pd.DataFrame({
+            'date': pd.to_datetime(df[date_col]).dt.strftime('%Y-%m-%d'),
+            'latitude': latitude if latitude is not None else df['lat'],
+            'longitude': longitude if longitude is not None else df['lon'],
+            'temperature': df[temp_col].astype(float),
+        })
+        # NASA POWER の欠測値（-999）は保存しない
+        frame = frame[frame['temperature'] > -900]
+        self.rows_received += len(frame)
+        if frame.empty:
+            return 0
+        self._frames.append(frame)
+        self._pending += len(frame)
+        if self._pending >= self.flush_rows:
+            self.flush()
+        return len(frame)
+
+    def flush(self):
+        """溜まった行を COPY + マージで書き込む"""
+        if not self._frames:
+            return 0
+        import pandas as pd
+
+        batch = pd.concat(self._frames, ignore_index=True)
+        self._frames = []
+        self._pending = 0
+        batch['source'] = self.source
+        buf = io.StringIO()
+        batch.to_csv(buf, header=False, index=False)
+        buf.seek(0)
+
+        started = time.perf_counter()
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    CREATE TEMP TABLE temperature_staging (
+                        date DATE NOT NULL,
+                        latitude DOUBLE PRECISION NOT NULL,
+                        longitude DOUBLE PRECISION NOT NULL,
+                        temperature DOUBLE PRECISION NOT NULL,
+                        source TEXT NOT NULL
+                    ) ON COMMIT DROP
+                ''')
+                cur.copy_expert(
+                    'COPY temperature_staging (date, latitude, longitude, temperature, source) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buf
+                )
+                # 追加・更新した行の地点ごとの最も古い日付を temperature_revisions に記録し、
+                # 積算温度の差分更新がそこから再計算できるようにする
+                cur.execute('''
+                    WITH merged AS (
+                        INSERT INTO temperature_data (date, latitude, longitude, temperature, source)
+                        SELECT DISTINCT ON (date, latitude, longitude)
+                            date, latitude, longitude, temperature, source
+                        FROM temperature_staging
+                        ORDER BY date, latitude, longitude
+                        ON CONFLICT (date, latitude, longitude) DO UPDATE SET
+                            temperature = EXCLUDED.temperature,
+                            source = EXCLUDED.source
+                        WHERE temperature_data.temperature IS DISTINCT FROM EXCLUDED.temperature
+                        RETURNING date, latitude, longitude
+                    ),
+                    marked AS (
+                        INSERT INTO temperature_revisions (latitude, longitude, from_date)
+                        SELECT latitude, longitude, MIN(date)::date
+                        FROM merged
+                        GROUP BY latitude, longitude
+                        ON CONFLICT (latitude, longitude) DO UPDATE SET
+                            from_date = LEAST(temperature_revisions.from_date, EXCLUDED.from_date)
+                    )
+                    SELECT COUNT(*) AS merged FROM merged
+                ''')
+                merged = cur.fetchone()['merged']
+            conn.commit()
+        elapsed = time.perf_counter() - started
+        self.load_seconds += elapsed
+        self.rows_loaded += len(batch)
+        self.rows_merged += merged
+        logger.info(f"Bulk loaded {len(batch)} temperature rows ({merged} inserted/updated) in {elapsed:.2f}s")
+        return merged
+
+    @property
+    def rows_per_second(self):
+        return self.rows_loaded / self.load_seconds if self.load_seconds > 0 else 0.0
+
+
 class Database:
     _instance = None
     _lock = threading.Lock()
@@ -58,61 +491,22 @@ class Database:
             self.initialized = True
             self._initialize_database()
 
+    def connection(self, dedicated=False):
+        """共有接続プールから接続を借りる（dedicated は ConnectionPool.connection と同じ）"""
+        return get_pool().connection(dedicated=dedicated)
+
+    def pool_stats(self):
+        """接続プールの統計（checkouts, waits, failures など）"""
+        return get_pool().stats()
+
     def _initialize_database(self):
+        """スキーマの版と害虫カタログを確認する（通常は schema_state を 1 回読むだけ。
+        変わっていれば migrations.py のマイグレーションと害虫の同期を実行する）"""
         try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    # temperature_data テーブル
-                    cur.execute('''
-                    CREATE TABLE IF NOT EXISTS temperature_data (
-                        id SERIAL PRIMARY KEY,
-                        date TIMESTAMP NOT NULL,
-                        latitude DOUBLE PRECISION NOT NULL,
-                        longitude DOUBLE PRECISION NOT NULL,
-                        temperature DOUBLE PRECISION NOT NULL,
-                        source TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(date, latitude, longitude)
-                    )
-                    ''')
-                    # 複合インデックス追加
-                    cur.execute('''
-                    CREATE INDEX IF NOT EXISTS idx_temp_lat_lon_date ON temperature_data (latitude, longitude, date)
-                    ''')
-                    # grid_points テーブル
-                    cur.execute('''
-                    CREATE TABLE IF NOT EXISTS grid_points (
-                        id SERIAL PRIMARY KEY,
-                        latitude DOUBLE PRECISION NOT NULL,
-                        longitude DOUBLE PRECISION NOT NULL,
-                        region_name TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(latitude, longitude)
-                    )
-                    ''')
-                    # pests テーブル（nameにUNIQUE制約で重複防止）
-                    cur.execute('''
-                    CREATE TABLE IF NOT EXISTS pests (
-                        id SERIAL PRIMARY KEY,
-                        name TEXT NOT NULL UNIQUE,
-                        threshold_temp DOUBLE PRECISION NOT NULL,
-                        description TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                    ''')
-                    # accumulated_temperature テーブル
-                    cur.execute('''
-                    CREATE TABLE IF NOT EXISTS accumulated_temperature (
-                        date TIMESTAMP NOT NULL,
-                        latitude DOUBLE PRECISION NOT NULL,
-                        longitude DOUBLE PRECISION NOT NULL,
-                        accumulated_temp DOUBLE PRECISION NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        PRIMARY KEY (date, latitude, longitude)
-                    )
-                    ''')
-                    conn.commit()
-            self.initialize_pest_data()
+            with self.connection() as conn:
+                applied = ensure_schema(conn)
+            if applied:
+                logger.info(f"Database schema updated: {applied}")
         except Exception as e:
             logger.error(f"Error initializing database: {str(e)}")
             raise
@@ -120,7 +514,7 @@ class Database:
     def insert_temperature_data(self, timestamp, latitude, longitude, temperature, source):
         try:
             logger.debug(f"Inserting temperature data: date={timestamp}, lat={latitude}, lon={longitude}, temp={temperature}, source={source}")
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
                         INSERT INTO temperature_data (date, latitude, longitude, temperature, source)
@@ -139,7 +533,7 @@ class Database:
     def insert_grid_point(self, latitude, longitude, region_name=None):
         try:
             logger.debug(f"Inserting grid point: lat={latitude}, lon={longitude}, region={region_name}")
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
                         INSERT INTO grid_points (latitude, longitude, region_name)
@@ -159,7 +553,7 @@ class Database:
         """グリッドポイントをバルクインサート"""
         try:
             logger.info(f"Bulk inserting {len(grid_data)} grid points")
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     # psycopg2.extras.execute_valuesを使用してバルクインサート
                     from psycopg2.extras import execute_values
@@ -191,7 +585,7 @@ class Database:
         """気温データをバルクインサート"""
         try:
             logger.info(f"Bulk inserting {len(temperature_data)} temperature records")
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     # psycopg2.extras.execute_valuesを使用してバルクインサート
                     from psycopg2.extras import execute_values
@@ -217,70 +611,13 @@ class Database:
             logger.error(f"Traceback: {traceback.format_exc()}")
             raise
 
-    def initialize_pest_data(self):
-        try:
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    # まず重複があれば除去（UNIQUE制約追加前の既存データ対応）
-                    cur.execute('''
-                        DELETE FROM pests
-                        WHERE id NOT IN (
-                            SELECT MIN(id) FROM pests GROUP BY name
-                        )
-                    ''')
-                    deleted = cur.rowcount
-                    if deleted > 0:
-                        logger.info(f"Removed {deleted} duplicate pest rows")
-                    
-                    # UNIQUE制約がまだなければ追加
-                    cur.execute('''
-                        SELECT COUNT(*) AS cnt FROM information_schema.table_constraints
-                        WHERE table_name = 'pests' AND constraint_type = 'UNIQUE'
-                    ''')
-                    if cur.fetchone()['cnt'] == 0:
-                        cur.execute('ALTER TABLE pests ADD CONSTRAINT pests_name_unique UNIQUE (name)')
-                        logger.info("Added UNIQUE constraint on pests.name")
-                    
-                    conn.commit()
-
-                    # pests.jsonからデータを読み込み（ON CONFLICT で重複を無視）
-                    script_dir = os.path.dirname(os.path.abspath(__file__))
-                    pests_file = os.path.join(script_dir, 'data', 'pests.json')
-                    if os.path.exists(pests_file):
-                        with open(pests_file, 'r', encoding='utf-8') as f:
-                            pests_data = json.load(f)
-                        for pest in pests_data['pests']:
-                            cur.execute('''
-                                INSERT INTO pests (name, threshold_temp, description)
-                                VALUES (%s, %s, %s)
-                                ON CONFLICT (name) DO NOTHING
-                            ''', (pest['name'], pest['base_temp'], pest['description']))
-                    else:
-                        logger.warning(f"pests.json not found at {pests_file}, using default data")
-                        initial_pests = [
-                            ('シバツトガ', 10.0, '芝生の主要な害虫。発育開始温度は10℃。'),
-                            ('コガネムシ', 12.0, '芝生の根を食害する害虫。発育開始温度は12℃。'),
-                            ('スジキリヨトウ', 11.0, '芝生の葉を食害する害虫。発育開始温度は11℃。')
-                        ]
-                        for pest in initial_pests:
-                            cur.execute('''
-                                INSERT INTO pests (name, threshold_temp, description)
-                                VALUES (%s, %s, %s)
-                                ON CONFLICT (name) DO NOTHING
-                            ''', pest)
-                    conn.commit()
-
-                    # 登録された害虫の確認
-                    cur.execute('SELECT id, name FROM pests ORDER BY id')
-                    registered_pests = cur.fetchall()
-                    logger.debug(f"Pests in DB: {[(p['id'], p['name']) for p in registered_pests]}")
-        except Exception as e:
-            logger.error(f"Error initializing pest data: {str(e)}")
-            raise
+    def temperature_loader(self, source='nasa_power', flush_rows=50000):
+        """COPY ベースの一括ロード用ローダーを作成（with 文の終了時に flush）"""
+        return TemperatureBulkLoader(self, source=source, flush_rows=flush_rows)
 
     def get_pests(self):
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('SELECT * FROM pests ORDER BY name')
                     pests = cur.fetchall()
@@ -292,7 +629,7 @@ class Database:
 
     def get_pest_by_name(self, name):
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('SELECT * FROM pests WHERE name = %s', (name,))
                     pest = cur.fetchone()
@@ -301,24 +638,83 @@ class Database:
             logger.error(f"Error fetching pest by name: {str(e)}")
             raise
 
-    def get_temperature_data_by_location(self, latitude, longitude, tolerance=0.01):
+    def get_temperature_matrix_for_points(self, points, start_date, end_date):
+        """複数のグリッド地点の指定期間の日次気温を 地点 × 日 の配列で取得（欠測は NaN）。
+        行は points の順、列は start_date からの日数。地点ごとにインデックスのキー一致で引き、
+        行オブジェクトを作らないよう (地点番号, 日数, 気温) のタプルで受け取る"""
+        n_days = (end_date - start_date).days + 1
+        matrix = np.full((len(points), max(n_days, 0)), np.nan)
+        if not points or n_days <= 0:
+            return matrix
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute('''
+                        SELECT p.i - 1, t.date::date - %s::date, t.temperature
+                        FROM unnest(%s::double precision[], %s::double precision[])
+                             WITH ORDINALITY AS p(latitude, longitude, i)
+                        JOIN temperature_data t
+                          ON t.latitude = p.latitude AND t.longitude = p.longitude
+                         AND t.date >= %s::date AND t.date < %s::date + 1
+                        WHERE t.temperature > -900
+                    ''', (start_date, [float(p[0]) for p in points], [float(p[1]) for p in points],
+                          start_date, end_date))
+                    rows = cur.fetchall()
+        except Exception as e:
+            logger.error(f"Error fetching temperature matrix for points: {str(e)}")
+            raise
+        if rows:
+            values = np.array(rows, dtype=float)
+            matrix[values[:, 0].astype(int), values[:, 1].astype(int)] = values[:, 2]
+        return matrix
+
+    def get_cumulative_gdd_many(self, queries):
+        """累積GDDストアを一括参照する。queries: [(lat, lon, base_temp, start_date, end_date), ...]
+        戻り値は queries と同じ順の (GDD, 有効日数) または None のリスト"""
+        if not queries:
+            return []
+        try:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
-                        SELECT date, temperature
-                        FROM temperature_data
-                        WHERE ABS(latitude::numeric - %s::numeric) <= %s::numeric AND ABS(longitude::numeric - %s::numeric) <= %s::numeric
-                        ORDER BY date
-                    ''', (latitude, tolerance, longitude, tolerance))
-                    return cur.fetchall()
+                        SELECT q.i, e.cum_gdd AS end_cum, e.day_count AS end_days,
+                               s.cum_gdd AS start_cum, s.day_count AS start_days
+                        FROM unnest(%s::int[], %s::double precision[], %s::double precision[],
+                                    %s::double precision[], %s::date[], %s::date[])
+                             AS q(i, latitude, longitude, base_temp, start_date, end_date)
+                        JOIN LATERAL (
+                            SELECT cum_gdd, day_count FROM gdd_cumulative g
+                            WHERE g.latitude = q.latitude AND g.longitude = q.longitude
+                              AND g.base_temp = q.base_temp AND g.date <= q.end_date
+                            ORDER BY g.date DESC LIMIT 1
+                        ) e ON true
+                        LEFT JOIN LATERAL (
+                            SELECT cum_gdd, day_count FROM gdd_cumulative g
+                            WHERE g.latitude = q.latitude AND g.longitude = q.longitude
+                              AND g.base_temp = q.base_temp AND g.date < q.start_date
+                            ORDER BY g.date DESC LIMIT 1
+                        ) s ON true
+                    ''', (
+                        list(range(len(queries))),
+                        [float(q[0]) for q in queries],
+                        [float(q[1]) for q in queries],
+                        [float(q[2]) for q in queries],
+                        [q[3] for q in queries],
+                        [q[4] for q in queries],
+                    ))
+                    results = [None] * len(queries)
+                    for row in cur.fetchall():
+                        gdd = row['end_cum'] - (row['start_cum'] or 0.0)
+                        days = row['end_days'] - (row['start_days'] or 0)
+                        results[row['i']] = (gdd, days)
+                    return results
         except Exception as e:
-            logger.error(f"Error fetching temperature data by location: {str(e)}")
+            logger.error(f"Error fetching cumulative GDD: {str(e)}")
             raise
 
     def get_grid_points(self):
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
                         SELECT DISTINCT latitude::numeric, longitude::numeric
@@ -326,15 +722,70 @@ class Database:
                         ORDER BY latitude, longitude
                     ''')
                     points = [{'lat': row['latitude'], 'lon': row['longitude']} for row in cur.fetchall()]
-                    logging.debug(f"Found {len(points)} grid points")
+                    logger.debug(f"Found {len(points)} grid points")
                     return points
         except Exception as e:
-            logging.error(f"Error fetching grid points: {str(e)}")
+            logger.error(f"Error fetching grid points: {str(e)}")
             raise
 
+    def stream_columns(self, table, columns, start_date=None, end_date=None, points=None, base_temp=None,
+                       chunk_rows=DB_STREAM_CHUNK_ROWS):
+        """テーブルの指定列をサーバーサイドカーソルで chunk_rows 行ずつ読み、列ごとの NumPy 配列の dict を順に返す。
+
+        table と columns は STREAM_TABLES にあるもの（日付は datetime64[D]、数値は float64 / int64）。
+        start_date / end_date で日付の範囲（両端を含む）、points=[(lat, lon), ...] で地点、
+        base_temp で gdd_cumulative の基準温度を絞り込める。行の順は不定。
+        手元に持つのは chunk_rows 行分だけなので、複数年のデータも一定のメモリで処理できる
+        （DataFrame が要るときは pd.DataFrame(chunk)）。
+        読み終えるまで専用の接続を借りるので、読みながら同じスレッドで他の Database のメソッドを呼んだり、
+        別のストリームを開いたりしてもよい
+        """
+        available, default_filter = STREAM_TABLES[table]
+        unknown = [c for c in columns if c not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {unknown}")
+        source = f"{table} t"
+        conditions = [default_filter] if default_filter else []
+        params = []
+        if points is not None:
+            # 地点ごとに (latitude, longitude, date) インデックスのキー一致で引く
+            source = (f"unnest(%s::double precision[], %s::double precision[]) AS p(latitude, longitude) "
+                      f"JOIN {table} t ON t.latitude = p.latitude AND t.longitude = p.longitude")
+            params += [[float(p[0]) for p in points], [float(p[1]) for p in points]]
+        if start_date is not None:
+            conditions.append("t.date >= %s::date")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("t.date < %s::date + 1")
+            params.append(end_date)
+        if base_temp is not None:
+            conditions.append("t.base_temp = %s")
+            params.append(float(base_temp))
+        query = f"SELECT {', '.join(available[c][0] for c in columns)} FROM {source}"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+
+        rows_read = 0
+        try:
+            with self.connection(dedicated=True) as conn:
+                with conn.cursor(f"stream_{table}_{next(_stream_ids)}", cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.itersize = chunk_rows
+                    cur.execute(query, params)
+                    while True:
+                        rows = cur.fetchmany(chunk_rows)
+                        if not rows:
+                            break
+                        rows_read += len(rows)
+                        yield {c: np.array(values, dtype=available[c][1]) for c, values in zip(columns, zip(*rows))}
+        except Exception as e:
+            logger.error(f"Error streaming {table}: {str(e)}")
+            raise
+        logger.debug(f"Streamed {rows_read} rows of {table} ({', '.join(columns)})")
+
     def get_temperature_data(self, start_date=None, end_date=None):
+        """気温データの全行を dict で取得する（少量向け。大量に読むときは stream_columns）"""
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     query = "SELECT * FROM temperature_data"
                     params = []
@@ -350,7 +801,7 @@ class Database:
 
     def add_pest(self, name, threshold_temp, description=""):
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         'INSERT INTO pests (name, threshold_temp, description) VALUES (%s, %s, %s)',
@@ -363,7 +814,7 @@ class Database:
 
     def insert_accumulated_temperature(self, date, latitude, longitude, accumulated_temp, created_at=None):
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('''
                         INSERT INTO accumulated_temperature (date, latitude, longitude, accumulated_temp, created_at)
@@ -380,7 +831,7 @@ class Database:
     def get_latest_temperature_date(self):
         """気温データの最新日付を取得"""
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('SELECT MAX(date::date) as max_date FROM temperature_data')
                     row = cur.fetchone()
@@ -392,11 +843,23 @@ class Database:
     def get_latest_accumulated_temperature_date(self):
         """積算温度データの最新日付を取得"""
         try:
-            with get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute('SELECT MAX(date::date) as max_date FROM accumulated_temperature')
                     row = cur.fetchone()
                     return row['max_date'] if row and row['max_date'] else None
         except Exception as e:
             logger.error(f"Error fetching latest accumulated temperature date: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def get_pending_revisions(self):
+        """積算温度の再計算待ち（temperature_revisions）の地点数と最も古い再計算開始日"""
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT COUNT(*) AS points, MIN(from_date) AS from_date FROM temperature_revisions')
+                    row = cur.fetchone()
+                    return row['points'], row['from_date']
+        except Exception as e:
+            logger.error(f"Error fetching pending revisions: {str(e)}")
+            raise
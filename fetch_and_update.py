@@ -1,188 +1,155 @@
 #!/usr/bin/env python3
 """
 cron用スクリプト: 最新日付の翌日の気温データを取得し、積算温度計算と害虫マップ生成を自動実行
+
+各処理は pipeline.Pipeline のステージとして同じプロセス内で実行する（接続プールを共有）。
+  fetch → accumulate → { maps, animation }（同じ段のステージは並列）
+maps と animation は今年分の週次の累積GDDを 1 回だけ読んで共有する。
+入力（気温データの状態・害虫定義・日付）が前回成功時から変わっていないステージは省く。
+pandas・matplotlib・folium・scipy を使うモジュールは build_pipeline の中で読み込む（matplotlib の描画プロセスは
+spawn で本モジュールを読み直すので、モジュールの先頭で読むと各プロセスの起動がそのぶん遅くなる）。
 """
 
-import sys
 import os
+import hashlib
+import argparse
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from database import Database
-import subprocess
-import time
-
-# ログの設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('cron_fetch_update.log'),
-        logging.StreamHandler()
-    ]
-)
-
-def main():
+from gdd_store import PESTS_FILE, load_base_temps
+from pipeline import Pipeline, Stage, SharedResult
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+
+
+def fetch_range(db):
+    """未取得期間 ('YYYYMMDD', 'YYYYMMDD')。取得するものがなければ None"""
+    # 最新の気温データ日付を取得
+    latest_date = db.get_latest_temperature_date()
+    logging.info(f"最新の気温データ日付: {latest_date}")
+
+    if latest_date:
+        # latest_dateがstr型ならdatetime型に変換
+        if isinstance(latest_date, str):
+            latest_date = datetime.strptime(latest_date[:10], '%Y-%m-%d')
+        start_date = latest_date + timedelta(days=1)
+    else:
+        # データがなければ2026-01-01から
+        start_date = datetime(2026, 1, 1)
+        logging.info(f"初回実行: {start_date.strftime('%Y%m%d')}から開始")
+
+    # 取得終了日は昨日（気温データが確定している直近の日付）
+    yesterday = datetime.now().date() - timedelta(days=1)
+    start_date_obj = start_date.date() if isinstance(start_date, datetime) else start_date
+
+    # 未取得期間がなければスキップ
+    if start_date_obj > yesterday:
+        logging.info(f"未取得のデータはありません（最新: {latest_date}, 昨日: {yesterday}）")
+        return None
+    return start_date_obj.strftime('%Y%m%d'), yesterday.strftime('%Y%m%d')
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_pipeline(db, force=False):
+    """日次バッチのステージ構成"""
+    from fetch_temperature_data import fetch_temperature_data
+    from calculate_accumulated_temperature import calculate_accumulated_temperature_optimized
+    from generate_maps import generate_all_maps, pest_map_path
+    from generate_animation_data import ANIMATION_FORMAT, generate_animation_data
+    from frame_renderer import FrameRenderer
+
+    today = date.today()
+    pests = SharedResult(db.get_pests)
+    base_temps = load_base_temps()
+    # 今年分の週次の累積GDD（maps は最終フレーム、animation は全フレームを使う）
+    season = SharedResult(lambda: _sample_current_season(db, today, base_temps))
+
+    def fetch(inputs):
+        period = fetch_range(db)
+        if period is None:
+            return 0, 0
+        logging.info(f"取得対象期間: {period[0]} ～ {period[1]}")
+        merged = fetch_temperature_data(period[0], period[1], db=db)
+        return merged, merged
+
+    def accumulate_fingerprint(inputs):
+        revisions, revised_from = db.get_pending_revisions()
+        return {
+            'latest_temperature_date': db.get_latest_temperature_date(),
+            'pending_revisions': revisions,
+            'revised_from': revised_from,
+            'base_temps': base_temps,
+        }
+
+    def accumulate(inputs):
+        return None, calculate_accumulated_temperature_optimized(db=db)
+
+    def maps_fingerprint(inputs):
+        return {
+            'year': today.year,
+            'pests': sorted((p['name'], float(p['threshold_temp'])) for p in pests.get()),
+        }
+
+    def maps(inputs):
+        _, (points, _, values) = season.get()
+        latest = {base_temp: matrix[-1] for base_temp, matrix in values.items()}
+        return None, generate_all_maps(pests=pests.get(), season_gdd=(points, latest))
+
+    def animation_fingerprint(inputs):
+        # フレームの日付が日ごとに進むので日付も含める（描画方法を変えた日も描き直す）
+        return {'today': today, 'pests_json': file_digest(PESTS_FILE),
+                'renderer': FrameRenderer().style, 'format': ANIMATION_FORMAT}
+
+    def animation(inputs):
+        return None, generate_animation_data(current_season=season.get())
+
+    return Pipeline([
+        Stage('fetch', fetch),
+        Stage('accumulate', accumulate, deps=['fetch'], fingerprint=accumulate_fingerprint),
+        Stage('maps', maps, deps=['accumulate'], fingerprint=maps_fingerprint,
+              outputs=[pest_map_path(p) for p in pests.get()]),
+        Stage('animation', animation, deps=['accumulate'], fingerprint=animation_fingerprint,
+              outputs=[os.path.join(OUTPUT_DIR, 'animation_data.json')]),
+    ], force=force)
+
+
+def _sample_current_season(db, today, base_temps):
+    from generate_animation_data import sample_season
+
+    curr_start = date(today.year, 1, 1)
+    curr_end = today - timedelta(days=1)
+    with db.connection() as conn:
+        return sample_season(conn, curr_start, curr_end, base_temps)
+
+
+def main(force=False):
     """メイン処理"""
+    # ログの設定（import では設定しない。取り込んだ各モジュールの設定より優先する）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('cron_fetch_update.log'),
+            logging.StreamHandler()
+        ],
+        force=True
+    )
     try:
         logging.info("=== cron fetch_and_update 開始 ===")
-        
-        # データベース接続
+
+        # データベース接続（スキーマ確認はここで 1 回だけ。各ステージはこの Database を共有する）
         db = Database()
         logging.info("データベース接続完了")
-        
-        # 最新の気温データ日付を取得
-        latest_date = db.get_latest_temperature_date()
-        logging.info(f"最新の気温データ日付: {latest_date}")
-        
-        if latest_date:
-            # latest_dateがstr型ならdatetime型に変換
-            if isinstance(latest_date, str):
-                latest_date = datetime.strptime(latest_date[:10], '%Y-%m-%d')
-            start_date = latest_date + timedelta(days=1)
-        else:
-            # データがなければ2026-01-01から
-            start_date = datetime(2026, 1, 1)
-            logging.info(f"初回実行: {start_date.strftime('%Y%m%d')}から開始")
-        
-        # 取得終了日は昨日（気温データが確定している直近の日付）
-        yesterday = datetime.now().date() - timedelta(days=1)
-        start_date_obj = start_date.date() if isinstance(start_date, datetime) else start_date
-        
-        # 未取得期間がなければスキップ
-        if start_date_obj > yesterday:
-            logging.info(f"未取得のデータはありません（最新: {latest_date}, 昨日: {yesterday}）。次回実行を待ちます。")
-            return
-        
-        start_date_str = start_date_obj.strftime('%Y%m%d')
-        end_date_str = yesterday.strftime('%Y%m%d')
-        logging.info(f"取得対象期間: {start_date_str} ～ {end_date_str}")
-        
-        # 1. 気温データ取得
-        logging.info("=== 気温データ取得開始 ===")
-        try:
-            logging.info("fetch_temperature_data.py 実行直前")
-            result = subprocess.run([
-                'python', 'fetch_temperature_data.py', 
-                '--start', start_date_str, 
-                '--end', end_date_str
-            ], 
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=18000  # 5時間でタイムアウト（GitHub Actionsの制限を考慮）
-            )
-            logging.info("気温データ取得完了")
-            logging.info(f"気温データ取得 標準出力: {result.stdout}")
-            if result.stderr:
-                logging.warning(f"気温データ取得 標準エラー: {result.stderr}")
-        except subprocess.TimeoutExpired as e:
-            logging.error(f"気温データ取得タイムアウト: {e}")
-            logging.error("プロセスを強制終了します")
-            if e.stdout:
-                logging.info(f"タイムアウト時の標準出力: {e.stdout}")
-            if e.stderr:
-                logging.error(f"タイムアウト時の標準エラー: {e.stderr}")
-            raise
-        except subprocess.CalledProcessError as e:
-            logging.error(f"気温データ取得エラー: {e}")
-            logging.error(f"エラー出力: {e.stderr}")
-            if e.stdout:
-                logging.info(f"エラー時の標準出力: {e.stdout}")
-            raise
-        
-        # 2. 積算温度計算
-        try:
-            logging.info("calculate_accumulated_temperature.py 実行直前")
-            result = subprocess.run([
-                'python', 'calculate_accumulated_temperature.py'
-            ], 
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=1800  # 30分でタイムアウト（データベース内計算により高速化）
-            )
-            logging.info("積算温度計算完了")
-            logging.info(f"積算温度計算 標準出力: {result.stdout}")
-            if result.stderr:
-                logging.warning(f"積算温度計算 標準エラー: {result.stderr}")
-        except subprocess.TimeoutExpired as e:
-            logging.error(f"積算温度計算タイムアウト: {e}")
-            if e.stdout:
-                logging.info(f"タイムアウト時の標準出力: {e.stdout}")
-            if e.stderr:
-                logging.error(f"タイムアウト時の標準エラー: {e.stderr}")
-            raise
-        except subprocess.CalledProcessError as e:
-            logging.error(f"積算温度計算エラー: {e}")
-            logging.error(f"エラー出力: {e.stderr}")
-            if e.stdout:
-                logging.info(f"エラー時の標準出力: {e.stdout}")
-            raise
-
-        # 3. 害虫マップ生成
-        try:
-            logging.info("generate_maps.py 実行直前")
-            result = subprocess.run([
-                'python', 'generate_maps.py'
-            ], 
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=3600  # 1時間でタイムアウト
-            )
-            logging.info("害虫マップ生成完了")
-            logging.info(f"害虫マップ生成 標準出力: {result.stdout}")
-            if result.stderr:
-                logging.warning(f"害虫マップ生成 標準エラー: {result.stderr}")
-        except subprocess.TimeoutExpired as e:
-            logging.error(f"害虫マップ生成タイムアウト: {e}")
-            if e.stdout:
-                logging.info(f"タイムアウト時の標準出力: {e.stdout}")
-            if e.stderr:
-                logging.error(f"タイムアウト時の標準エラー: {e.stderr}")
-            raise
-        except subprocess.CalledProcessError as e:
-            logging.error(f"害虫マップ生成エラー: {e}")
-            logging.error(f"エラー出力: {e.stderr}")
-            if e.stdout:
-                logging.info(f"エラー時の標準出力: {e.stdout}")
-            raise
-        
-        # 4. アニメーションデータ生成
-        try:
-            logging.info("generate_animation_data.py 実行直前")
-            result = subprocess.run([
-                'python', 'generate_animation_data.py'
-            ], 
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=600  # 10分でタイムアウト
-            )
-            logging.info("アニメーションデータ生成完了")
-            logging.info(f"アニメーションデータ生成 標準出力: {result.stdout}")
-            if result.stderr:
-                logging.warning(f"アニメーションデータ生成 標準エラー: {result.stderr}")
-        except subprocess.TimeoutExpired as e:
-            logging.error(f"アニメーションデータ生成タイムアウト: {e}")
-            if e.stdout:
-                logging.info(f"タイムアウト時の標準出力: {e.stdout}")
-            if e.stderr:
-                logging.error(f"タイムアウト時の標準エラー: {e.stderr}")
-            raise
-        except subprocess.CalledProcessError as e:
-            logging.error(f"アニメーションデータ生成エラー: {e}")
-            logging.error(f"エラー出力: {e.stderr}")
-            if e.stdout:
-                logging.info(f"エラー時の標準出力: {e.stdout}")
-            raise
-        
+
+        build_pipeline(db, force=force).run()
+        logging.info(f"接続プール: {db.pool_stats()}")
+
         logging.info("=== cron fetch_and_update 正常完了 ===")
-        
+
     except Exception as e:
         logging.error(f"=== cron fetch_and_update エラー ===")
         logging.error(f"エラー内容: {str(e)}")
@@ -191,4 +158,7 @@ def main():
         raise
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--force', action='store_true', help='入力に変更がなくても全ステージを実行する')
+    args = parser.parse_args()
+    main(force=args.force)
@@ -1,43 +1,35 @@
+import os
 import logging
 import pandas as pd
 from datetime import datetime, timedelta
 from database import Database
-from generate_cumtemp import fetch_nasa_temp_data
+from nasa_power import get_client, FetchStats
 import time
 import argparse
 
 # ログの設定
-logging.basicConfig(
-    level=logging.INFO, 
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('temperature_fetch.log'),
-        logging.StreamHandler()
-    ]
-)
-
 print("=== スクリプトimport直後 ===", flush=True)
 
-def fetch_temperature_data(start_date_str=None, end_date_str=None):
-    """NASA POWER APIから気温データを取得し、データベースに保存する"""
+def fetch_temperature_data(start_date_str=None, end_date_str=None, db=None):
+    """NASA POWER APIから気温データを取得し、データベースに保存する。
+    戻り値: 追加・更新した行数"""
     print("fetch_temperature_data.py: スクリプト開始")
     try:
-        db = Database()
+        run_started = time.perf_counter()
+        db = db or Database()
         logging.info("Database connection established")
 
         # グリッドポイントの読み込み
-        grid_df = pd.read_csv("data/grid_points.csv")
-        grid_points = [(row["lat"], row["lon"]) for _, row in grid_df.iterrows()]
+        grid_df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'grid_points.csv'))
+        grid_points = list(zip(grid_df["lat"], grid_df["lon"]))
         logging.info(f"Loaded {len(grid_points)} grid points from CSV")
         print(f"Loaded {len(grid_points)} grid points from CSV")
 
         # グリッドポイントをデータベースに登録
-        for lat, lon in grid_points:
-            try:
-                db.insert_grid_point(lat, lon)
-                logging.debug(f"Registered grid point: {lat}, {lon}")
-            except Exception as e:
-                logging.error(f"Error registering grid point {lat}, {lon}: {str(e)}")
+        try:
+            db.bulk_insert_grid_points(grid_points)
+        except Exception as e:
+            logging.error(f"Error registering grid points: {str(e)}")
 
         # データ取得期間の設定
         if start_date_str is None or end_date_str is None:
@@ -48,48 +40,42 @@ def fetch_temperature_data(start_date_str=None, end_date_str=None):
         logging.info(f"Fetching data from {start_date_str} to {end_date_str}")
         print(f"Fetching data from {start_date_str} to {end_date_str}")
 
-        # 各グリッドポイントのデータを取得
+        # 各グリッドポイントを並列取得し、届いた順に地点単位でバルクローダーに渡す
+        # （同時実行数・レート制限・再試行は nasa_power の設定に従う）
         success_count = 0
         error_count = 0
-        
-        for i, (lat, lon) in enumerate(grid_points):
-            logging.info(f"Fetching data for lat={lat}, lon={lon} ({i+1}/{len(grid_points)})")
-            print(f"Fetching data for lat={lat}, lon={lon} ({i+1}/{len(grid_points)})")
-            try:
-                print(f"Calling fetch_nasa_temp_data for lat={lat}, lon={lon}")
-                df = fetch_nasa_temp_data(lat, lon, start_date_str, end_date_str, timeout=30)
-                print(f"fetch_nasa_temp_data returned for lat={lat}, lon={lon}")
-            except Exception as e:
-                logging.error(f"fetch_nasa_temp_data error for {lat}, {lon}: {str(e)}")
-                print(f"fetch_nasa_temp_data error for {lat}, {lon}: {str(e)}")
-                error_count += 1
-                continue
-                
-            if df is not None and not df.empty:
-                data_count = 0
-                for _, row in df.iterrows():
+        client = get_client()
+        fetch_stats = FetchStats()
+        logging.info(f"Fetching with concurrency={client.concurrency}, rate={client.bucket.rate}/s")
+
+        with db.temperature_loader(source='nasa_power') as loader:
+            results = client.fetch_many(grid_points, start_date_str, end_date_str, stats=fetch_stats)
+            for i, (lat, lon, df) in enumerate(results):
+                if df is not None and not df.empty:
                     try:
-                        date = row['date']
-                        temp = row['temp']
-                        if temp != -999.0:
-                            print(f"Saving data: {date}, {lat}, {lon}, {temp}")
-                            db.insert_temperature_data(date, lat, lon, temp, 'nasa_power')
-                            print(f"Saved data: {date}, {lat}, {lon}, {temp}")
-                            data_count += 1
+                        data_count = loader.add_frame(df, lat, lon)
+                        success_count += 1
+                        logging.info(f"Queued {data_count} temperature records for lat={lat}, lon={lon} ({i+1}/{len(grid_points)})")
                     except Exception as e:
-                        logging.error(f"Error saving data for {lat}, {lon} on {row['date']}: {str(e)}")
-                        print(f"Error saving data for {lat}, {lon} on {row['date']}: {str(e)}")
+                        logging.error(f"Error saving data for {lat}, {lon}: {str(e)}")
+                        print(f"Error saving data for {lat}, {lon}: {str(e)}")
                         error_count += 1
-                success_count += 1
-                logging.info(f"Successfully saved {data_count} temperature records for lat={lat}, lon={lon}")
-            else:
-                logging.warning(f"No data for lat={lat}, lon={lon}")
-                print(f"No data for lat={lat}, lon={lon}")
-                
-            time.sleep(1.2)  # API負荷対策
+                else:
+                    logging.warning(f"No data for lat={lat}, lon={lon} ({i+1}/{len(grid_points)})")
+                    print(f"No data for lat={lat}, lon={lon}")
+                    error_count += 1
 
+        elapsed = time.perf_counter() - run_started
+        overall_rate = loader.rows_loaded / elapsed if elapsed > 0 else 0.0
         logging.info(f"Temperature data fetch completed. Success: {success_count}, Errors: {error_count}")
         print(f"Temperature data fetch completed. Success: {success_count}, Errors: {error_count}")
+        logging.info(f"NASA POWER requests: {fetch_stats.summary()}")
+        logging.info(
+            f"Throughput: {loader.rows_loaded} rows loaded ({loader.rows_merged} inserted/updated) "
+            f"in {elapsed:.1f}s = {overall_rate:.1f} rows/s overall, "
+            f"DB write {loader.rows_per_second:.0f} rows/s ({loader.load_seconds:.2f}s)"
+        )
+        return loader.rows_merged
 
     except Exception as e:
         logging.error(f"Error in fetch_temperature_data: {str(e)}")
@@ -99,6 +85,14 @@ def fetch_temperature_data(start_date_str=None, end_date_str=None):
         raise
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('temperature_fetch.log'),
+            logging.StreamHandler()
+        ]
+    )
     parser = argparse.ArgumentParser()
     parser.add_argument('--start', type=str, help='Start date in YYYYMMDD')
     parser.add_argument('--end', type=str, help='End date in YYYYMMDD')
@@ -0,0 +1,298 @@
+"""
+アニメーションの等値線フレーム（PNG）の描画。
+
+描画方法は 2 つ:
+  - raster（既定）: 場を閾値の帯に分類し（np.digitize）、帯ごとの色のパレット PNG を直接書く。
+    帯の境目の画素を等値線として黒で塗れる（ANIMATION_ISOLINES）。ラベルは付かない。1 枚数 ms。
+  - matplotlib: contourf + contour + clabel の従来の図（高品質だが 1 枚数十 ms）。
+
+FrameRenderer は基準温度ごとの平滑化済みの場（フレーム × 200 × 200）を共有メモリに 1 回だけ置き、
+(害虫, フレーム) の描画ジョブをプロセスプールに分配する。ジョブに載るのは共有メモリの名前と
+フレーム番号・閾値だけで、場の配列は pickle しない。各 PNG はちょうど 1 つのジョブが書くので、
+出力は直列で描いた場合と同じになる。
+
+各フレームディレクトリの manifest.json には、描いた PNG ごとに入力（平滑化済みの場・範囲・閾値・色）の
+ハッシュを記録する。ハッシュが変わらないフレームは描き直さない（field_digest / frame_key / load_manifest）。
+
+プールは spawn で起動する（パイプラインのスレッド内からでも安全に使えるように）。
+matplotlib は matplotlib の描画と、#RRGGBB 以外の色の変換でだけ読み込む（raster の描画とワーカーの起動を軽くする）。
+
+環境変数:
+  ANIMATION_RENDERER        raster / matplotlib（既定 raster）
+  ANIMATION_ISOLINES        raster で等値線の画素を描くか（既定 1、0 で塗りのみ）
+  ANIMATION_RENDER_WORKERS  matplotlib の描画プロセス数（既定 0 = CPU コア数、1 で直列）
+"""
+
+import os
+import json
+import time
+import struct
+import zlib
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from grid_interpolator import GRID_RESOLUTION
+from pipeline import load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+RENDERERS = ('raster', 'matplotlib')
+ANIMATION_RENDERER = os.environ.get('ANIMATION_RENDERER', 'raster')
+ANIMATION_ISOLINES = os.environ.get('ANIMATION_ISOLINES', '1') != '0'
+ANIMATION_RENDER_WORKERS = int(os.environ.get('ANIMATION_RENDER_WORKERS', '0')) or os.cpu_count() or 1
+
+
+# 描画方法を変えたら上げる（全フレームを描き直す）
+FRAME_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+
+def field_digest(field, bounds):
+    """平滑化済みの場と範囲のハッシュ（同じ基準温度の害虫で共通）"""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(bounds, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(field, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def frame_key(digest, levels, colors, style):
+    """フレーム PNG の内容を決める入力（field_digest・閾値・色・描画方法 FrameRenderer.style）のハッシュ"""
+    payload = json.dumps([FRAME_FORMAT_VERSION, style, digest, list(levels), list(colors)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_manifest(frames_dir):
+    """{ファイル名: frame_key} （なければ空）"""
+    return load_state(os.path.join(frames_dir, MANIFEST_FILE))
+
+
+def save_manifest(frames_dir, manifest):
+    save_state(manifest, os.path.join(frames_dir, MANIFEST_FILE))
+
+
+def field_grid(bounds, resolution=GRID_RESOLUTION):
+    """場の (grid_lat, grid_lon)。bounds は (south, north, west, east)（補間に使った地点の範囲）"""
+    south, north, west, east = bounds
+    step = complex(0, resolution)
+    return np.mgrid[south:north:step, west:east:step]
+
+
+def fill_colors(levels, colors):
+    """帯ごとの色（colors の数を levels の数-1 に揃える）"""
+    fill = list(colors)
+    if len(fill) > len(levels) - 1:
+        fill = fill[:len(levels) - 1]
+    elif len(fill) < len(levels) - 1:
+        fill += [fill[-1]] * (len(levels) - 1 - len(fill))
+    return fill
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')  # GUIバックエンド不要
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def render_contour_frame(grid_lat, grid_lon, grid_temp, levels, colors, output_path):
+    """平滑化済みの場から1フレーム分の等値線PNG画像を描く（matplotlib）"""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 6))
+    try:
+        ax.contourf(grid_lon, grid_lat, grid_temp,
+                     levels=levels, colors=fill_colors(levels, colors), alpha=0.7, extend='both')
+        lines = ax.contour(grid_lon, grid_lat, grid_temp,
+                            levels=levels, colors='black', linewidths=0.5)
+        ax.clabel(lines, inline=True, fontsize=8, fmt="%.0f")
+    except Exception as e:
+        # データ範囲が閾値をカバーしていない場合はベタ塗り
+        ax.contourf(grid_lon, grid_lat, grid_temp,
+                     levels=50, cmap='RdYlGn_r', alpha=0.7)
+
+    ax.axis('off')
+    plt.savefig(output_path, bbox_inches="tight", pad_inches=0,
+                transparent=True, dpi=72)
+    plt.close(fig)
+
+
+# raster: 場を何倍に拡大して（線形補間）画素にするか・塗りの不透明度・等値線の色
+RASTER_SCALE = 2
+FILL_ALPHA = 0.7
+ISOLINE_RGBA = (0, 0, 0, 255)
+
+
+def to_rgba255(color, alpha):
+    """色（#RRGGBB、それ以外は matplotlib の色指定）→ 0-255 の RGBA"""
+    if isinstance(color, str) and len(color) == 7 and color.startswith('#'):
+        rgba = [int(color[i:i + 2], 16) / 255 for i in (1, 3, 5)] + [alpha]
+    else:
+        from matplotlib.colors import to_rgba
+        rgba = to_rgba(color, alpha)
+    return tuple(round(c * 255) for c in rgba)
+
+
+def band_palette(levels, colors):
+    """帯ごとの RGBA（最後の 1 色は等値線）。
+    contourf(colors=..., extend='both') と同じく、閾値の範囲外は両端の帯の色になる"""
+    palette = [to_rgba255(color, FILL_ALPHA) for color in fill_colors(levels, colors)]
+    return np.array(palette + [ISOLINE_RGBA], dtype=np.uint8)
+
+
+def upsample_field(grid_temp, scale=RASTER_SCALE):
+    """格子の間を scale 等分して線形補間する（元の格子点の値はそのまま、n → scale*(n-1)+1）"""
+    t = np.arange(scale) / scale
+    for _ in range(2):  # 行方向に補間して転置、を 2 回
+        width = grid_temp.shape[1]
+        rows = grid_temp[:-1, None, :] * (1 - t)[:, None] + grid_temp[1:, None, :] * t[:, None]
+        grid_temp = np.concatenate([rows.reshape(-1, width), grid_temp[-1:]]).T
+    return grid_temp
+
+
+def classify_field(grid_temp, levels, scale=RASTER_SCALE):
+    """場を帯番号（0 ～ len(levels)-2）の画像にする（行は北から南）"""
+    if scale != 1:
+        grid_temp = upsample_field(grid_temp, scale)
+    bands = np.digitize(grid_temp, np.asarray(levels, dtype=float)[1:-1])
+    return np.flipud(bands).astype(np.uint8)
+
+
+def isoline_mask(bands):
+    """右か下の画素と帯が違う画素（1 画素幅の等値線）"""
+    edge = np.zeros(bands.shape, dtype=bool)
+    edge[:, 1:] |= bands[:, 1:] != bands[:, :-1]
+    edge[1:, :] |= bands[1:, :] != bands[:-1, :]
+    return edge
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+
+def encode_palette_png(indices, palette):
+    """8 bit インデックス画像とパレット（RGBA, 256 色まで）からパレット PNG のバイト列を作る"""
+    height, width = indices.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8)  # 各行の先頭はフィルタ種別 0
+    raw[:, 1:] = indices
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b'PLTE', palette[:, :3].tobytes()),
+        _png_chunk(b'tRNS', palette[:, 3].tobytes()),
+        _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def render_raster_frame(grid_temp, levels, colors, output_path, isolines=ANIMATION_ISOLINES):
+    """平滑化済みの場から1フレーム分の帯塗り PNG を直接書く（raster）"""
+    palette = band_palette(levels, colors)
+    indices = classify_field(grid_temp, levels)
+    if isolines:
+        indices[isoline_mask(indices)] = len(palette) - 1
+    with open(output_path, 'wb') as f:
+        f.write(encode_palette_png(indices, palette))
+
+
+# ワーカー側: 共有メモリは名前ごとに 1 回だけ開く（基準温度が変われば開き直す）
+_attached = {}
+
+
+def _shared_fields(name, shape):
+    if name not in _attached:
+        for old in _attached.values():
+            old[0].close()
+        _attached.clear()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf))
+    return _attached[name][1]
+
+
+def _render_shared(name, shape, frame, bounds, levels, colors, output_path):
+    grid_lat, grid_lon = field_grid(bounds, shape[1])
+    render_contour_frame(grid_lat, grid_lon, _shared_fields(name, shape)[frame], levels, colors, output_path)
+    return output_path
+
+
+class FrameRenderer:
+    """(害虫, フレーム) を renderer の方法で描く。matplotlib は workers プロセスに分配する
+    （raster は 1 枚が軽いので常にこのプロセスで描く）"""
+
+    def __init__(self, workers=ANIMATION_RENDER_WORKERS, renderer=ANIMATION_RENDERER, isolines=ANIMATION_ISOLINES):
+        if renderer not in RENDERERS:
+            raise ValueError(f"unknown renderer: {renderer} (choose from {', '.join(RENDERERS)})")
+        self.renderer = renderer
+        self.isolines = isolines
+        self.workers = max(1, workers) if renderer == 'matplotlib' else 1
+        self._executor = None
+
+    @property
+    def style(self):
+        """manifest のキーに含める描画方法"""
+        if self.renderer == 'raster':
+            return f"raster{'+isolines' if self.isolines else ''}@{RASTER_SCALE}"
+        return self.renderer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def render(self, fields, bounds, targets, label=''):
+        """fields: (フレーム, R, R) の場、bounds: フレームごとの (south, north, west, east)、
+        targets: [(levels, colors, frames_dir, 描画するフレーム番号), ...]。
+        frames_dir/frame_XXX.png を書き、描いた枚数を返す"""
+        jobs = [(i, levels, colors, os.path.join(frames_dir, f"frame_{i:03d}.png"))
+                for levels, colors, frames_dir, frames in targets for i in frames]
+        if not jobs:
+            return 0
+        started = time.perf_counter()
+        step = max(1, len(jobs) // 10)
+
+        def progress(done):
+            if done % step == 0 or done == len(jobs):
+                logger.info(f"  {label}: {done}/{len(jobs)} 枚 ({time.perf_counter() - started:.1f}s)")
+
+        # 差分更新で数枚だけのときはプールを起動しない（起動は最初に必要になったとき 1 回）
+        if self.workers > 1 and len(jobs) > 1 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        if self._executor is None or len(jobs) == 1:
+            for done, (i, levels, colors, path) in enumerate(jobs, 1):
+                if self.renderer == 'raster':
+                    render_raster_frame(fields[i], levels, colors, path, isolines=self.isolines)
+                else:
+                    grid_lat, grid_lon = field_grid(bounds[i], fields.shape[1])
+                    render_contour_frame(grid_lat, grid_lon, fields[i], levels, colors, path)
+                progress(done)
+        else:
+            fields = np.ascontiguousarray(fields, dtype=np.float64)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, fields.nbytes))
+            try:
+                np.ndarray(fields.shape, dtype=np.float64, buffer=shm.buf)[:] = fields
+                futures = [
+                    self._executor.submit(_render_shared, shm.name, fields.shape, i,
+                                          tuple(float(b) for b in bounds[i]), levels, colors, path)
+                    for i, levels, colors, path in jobs
+                ]
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    progress(done)
+            finally:
+                shm.close()
+                shm.unlink()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"  {label}: {len(jobs)} 枚を {elapsed:.1f}s で描画 "
+                    f"({elapsed / len(jobs) * 1000:.1f} ms/枚, {self.style}, workers={self.workers})")
+        return len(jobs)
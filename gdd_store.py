@@ -0,0 +1,229 @@
+"""
+地点 × 基準温度ごとの累積有効積算温度（GDD）ストア。
+
+gdd_cumulative テーブルに、各グリッド地点・各基準温度について
+「データ開始日からその日までの Σ max(0, 気温 - 基準温度)」と有効日数を日別に保持する。
+期間 [start, end] の GDD は cum(end) - cum(start - 1) の 2 回の参照と引き算で求まる。
+テーブルは calculate_accumulated_temperature.py が積算温度と同じ temperature_data の走査で更新し、
+地図・アニメーションは sample_cumulative_gdd、API は compute_gdd_many で読む。
+
+基準温度は data/pests.json の base_temp（重複除去）と、薬剤判定用の 0℃。
+ストアにない基準温度は gdd_from_series による NumPy のベクトル計算で求める。
+グリッド上にない座標は interpolated_gdd_many で周囲の地点の日次気温を重み付き平均してから計算する。
+compute_gdd_many が /api/gdd と /api/gdd/batch の共通の計算経路。
+"""
+
+import os
+import json
+import logging
+from datetime import timedelta
+
+import numpy as np
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+PESTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'pests.json')
+
+# 薬剤（プリモマックス・グリーンフィールド）の基準温度
+SPRAY_BASE_TEMP = 0.0
+
+
+def load_base_temps(pests_file=PESTS_FILE):
+    """ストアで保持する基準温度（昇順・重複なし）"""
+    base_temps = {SPRAY_BASE_TEMP}
+    if os.path.exists(pests_file):
+        with open(pests_file, 'r', encoding='utf-8') as f:
+            for pest in json.load(f).get('pests', []):
+                base_temps.add(float(pest['base_temp']))
+    return sorted(base_temps)
+
+
+def gdd_from_series(dates, temps, start_date, end_date, base_temp=0):
+    """日次気温の配列から期間内の GDD をベクトル計算する（欠測 -999 は除外）。
+    戻り値: (gdd, 有効日数)"""
+    if len(temps) == 0:
+        return 0.0, 0
+    days = np.asarray(dates, dtype='datetime64[D]')
+    values = np.asarray(temps, dtype=float)
+    mask = (
+        (days >= np.datetime64(start_date, 'D')) &
+        (days <= np.datetime64(end_date, 'D')) &
+        (values > -900)
+    )
+    gdd = np.maximum(values[mask] - float(base_temp), 0.0).sum()
+    return float(gdd), int(mask.sum())
+
+
+def sample_cumulative_gdd(conn, base_temps, dates, since):
+    """累積GDDストアから、since を起点（0）とした基準温度ごとの GDD を指定日ごとに取り出す。
+
+    各地点は指定日以前の直近の値を引き継ぐ（欠測日の補完）。since 以降にまだ値がなければ NaN。
+    戻り値: (points, first_dates, values)
+      - points: [(lat, lon), ...]（ストアにある全地点、昇順）
+      - first_dates: 地点ごとの since 以降の最初のデータ日（なければ None）
+      - values: {base_temp: ndarray(len(dates), len(points))}
+    """
+    base_temps = [float(b) for b in base_temps]
+    baseline = since - timedelta(days=1)
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute('''
+            WITH RECURSIVE points AS (
+                (SELECT latitude, longitude FROM gdd_cumulative ORDER BY latitude, longitude LIMIT 1)
+                UNION ALL
+                SELECT n.latitude, n.longitude
+                FROM points p
+                CROSS JOIN LATERAL (
+                    SELECT latitude, longitude FROM gdd_cumulative g
+                    WHERE (g.latitude, g.longitude) > (p.latitude, p.longitude)
+                    ORDER BY latitude, longitude LIMIT 1
+                ) n
+            )
+            SELECT p.latitude, p.longitude, f.first_date
+            FROM points p
+            LEFT JOIN LATERAL (
+                SELECT MIN(g.date) AS first_date FROM gdd_cumulative g
+                WHERE g.latitude = p.latitude AND g.longitude = p.longitude
+                  AND g.base_temp = %s AND g.date >= %s
+            ) f ON true
+            ORDER BY p.latitude, p.longitude
+        ''', (base_temps[0], since))
+        rows = cur.fetchall()
+        points = [(float(r[0]), float(r[1])) for r in rows]
+        first_dates = [r[2] for r in rows]
+        values = {b: np.full((len(dates), len(points)), np.nan) for b in base_temps}
+        if not points:
+            return points, first_dates, values
+
+        # 列 0 は起点前日（差し引く基準値）、列 1 以降が指定日
+        cur.execute('''
+            SELECT p.i - 1, b.base_temp, f.i - 1, v.date >= %s, v.cum_gdd
+            FROM unnest(%s::double precision[], %s::double precision[]) WITH ORDINALITY AS p(latitude, longitude, i)
+            CROSS JOIN unnest(%s::double precision[]) AS b(base_temp)
+            CROSS JOIN unnest(%s::date[]) WITH ORDINALITY AS f(d, i)
+            JOIN LATERAL (
+                SELECT date, cum_gdd FROM gdd_cumulative g
+                WHERE g.latitude = p.latitude AND g.longitude = p.longitude
+                  AND g.base_temp = b.base_temp AND g.date <= f.d
+                ORDER BY g.date DESC LIMIT 1
+            ) v ON true
+        ''', (since, [p[0] for p in points], [p[1] for p in points], base_temps, [baseline] + list(dates)))
+        sampled = cur.fetchall()
+
+    data = np.array(sampled, dtype=float).reshape(-1, 5)
+    for b in base_temps:
+        rows = data[data[:, 1] == b]
+        point_i = rows[:, 0].astype(int)
+        frame_i = rows[:, 2].astype(int)
+        keep = (frame_i == 0) | (rows[:, 3] > 0)
+        cum = np.full((len(dates) + 1, len(points)), np.nan)
+        cum[frame_i[keep], point_i[keep]] = rows[keep, 4]
+        # 起点前日より前に値がない地点は 0 から積算
+        values[b] = cum[1:] - np.nan_to_num(cum[0])[None, :]
+    return points, first_dates, values
+
+
+def interpolated_gdd_many(temps, points, site_weights, first_date, start_dates, end_date, base_temps):
+    """複数地点の補間 GDD をまとめてベクトル計算する。
+
+    temps: グリッド地点 × 日 の日次気温（欠測は NaN、列 0 が first_date）
+    points: temps の各行のグリッド地点 (lat, lon)
+    site_weights: 地点ごとの [(lat, lon, weight), ...]（GridIndex.weights の戻り値）
+    start_dates / base_temps: 地点ごとの開始日・基準温度
+    各日について周囲のグリッド地点の気温を重み付き平均し（一部が欠測なら残りの重みで
+    正規化し直す）、開始日～end_date の Σ max(0, 気温 - 基準温度) を求める。
+    近傍は最大 4 地点に揃えて軸方向に合計するので、1 地点でも多数でも同じ計算順序になる。
+    戻り値: (gdd 配列, 有効日数配列)
+    """
+    n_sites = len(site_weights)
+    n_days = (end_date - first_date).days + 1
+    if n_sites == 0 or n_days <= 0:
+        return np.zeros(n_sites), np.zeros(n_sites, dtype=int)
+
+    # 最終行は重み 0 の埋め草（近傍が 4 地点未満の地点用）
+    padded = np.vstack([np.asarray(temps, dtype=float)[:, :n_days], np.full((1, n_days), np.nan)])
+    point_index = {(float(lat), float(lon)): i for i, (lat, lon) in enumerate(points)}
+    k = max(4, max(len(weights) for weights in site_weights))
+    neighbor = np.full((n_sites, k), len(points))
+    w = np.zeros((n_sites, k))
+    for i, weights in enumerate(site_weights):
+        for j, (lat, lon, weight) in enumerate(weights):
+            neighbor[i, j] = point_index[(float(lat), float(lon))]
+            w[i, j] = weight
+
+    selected = padded[neighbor]                  # 地点 × 近傍 × 日
+    present = ~np.isnan(selected)
+    weight_sum = (w[:, :, None] * present).sum(axis=1)
+    weighted = (np.where(present, selected, 0.0) * w[:, :, None]).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily = weighted / weight_sum
+
+    offsets = np.array([(d - first_date).days for d in start_dates])
+    in_range = np.arange(n_days)[None, :] >= offsets[:, None]
+    valid = in_range & (weight_sum > 0)
+    dd = np.where(valid, np.maximum(daily - np.asarray(base_temps, dtype=float)[:, None], 0.0), 0.0)
+    # 合計は地点ごとに自分の期間だけを足す（配列長で加算順が変わり丸めがずれないように）
+    gdd = np.array([dd[i, offset:].sum() for i, offset in enumerate(offsets)])
+    return gdd, valid.sum(axis=1)
+
+
+def compute_gdd_many(db, sites, end_date, grid_index, store_base_temps=(), fetch_fn=None, cube=None):
+    """複数地点の GDD を計算し、(地点の添字, GDD または None) を確定した順に返すジェネレータ。
+
+    sites: [(lat, lon, start_date, base_temp), ...]
+    1) グリッド地点ちょうどでストアにある基準温度 → 累積GDDストアを一括参照
+    2) それ以外 → 周囲のグリッド地点の日次気温を 1 回で読み、補間してベクトル計算
+       （cube = temperature_cube.TemperatureCube が期間を含んでいればそこから、なければ DB から）
+    3) DB のデータが足りない地点 → fetch_fn(lat, lon, 'YYYYMMDD', 'YYYYMMDD')（NASA POWER）で取得
+    /api/gdd（1 地点）もこの関数を通すので、単発とバッチの結果は一致する。
+    """
+    pending = []
+    for i, (lat, lon, start_date, base_temp) in enumerate(sites):
+        if start_date > end_date:
+            yield i, 0.0
+            continue
+        expected_days = (end_date - start_date).days + 1
+        pending.append((i, lat, lon, start_date, float(base_temp), max(1, int(expected_days * 0.5)),
+                        grid_index.weights(lat, lon)))
+
+    # 1) 累積GDDストア
+    store_sites = [p for p in pending if len(p[6]) == 1 and p[4] in store_base_temps]
+    if store_sites:
+        stored = db.get_cumulative_gdd_many([
+            (p[6][0][0], p[6][0][1], p[4], p[3], end_date) for p in store_sites
+        ])
+        resolved = set()
+        for p, result in zip(store_sites, stored):
+            if result is not None and result[1] >= p[5]:
+                resolved.add(p[0])
+                yield p[0], round(result[0], 1)
+        pending = [p for p in pending if p[0] not in resolved]
+
+    # 2) 周囲のグリッド地点から補間
+    interp_sites = [p for p in pending if p[6]]
+    if interp_sites:
+        points = sorted({(lat, lon) for p in interp_sites for lat, lon, _ in p[6]})
+        first_date = min(p[3] for p in interp_sites)
+        if cube is not None and cube.covers(first_date, end_date):
+            temps = cube.matrix(points, first_date, end_date)
+        else:
+            temps = db.get_temperature_matrix_for_points(points, first_date, end_date)
+        gdds, days = interpolated_gdd_many(
+            temps, points, [p[6] for p in interp_sites], first_date,
+            [p[3] for p in interp_sites], end_date, [p[4] for p in interp_sites]
+        )
+        resolved = set()
+        for p, gdd, n in zip(interp_sites, gdds, days):
+            if n >= p[5]:
+                resolved.add(p[0])
+                yield p[0], round(float(gdd), 1)
+        pending = [p for p in pending if p[0] not in resolved]
+
+    # 3) NASA POWER
+    for i, lat, lon, start_date, base_temp, _, _ in pending:
+        df = fetch_fn(lat, lon, start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d')) if fetch_fn else None
+        if df is None or df.empty:
+            yield i, None
+            continue
+        gdd, _ = gdd_from_series(df['date'].values, df['temp'].values, start_date, end_date, base_temp)
+        yield i, round(gdd, 1)
@@ -2,137 +2,111 @@
 アニメーション用の週次積算温度データを生成する。
 前年1月1日～前年12月31日 (前年基準でゼロから積算) と
 今年1月1日～昨日 (今年基準でゼロから積算) を1週間間隔でサンプリングし、
+年ごとのチャンク（output/animation_chunks/、animation_chunks.py）と、それを並べたマニフェスト
 output/animation_data.json に出力する。
 さらに、各害虫×各フレームの等値線PNG画像を生成する。
+フレームごとの入力のハッシュを manifest.json に残し、新しいフレームと入力が変わったフレームだけを描き直す。
+ANIMATION_FORMAT=vector / both では、帯ポリゴンも害虫・年ごとにチャンクへ出力する。
 """
 
+import argparse
 import json
 import os
+import shutil
 import logging
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # GUIバックエンド不要
-import matplotlib.pyplot as plt
-from scipy.interpolate import griddata
 from scipy.ndimage import gaussian_filter
-from datetime import datetime, timedelta, date
-from database import get_connection
+from datetime import timedelta, date
+from database import pooled_connection
+from gdd_store import SPRAY_BASE_TEMP, load_base_temps, sample_cumulative_gdd
+from grid_interpolator import GRID_RESOLUTION, get_interpolator
+from frame_renderer import (ANIMATION_RENDERER, RENDERERS, FrameRenderer, field_digest, field_grid, frame_key,
+                            load_manifest, render_contour_frame, save_manifest)
+from contour_vectors import band_regions, encode_regions, encode_vector_file, vector_transform
+from animation_chunks import frame_version, prune_chunks, write_chunk
+
+# 設定すると、平滑化済みの場を基準温度ごとに <dir>/field_<基準温度>.npy（フレーム × 200 × 200, float32）と
+# bounds_<基準温度>.npy（フレームごとの south, north, west, east）に保存し、後段で再利用できるようにする
+ANIMATION_FIELDS_DIR = os.environ.get('ANIMATION_FIELDS_DIR')
+
+# フレームの出力形式: png（画像）/ vector（帯ポリゴン、contour_vectors.py）/ both
+FRAME_FORMATS = {'png': ('png',), 'vector': ('vector',), 'both': ('png', 'vector')}
+ANIMATION_FORMAT = os.environ.get('ANIMATION_FORMAT', 'png')
+
+
+def weekly_frame_dates(start_date, end_date):
+    """週次サンプリング日（start_date の 6 日後から 7 日おき＋最終日）"""
+    frame_dates = []
+    sample_date = start_date + timedelta(days=6)
+    while sample_date <= end_date:
+        frame_dates.append(sample_date)
+        sample_date += timedelta(days=7)
+    # 最終日を追加（最後のフレームと重複しなければ）
+    if not frame_dates or frame_dates[-1] != end_date:
+        frame_dates.append(end_date)
+    return frame_dates
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 
+def sample_season(conn, start_date, end_date, base_temps):
+    """期間の週次サンプリング日と、その各日の基準温度ごとの累積GDD（sample_cumulative_gdd の戻り値）"""
+    frame_dates = weekly_frame_dates(start_date, end_date)
+    return frame_dates, sample_cumulative_gdd(conn, base_temps, frame_dates, start_date)
 
-def get_weekly_accumulated_temps(conn, start_date, end_date):
+
+def get_weekly_accumulated_temps(conn, start_date, end_date, base_temps, season=None):
     """
-    指定期間の積算温度を週次でサンプリングして返す。
+    指定期間の積算温度（有効積算温度）を週次でサンプリングして返す。
     start_date からゼロスタートで積算する。
+    値は累積GDDストア（gdd_cumulative）から基準温度ごとに 1 回の問い合わせでまとめて取り出す
+    （season に sample_season の結果が渡されればそれを使う）。
     各地点ごとに直近の既知値をキャリーフォワードし、データ欠損を補完する。
-    戻り値: (frame_dates, all_point_coords, frame_data_list)
+    戻り値: (frame_dates, all_point_coords, frame_data)
       - frame_dates: [date, ...]
       - all_point_coords: [(lat, lon), ...]
-      - frame_data_list: [[temp_for_point0, temp_for_point1, ...], ...]  per frame
+      - frame_data: {base_temp: ndarray(フレーム数, 地点数)}（欠測は NaN）
     """
-    start_str = start_date.strftime('%Y-%m-%d')
-    end_str = end_date.strftime('%Y-%m-%d')
-
-    logging.info(f"  期間: {start_str} ~ {end_str}")
-
-    with conn.cursor() as cur:
-        # 各地点の積算温度を計算
-        # GREATEST(0, temperature) でマイナス気温を0に切り上げ → 単調増加を保証
-        cur.execute('''
-            WITH daily_cumsum AS (
-                SELECT
-                    date::date as d,
-                    latitude::numeric as lat,
-                    longitude::numeric as lon,
-                    SUM(GREATEST(0, temperature::numeric)) OVER (
-                        PARTITION BY latitude, longitude
-                        ORDER BY date
-                        ROWS UNBOUNDED PRECEDING
-                    ) as cum_temp
-                FROM temperature_data
-                WHERE date::date >= %s::date AND date::date <= %s::date
-            )
-            SELECT d, lat, lon, cum_temp
-            FROM daily_cumsum
-            ORDER BY lat, lon, d
-        ''', (start_str, end_str))
-
-        # 地点ごとの時系列を構築
-        point_timeseries = {}  # (lat, lon) -> [(date, cum_temp), ...]
-        for row in cur:
-            d = row['d']
-            if isinstance(d, str):
-                d = datetime.strptime(d, '%Y-%m-%d').date()
-            key = (float(row['lat']), float(row['lon']))
-            if key not in point_timeseries:
-                point_timeseries[key] = []
-            point_timeseries[key].append((d, float(row['cum_temp'])))
-
-    if not point_timeseries:
+    logging.info(f"  期間: {start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}")
+
+    if season is None:
+        season = sample_season(conn, start_date, end_date, base_temps)
+    frame_dates, (points, first_dates, values) = season
+
+    if not any(first_dates):
         logging.warning(f"  データがありません")
-        return [], [], []
+        return [], [], {}
 
     # 期間の最初の2週間以内にデータがある地点のみ使用（途中参加の地点を除外）
     # これによりフレーム間で地点数が急変するのを防ぐ
     early_cutoff = start_date + timedelta(days=14)
-    consistent_points = {}
-    excluded = 0
-    for key, ts in point_timeseries.items():
-        first_date = ts[0][0]  # 時系列は日付順
-        if first_date <= early_cutoff:
-            consistent_points[key] = ts
-        else:
-            excluded += 1
-    point_timeseries = consistent_points
+    keep = np.array([first_date is not None and first_date <= early_cutoff for first_date in first_dates])
+    excluded = sum(1 for first_date in first_dates if first_date is not None) - int(keep.sum())
     if excluded > 0:
         logging.info(f"  途中参加の{excluded}地点を除外（最初の2週間以内にデータなし）")
 
-    all_point_coords = sorted(point_timeseries.keys())
+    all_point_coords = [point for point, kept in zip(points, keep) if kept]
     logging.info(f"  使用地点数: {len(all_point_coords)}")
 
-    # 週次サンプリング日を決定
-    frame_dates = []
-    sample_date = start_date + timedelta(days=6)
-    while sample_date <= end_date:
-        frame_dates.append(sample_date)
-        sample_date += timedelta(days=7)
-    # 最終日を追加（最後のフレームと重複しなければ）
-    if not frame_dates or frame_dates[-1] != end_date:
-        frame_dates.append(end_date)
-
-    # 各フレーム×各地点のデータを構築（キャリーフォワード方式）
-    frame_data_list = []
-    for fd in frame_dates:
-        frame_temps = []
-        for (lat, lon) in all_point_coords:
-            ts = point_timeseries[(lat, lon)]
-            # fd 以下の最新データを二分探索で取得
-            val = None
-            lo, hi = 0, len(ts) - 1
-            while lo <= hi:
-                mid = (lo + hi) // 2
-                if ts[mid][0] <= fd:
-                    val = ts[mid][1]
-                    lo = mid + 1
-                else:
-                    hi = mid - 1
-            frame_temps.append(val)
-        frame_data_list.append(frame_temps)
+    # フレーム × 地点の配列（欠測は NaN）
+    frame_data = {base_temp: matrix[:, keep] for base_temp, matrix in values.items()}
 
     # 統計ログ
-    for i, fd in enumerate(frame_dates):
-        valid = sum(1 for t in frame_data_list[i] if t is not None)
-        total = len(all_point_coords)
+    valid_counts = np.count_nonzero(~np.isnan(frame_data[float(base_temps[0])]), axis=1)
+    total = len(all_point_coords)
+    for fd, valid in zip(frame_dates, valid_counts):
         if valid < total:
             logging.info(f"  {fd}: {valid}/{total} 地点にデータあり")
 
     logging.info(f"  フレーム数: {len(frame_dates)}")
-    return frame_dates, all_point_coords, frame_data_list
+    return frame_dates, all_point_coords, frame_data
+
+
+def remap_index(src_coords, dst_coords):
+    """src_coords の各地点の dst_coords での位置（dst_coords は昇順で、src_coords の全地点を含む）"""
+    if not src_coords:
+        return np.zeros(0, dtype=int)
+    dst = np.array(dst_coords, dtype=[('lat', float), ('lon', float)])
+    src = np.array(src_coords, dtype=dst.dtype)
+    return np.searchsorted(dst, src)
 
 
 def load_pests_from_json():
@@ -147,63 +121,153 @@ def load_pests_from_json():
         return []
 
 
-def generate_contour_frame(lat_arr, lon_arr, temp_arr, levels, colors, output_path):
+def pest_levels(pest):
+    """pests.json の閾値から等値線のレベルと色（value 昇順・重複なし）"""
+    seen = set()
+    thresholds_sorted = []
+    for t in sorted(pest['thresholds'], key=lambda t: t['value']):
+        if t['value'] not in seen:
+            thresholds_sorted.append(t)
+            seen.add(t['value'])
+    levels = [t['value'] for t in thresholds_sorted]
+    colors_list = [t['color'] for t in thresholds_sorted]
+
+    if len(levels) < 2:
+        levels = [0, 5000]
+        colors_list = ['#CCCCCC', '#FF0000']
+    return levels, colors_list
+
+
+def smoothed_field(lat_arr, lon_arr, temp_arr):
     """
-    1フレーム分の等値線PNG画像を生成する。
-    不均一グリッドに対応するため、linear補間 → nearest補間でNaN穴埋め。
+    等値線を描く 200x200 の場 (grid_lat, grid_lon, grid_temp) を求める。
+    不均一グリッドに対応するため、linear補間 → nearest補間でNaN穴埋めし、平滑化する。
     """
-    # グリッド生成と補間（200x200で高解像度）
-    grid_lat, grid_lon = np.mgrid[
-        min(lat_arr):max(lat_arr):200j,
-        min(lon_arr):max(lon_arr):200j
-    ]
-
-    # 1) linear補間（滑らかだがデータ外縁でNaNになりやすい）
-    grid_temp = griddata(
-        (lat_arr, lon_arr), temp_arr,
-        (grid_lat, grid_lon), method="linear"
-    )
-    # 2) NaN部分をnearest補間で穴埋め（データ外縁を補完）
-    nan_mask = np.isnan(grid_temp)
-    if np.any(nan_mask):
-        grid_nearest = griddata(
-            (lat_arr, lon_arr), temp_arr,
-            (grid_lat, grid_lon), method="nearest"
-        )
-        grid_temp[nan_mask] = grid_nearest[nan_mask]
+    # 1) 2) linear補間 + データ外縁のnearest穴埋め（同じ地点集合では補間器を使い回す）
+    interpolator = get_interpolator(lat_arr, lon_arr)
+    grid_temp = interpolator(temp_arr)
 
     # 3) ガウシアンスムージングで等値線を滑らかにする
     #    sigma=4: 気象データ可視化の標準的な平滑化レベル
     grid_temp = gaussian_filter(grid_temp, sigma=4)
+    return interpolator.grid_lat, interpolator.grid_lon, grid_temp
+
+
+def open_field_store(base_temp, total_frames, fields_dir=None):
+    """平滑化済みの場の保存先（メモリマップ）。スキップしたフレームは NaN のまま"""
+    fields_dir = fields_dir or ANIMATION_FIELDS_DIR
+    os.makedirs(fields_dir, exist_ok=True)
+    fields = np.lib.format.open_memmap(
+        os.path.join(fields_dir, f"field_{base_temp:g}.npy"), mode='w+', dtype=np.float32,
+        shape=(total_frames, GRID_RESOLUTION, GRID_RESOLUTION)
+    )
+    bounds = np.lib.format.open_memmap(
+        os.path.join(fields_dir, f"bounds_{base_temp:g}.npy"), mode='w+', dtype=np.float64,
+        shape=(total_frames, 4)
+    )
+    fields[:] = np.nan
+    bounds[:] = np.nan
+    return fields, bounds
+
 
-    # 等値線画像を描画
-    fig, ax = plt.subplots(figsize=(8, 6))
+def generate_contour_frame(lat_arr, lon_arr, temp_arr, levels, colors, output_path):
+    """1フレーム分の等値線PNG画像を生成する"""
+    grid_lat, grid_lon, grid_temp = smoothed_field(lat_arr, lon_arr, temp_arr)
+    render_contour_frame(grid_lat, grid_lon, grid_temp, levels, colors, output_path)
+
+
+def render_png_frames(renderer, pest_specs, grid_fields, grid_bounds, digests, output_dir, label=''):
+    """害虫ごとのフレーム PNG（output/animation_frames/<害虫ID>/frame_XXX.png）を描く。
+    pest_specs: [(害虫ID, levels, colors), ...]、digests: フレームごとの field_digest（スキップしたフレームは None）。
+    入力のハッシュが manifest と同じで PNG もあるフレームは描き直さない。
+    戻り値: {害虫ID: フレームごとの frame_key（フレームがなければ None）}"""
+    targets, manifests = [], []
+    for pest_id, levels, colors_list in pest_specs:
+        frames_dir = os.path.join(output_dir, 'animation_frames', pest_id)
+        os.makedirs(frames_dir, exist_ok=True)
+        manifest = load_manifest(frames_dir)
+        new_manifest, to_render, to_copy = {}, [], []
+        prev_key = None
+        for i, digest in enumerate(digests):
+            name = f"frame_{i:03d}.png"
+            if digest is not None:
+                key = frame_key(digest, levels, colors_list, renderer.style)
+                pending = to_render
+            else:
+                # スキップしたフレームは前のフレームのコピー
+                key = f"copy:{prev_key}" if prev_key else None
+                pending = to_copy
+            if key is None:
+                continue
+            if manifest.get(name) != key or not os.path.exists(os.path.join(frames_dir, name)):
+                pending.append(i)
+            new_manifest[name] = key
+            prev_key = key
+        targets.append((levels, colors_list, frames_dir, to_render))
+        manifests.append((frames_dir, new_manifest, to_copy))
+    stale = sum(len(t[3]) for t in targets) + sum(len(m[2]) for m in manifests)
+    kept = sum(len(m[1]) for m in manifests) - stale
+    logging.info(f"  {label}: {stale} 枚を更新、{kept} 枚は前回のまま")
+
+    renderer.render(grid_fields, grid_bounds, targets, label=label)
+
+    keys = {}
+    for (pest_id, _, _), (frames_dir, new_manifest, to_copy) in zip(pest_specs, manifests):
+        for i in to_copy:
+            shutil.copy2(os.path.join(frames_dir, f"frame_{i-1:03d}.png"),
+                         os.path.join(frames_dir, f"frame_{i:03d}.png"))
+        save_manifest(frames_dir, new_manifest)
+        keys[pest_id] = [new_manifest.get(f"frame_{i:03d}.png") for i in range(len(digests))]
+    return keys
+
+
+def vector_frames(pest_specs, grid_fields, grid_bounds, digests, transforms):
+    """害虫ごとの全フレームの帯ポリゴン（フレーム i は transforms[i] で量子化、
+    スキップしたフレームは前のフレームと同じ）。戻り値: {害虫ID: [フレーム, ...]}"""
+    result = {}
+    for pest_id, levels, colors_list in pest_specs:
+        frames = []
+        for i, digest in enumerate(digests):
+            if digest is None:
+                frames.append(frames[-1] if frames else [])
+                continue
+            grid_lat, grid_lon = field_grid(grid_bounds[i])
+            frames.append(encode_regions(band_regions(grid_lat, grid_lon, grid_fields[i], levels), transforms[i]))
+        result[pest_id] = frames
+    return result
+
+
+def season_bounds(coords):
+    """地点の範囲 (south, north, west, east)"""
+    lat = [c[0] for c in coords]
+    lon = [c[1] for c in coords]
+    return min(lat), max(lat), min(lon), max(lon)
+
+
+def write_manifest(output_dir, manifest):
+    """マニフェスト（animation_data.json）を書き、参照されなくなったチャンクを消す
+    （直前のマニフェストが参照するものは、更新前のページのために残す）"""
+    output_path = os.path.join(output_dir, 'animation_data.json')
     try:
-        # colorsの数をlevelsの数-1に揃える
-        fill_colors = list(colors)
-        if len(fill_colors) > len(levels) - 1:
-            fill_colors = fill_colors[:len(levels) - 1]
-        elif len(fill_colors) < len(levels) - 1:
-            fill_colors += [fill_colors[-1]] * (len(levels) - 1 - len(fill_colors))
-
-        ax.contourf(grid_lon, grid_lat, grid_temp,
-                     levels=levels, colors=fill_colors, alpha=0.7, extend='both')
-        lines = ax.contour(grid_lon, grid_lat, grid_temp,
-                            levels=levels, colors='black', linewidths=0.5)
-        ax.clabel(lines, inline=True, fontsize=8, fmt="%.0f")
-    except Exception as e:
-        # データ範囲が閾値をカバーしていない場合はベタ塗り
-        ax.contourf(grid_lon, grid_lat, grid_temp,
-                     levels=50, cmap='RdYlGn_r', alpha=0.7)
-
-    ax.axis('off')
-    plt.savefig(output_path, bbox_inches="tight", pad_inches=0,
-                transparent=True, dpi=72)
-    plt.close(fig)
-
-
-def generate_animation_data():
-    """アニメーションデータを生成してJSONファイルと等値線画像を出力する"""
+        with open(output_path, encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    with open(output_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(output_path + '.tmp', output_path)
+    removed = prune_chunks(output_dir, manifest, previous)
+    if removed:
+        logging.info(f"参照されなくなったチャンクのファイルを {removed} 個削除")
+    return output_path
+
+
+def generate_animation_data(current_season=None, renderer_name=None, frame_format=None):
+    """アニメーションデータを生成してJSONファイルと等値線画像を出力する。
+    current_season は今年分の sample_season の結果（パイプラインで他のステージと共有する場合）。
+    renderer_name はフレームの描画方法（raster / matplotlib、既定は ANIMATION_RENDERER）。
+    frame_format はフレームの出力形式（png / vector / both、既定は ANIMATION_FORMAT）。
+    戻り値: 出力したフレーム数 × 地点数"""
     today = date.today()
     yesterday = today - timedelta(days=1)
     prev_year = today.year - 1
@@ -215,45 +279,43 @@ def generate_animation_data():
     curr_end = yesterday
 
     logging.info("=== アニメーションデータ生成開始 ===")
+    formats = FRAME_FORMATS[frame_format or ANIMATION_FORMAT]
+
+    pests = load_pests_from_json()
+    if not pests:
+        logging.error("害虫データが見つかりません")
+        return 0
+    # 全害虫の基準温度と薬剤用の 0℃ をまとめて取り出す
+    base_temps = load_base_temps()
 
-    with get_connection() as conn:
+    with pooled_connection() as conn:
         logging.info(f"前年({prev_year})の積算温度を計算中...")
-        prev_dates, prev_coords, prev_data = get_weekly_accumulated_temps(conn, prev_start, prev_end)
+        prev_dates, prev_coords, prev_data = get_weekly_accumulated_temps(conn, prev_start, prev_end, base_temps)
 
         logging.info(f"今年({curr_year})の積算温度を計算中...")
-        curr_dates, curr_coords, curr_data = get_weekly_accumulated_temps(conn, curr_start, curr_end)
+        curr_dates, curr_coords, curr_data = get_weekly_accumulated_temps(conn, curr_start, curr_end, base_temps,
+                                                                          season=current_season)
 
     if not prev_dates and not curr_dates:
         logging.error("フレームデータがありません")
-        return
+        return 0
 
     # 全地点の統合（前年と今年で地点が異なる可能性に対応）
     all_point_set = set(prev_coords) | set(curr_coords)
     all_point_coords = sorted(all_point_set)
     logging.info(f"統合地点数: {len(all_point_coords)}")
 
-    # 前年・今年のデータを地点インデックスでマッピング
-    def remap_data(src_coords, src_data_list, dst_coords):
-        """元の地点リストから統合地点リストへのマッピング"""
-        idx_map = {coord: i for i, coord in enumerate(src_coords)}
-        remapped = []
-        for frame_temps in src_data_list:
-            new_temps = []
-            for coord in dst_coords:
-                src_i = idx_map.get(coord)
-                if src_i is not None:
-                    new_temps.append(frame_temps[src_i])
-                else:
-                    new_temps.append(None)
-            remapped.append(new_temps)
-        return remapped
-
-    prev_remapped = remap_data(prev_coords, prev_data, all_point_coords) if prev_dates else []
-    curr_remapped = remap_data(curr_coords, curr_data, all_point_coords) if curr_dates else []
-
-    # フレームを結合
+    # フレームを結合（基準温度ごとにフレーム × 統合地点の配列、その年にない地点は NaN）
     all_dates = [d.strftime('%Y-%m-%d') for d in prev_dates] + [d.strftime('%Y-%m-%d') for d in curr_dates]
-    all_frame_data = prev_remapped + curr_remapped
+    all_frame_data = {}
+    for base_temp in base_temps:
+        merged = np.full((len(all_dates), len(all_point_coords)), np.nan)
+        start = 0
+        for dates, coords, data in ((prev_dates, prev_coords, prev_data), (curr_dates, curr_coords, curr_data)):
+            if dates:
+                merged[start:start + len(dates), remap_index(coords, all_point_coords)] = data[base_temp]
+            start += len(dates)
+        all_frame_data[base_temp] = merged
     year_boundary_index = len(prev_dates)
     total_frames = len(all_dates)
 
@@ -261,11 +323,6 @@ def generate_animation_data():
     os.makedirs(output_dir, exist_ok=True)
 
     # === 害虫ごとの等値線フレーム画像を生成 ===
-    pests = load_pests_from_json()
-    if not pests:
-        logging.error("害虫データが見つかりません")
-        return
-
     # 全座標配列
     all_lat = np.array([p[0] for p in all_point_coords])
     all_lon = np.array([p[1] for p in all_point_coords])
@@ -278,87 +335,114 @@ def generate_animation_data():
         "east": float(np.max(all_lon))
     }
 
-    pest_ids = []
-    for pest in pests:
-        pest_id = pest['id']
-        pest_ids.append(pest_id)
-        thresholds = pest['thresholds']
-
-        # 閾値・色を整理
-        seen = set()
-        thresholds_sorted = []
-        for t in sorted(thresholds, key=lambda t: t['value']):
-            if t['value'] not in seen:
-                thresholds_sorted.append(t)
-                seen.add(t['value'])
-        levels = [t['value'] for t in thresholds_sorted]
-        colors_list = [t['color'] for t in thresholds_sorted]
-
-        if len(levels) < 2:
-            levels = [0, 5000]
-            colors_list = ['#CCCCCC', '#FF0000']
-
-        frames_dir = os.path.join(output_dir, 'animation_frames', pest_id)
-        os.makedirs(frames_dir, exist_ok=True)
-
-        logging.info(f"害虫 {pest['name']} ({pest_id}) のフレーム画像を生成中... ({total_frames}枚)")
-
-        for i in range(total_frames):
-            frame_path = os.path.join(frames_dir, f"frame_{i:03d}.png")
-            frame_temps = all_frame_data[i]
-
-            # 有効なデータのみを抽出（None を除外）
-            valid_mask = [t is not None for t in frame_temps]
-            valid_lat = all_lat[valid_mask]
-            valid_lon = all_lon[valid_mask]
-            valid_temp = np.array([t for t in frame_temps if t is not None])
-
-            if len(valid_temp) < 10:
-                logging.warning(f"  {pest_id}: frame {i} ({all_dates[i]}) 有効地点が{len(valid_temp)}のみ - スキップ")
-                # 前のフレームをコピー
-                if i > 0:
-                    prev_path = os.path.join(frames_dir, f"frame_{i-1:03d}.png")
-                    if os.path.exists(prev_path):
-                        import shutil
-                        shutil.copy2(prev_path, frame_path)
-                continue
+    pest_ids = [pest['id'] for pest in pests]
 
-            generate_contour_frame(valid_lat, valid_lon, valid_temp,
-                                    levels, colors_list, frame_path)
-
-            if (i + 1) % 10 == 0:
-                logging.info(f"  {pest_id}: {i + 1}/{total_frames} フレーム完了")
-
-        logging.info(f"  {pest_id}: 全 {total_frames} フレーム完了")
-
-    # JSON出力用: 地点ごとの温度配列（None → 0 に変換）
-    point_temps_json = []
-    for j, (lat, lon) in enumerate(all_point_coords):
-        temps = []
-        for i in range(total_frames):
-            val = all_frame_data[i][j]
-            temps.append(round(val, 1) if val is not None else 0)
-        point_temps_json.append([lat, lon, temps])
+    # 補間・平滑化した場は害虫に依らず基準温度とフレームで決まるので、
+    # 基準温度ごとに各フレームの場を 1 回だけ求め、その基準温度の全害虫の描画に使う
+    pests_by_base = {}
+    for pest in pests:
+        pests_by_base.setdefault(float(pest['base_temp']), []).append(pest)
+
+    # 年（シーズン）ごとのチャンクに分けて出力する。フレーム番号は古い年から続けて振る
+    seasons = [(year, dates, coords, data) for year, dates, coords, data in
+               ((prev_year, prev_dates, prev_coords, prev_data), (curr_year, curr_dates, curr_coords, curr_data))
+               if dates]
+    # 帯ポリゴンはその年の地点の範囲で量子化する（他の年の地点が増減しても過去のチャンクは変わらない）
+    transforms = []
+    for _, dates, coords, _ in seasons:
+        transforms += [vector_transform(season_bounds(coords), GRID_RESOLUTION)] * len(dates)
+    frame_keys, vectors = {}, {}
+
+    # 場はこのプロセスで求め、(害虫, フレーム) の描画は FrameRenderer が複数コアに分配する
+    with FrameRenderer(renderer=renderer_name or ANIMATION_RENDERER) as renderer:
+        for base_temp, base_pests in pests_by_base.items():
+            frame_data = all_frame_data[base_temp]
+            pest_specs = [(pest['id'], *pest_levels(pest)) for pest in base_pests]
+            logging.info(f"基準温度 {base_temp}℃ の害虫 {', '.join(p['name'] for p in base_pests)} の"
+                         f"フレームを生成中... ({total_frames}枚 × {len(base_pests)}, {'+'.join(formats)})")
+
+            grid_fields = np.full((total_frames, GRID_RESOLUTION, GRID_RESOLUTION), np.nan)
+            grid_bounds = np.full((total_frames, 4), np.nan)
+            digests = [None] * total_frames
+            for i in range(total_frames):
+                frame_temps = frame_data[i]
+
+                # 有効なデータのみを抽出（NaN を除外）
+                valid_mask = ~np.isnan(frame_temps)
+                valid_lat = all_lat[valid_mask]
+                valid_lon = all_lon[valid_mask]
+                valid_temp = frame_temps[valid_mask]
+
+                if len(valid_temp) < 10:
+                    logging.warning(f"  {base_temp}℃: frame {i} ({all_dates[i]}) 有効地点が{len(valid_temp)}のみ - スキップ")
+                    continue
+
+                _, _, grid_fields[i] = smoothed_field(valid_lat, valid_lon, valid_temp)
+                grid_bounds[i] = [valid_lat.min(), valid_lat.max(), valid_lon.min(), valid_lon.max()]
+                digests[i] = field_digest(grid_fields[i], grid_bounds[i])
+
+            if ANIMATION_FIELDS_DIR:
+                fields, field_bounds = open_field_store(base_temp, total_frames)
+                fields[:] = grid_fields
+                field_bounds[:] = grid_bounds
+                fields.flush()
+                field_bounds.flush()
+
+            if 'png' in formats:
+                frame_keys.update(render_png_frames(renderer, pest_specs, grid_fields, grid_bounds, digests,
+                                                    output_dir, label=f"{base_temp}℃"))
+            if 'vector' in formats:
+                vectors.update(vector_frames(pest_specs, grid_fields, grid_bounds, digests, transforms))
+            logging.info(f"  {base_temp}℃: 全 {total_frames} フレーム完了")
+
+    # 年ごとのチャンク（日付・地点ごとの温度（基準温度 0℃、None は欠測）・帯ポリゴン・フレーム PNG の版）を
+    # 内容のハッシュを含む名前で書き、マニフェストにはそれを並べる
+    levels_by_pest = {pest['id']: pest_levels(pest) for pest in pests}
+    chunks = []
+    start = 0
+    for year, dates, coords, data in seasons:
+        end = start + len(dates)
+        chunks.append(write_chunk(
+            output_dir, year,
+            [d.strftime('%Y-%m-%d') for d in dates],
+            coords,
+            data[SPRAY_BASE_TEMP].T,
+            vectors={pest_id: encode_vector_file(frames[start:end], *levels_by_pest[pest_id], transforms[start])
+                     for pest_id, frames in vectors.items()},
+            frame_versions={pest_id: [frame_version(key) for key in keys[start:end]]
+                            for pest_id, keys in frame_keys.items()},
+        ))
+        logging.info(f"チャンク出力: {chunks[-1]['file']} ({len(dates)} フレーム)")
+        start = end
 
     output = {
-        "dates": all_dates,
         "year_boundary_index": year_boundary_index,
         "bounds": bounds,
         "pest_ids": pest_ids,
         "total_frames": total_frames,
-        "points": point_temps_json
+        "frame_formats": list(formats),
+        "chunks": chunks,
     }
-
-    output_path = os.path.join(output_dir, 'animation_data.json')
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output, f)
+    output_path = write_manifest(output_dir, output)
 
     file_size = os.path.getsize(output_path)
-    logging.info(f"JSON出力: {output_path} ({file_size / 1024:.0f} KB)")
+    logging.info(f"マニフェスト出力: {output_path} ({file_size / 1024:.1f} KB)")
     logging.info(f"フレーム総数: {total_frames}, 地点数: {len(all_point_coords)}")
     logging.info(f"害虫数: {len(pest_ids)}, フレーム画像総数: {len(pest_ids) * total_frames}")
     logging.info("=== アニメーションデータ生成完了 ===")
+    return total_frames * len(all_point_coords)
 
 
 if __name__ == "__main__":
-    generate_animation_data()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()]
+    )
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renderer', choices=RENDERERS, default=ANIMATION_RENDERER,
+                        help='フレームの描画方法（raster: 高速な帯塗り、matplotlib: ラベル付きの等値線）')
+    parser.add_argument('--format', choices=FRAME_FORMATS, default=ANIMATION_FORMAT,
+                        help='フレームの出力形式（png: 画像、vector: 帯ポリゴンの JSON、both: 両方）')
+    args = parser.parse_args()
+    generate_animation_data(renderer_name=args.renderer, frame_format=args.format)
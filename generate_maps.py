@@ -5,8 +5,9 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.colors import LinearSegmentedColormap
 import numpy as np
-from database import Database, get_connection
-from datetime import datetime
+from database import Database
+from gdd_store import sample_cumulative_gdd
+from datetime import date
 
 def load_pests_from_database():
     """データベースから害虫データを読み込み"""
@@ -40,38 +41,43 @@ def get_risk_level(cumtemp):
     else:
         return '極高リスク'
 
-def generate_pest_map(pest):
-    """害虫ごとの地図を生成"""
-    db = Database()
+def load_season_gdd(base_temps, db=None):
+    """今年1月1日から今日までの有効積算温度を、基準温度ごとにまとめて累積GDDストアから取得
+    戻り値: (points, {base_temp: [地点ごとの値（欠測は NaN）]})"""
+    today = date.today()
+    db = db or Database()
+    with db.connection() as conn:
+        points, _, values = sample_cumulative_gdd(conn, base_temps, [today], date(today.year, 1, 1))
+    return points, {base_temp: matrix[0] for base_temp, matrix in values.items()}
+
+def pest_map_path(pest):
+    """害虫マップの出力先（output/<ローマ字ID>_map.html）"""
+    # 害虫名からローマ字IDへのマッピング（index.htmlと一致させる）
+    pest_id_map = {
+        'シバツトガ': 'shibatuga',
+        'スジキリヨトウ': 'sujikiri',
+        'マメコガネ': 'mamekogane',
+        'タマナヤガ': 'tamanayaga',
+        'ダラースポット': 'dollerspot',
+        'スズメノカタビラ': 'katabira',
+    }
     
-    # 最新の積算温度データを取得
-    try:
-        # 最新の日付を取得
-        latest_date = datetime.now().strftime('%Y-%m-%d')
-        
-        # 積算温度データを取得（最新日付のみ）
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute('''
-                    SELECT latitude, longitude, accumulated_temp
-                    FROM accumulated_temperature
-                    WHERE date = %s
-                    ORDER BY latitude, longitude
-                ''', (latest_date,))
-                data = cur.fetchall()
-    except Exception as e:
-        print(f"Error fetching accumulated temperature data: {e}")
-        return
+    # ファイル名を生成（ローマ字IDを使用、見つからない場合は日本語名をそのまま使用）
+    pest_name = pest['name']
+    pest_id = pest_id_map.get(pest_name.strip(), pest_name.replace(' ', '_').replace('/', '_'))
     
+    output_base = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
+    return os.path.join(output_base, f"{pest_id}_map.html")
+
+def generate_pest_map(pest, points, cumtemps):
+    """害虫ごとの地図を生成（cumtemps は害虫の基準温度での地点ごとの有効積算温度）"""
     pest_name = pest['name']
     
     # 地図初期化（日本中心）
     m = folium.Map(location=[36.0, 138.0], zoom_start=5)
     
-    for row in data:
-        lat, lon, cumtemp = row['latitude'], row['longitude'], row['accumulated_temp']
-        
-        if cumtemp is None:
+    for (lat, lon), cumtemp in zip(points, cumtemps):
+        if np.isnan(cumtemp):
             continue
             
         risk_level = get_risk_level(cumtemp)
@@ -97,24 +103,9 @@ def generate_pest_map(pest):
             popup=popup,
         ).add_to(m)
     
-    # 害虫名からローマ字IDへのマッピング（index.htmlと一致させる）
-    pest_id_map = {
-        'シバツトガ': 'shibatuga',
-        'スジキリヨトウ': 'sujikiri',
-        'マメコガネ': 'mamekogane',
-        'タマナヤガ': 'tamanayaga',
-        'ダラースポット': 'dollerspot',
-        'スズメノカタビラ': 'katabira',
-    }
-    
-    # ファイル名を生成（ローマ字IDを使用、見つからない場合は日本語名をそのまま使用）
-    pest_id = pest_id_map.get(pest_name.strip(), pest_name.replace(' ', '_').replace('/', '_'))
-    
-    # 出力先ディレクトリ
-    output_base = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
-    os.makedirs(output_base, exist_ok=True)
-    
-    output_map = os.path.join(output_base, f"{pest_id}_map.html")
+    # 出力先
+    output_map = pest_map_path(pest)
+    os.makedirs(os.path.dirname(output_map), exist_ok=True)
 
     # 地図を保存
     m.save(output_map)
@@ -122,23 +113,43 @@ def generate_pest_map(pest):
     
     # 凡例は plot_cumtemp_contours_folium.py で生成するため、ここでは作成しない
 
-def main():
-    """メイン処理"""
+def generate_all_maps(pests=None, season_gdd=None, db=None):
+    """全害虫の地図を生成する。pests は get_pests() の行（基準温度は threshold_temp）。
+    season_gdd は load_season_gdd と同じ形の
+    (points, {base_temp: 値}) で、渡されれば DB から読み直さない（パイプラインでの共有用）。
+    戻り値: 描画した地点数の合計"""
     # データベースから害虫データを読み込み
-    pests = load_pests_from_database()
+    pests = pests if pests is not None else load_pests_from_database()
     
     if not pests:
         print("害虫データが見つかりません。")
-        return
+        return 0
     
     print(f"読み込んだ害虫数: {len(pests)}")
     
-    # 各害虫の地図を生成
+    # 全害虫の基準温度の有効積算温度を 1 回で取得
+    if season_gdd is None:
+        try:
+            season_gdd = load_season_gdd(sorted({float(pest['threshold_temp']) for pest in pests}), db=db)
+        except Exception as e:
+            print(f"Error fetching accumulated temperature data: {e}")
+            return 0
+    points, values = season_gdd
+    
+    # 各害虫の地図を生成（ストアにない基準温度は全地点欠測）
+    plotted = 0
     for pest in pests:
         print(f"\n{pest['name']}の地図を生成中...")
-        generate_pest_map(pest)
+        cumtemps = values.get(float(pest['threshold_temp']), np.full(len(points), np.nan))
+        generate_pest_map(pest, points, cumtemps)
+        plotted += int(np.count_nonzero(~np.isnan(cumtemps)))
     
     print("\n[完了] すべての害虫地図の生成が完了しました！")
+    return plotted
+
+def main():
+    """メイン処理"""
+    generate_all_maps()
 
 if __name__ == "__main__":
     main()
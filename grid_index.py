@@ -0,0 +1,145 @@
+"""
+グリッドポイントの空間インデックス。
+
+data/grid_points.csv（1°間隔・陸域のみ）の地点をセル単位のバケットに分け、
+任意の緯度経度から最寄りのグリッド地点を数マイクロ秒で引けるようにする。
+/api/gdd はこの地点に丸めてから (latitude, longitude, date) インデックスで
+DB を引くため、テーブル全体の走査が不要になる。
+
+グリッド上にない座標は、周囲のグリッド地点の重み（四隅が揃えば双一次補間、
+そうでなければ近傍地点の逆距離加重）で補間する。重みは座標ごとにキャッシュする。
+"""
+
+import csv
+import math
+import os
+import threading
+from functools import lru_cache
+
+GRID_POINTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'grid_points.csv')
+
+# 最寄りグリッド地点として採用する最大距離（km）。これより遠ければ NASA POWER に直接問い合わせる
+GRID_MAX_DISTANCE_KM = float(os.environ.get("GRID_MAX_DISTANCE_KM", "80"))
+
+# 逆距離加重で使う近傍地点数とべき指数
+IDW_NEIGHBORS = 4
+IDW_POWER = 2
+
+KM_PER_DEGREE = 111.195
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """2 点間の距離（km、正距円筒近似。グリッド間隔程度の距離なら十分な精度）"""
+    mean_lat = math.radians((lat1 + lat2) / 2.0)
+    dy = lat2 - lat1
+    dx = (lon2 - lon1) * math.cos(mean_lat)
+    return KM_PER_DEGREE * math.hypot(dx, dy)
+
+
+class GridIndex:
+    """セル分割による最近傍探索"""
+
+    def __init__(self, points, cell=1.0):
+        self.cell = cell
+        self.points = [(float(lat), float(lon)) for lat, lon in points]
+        self._exact = set(self.points)
+        self._buckets = {}
+        for lat, lon in self.points:
+            self._buckets.setdefault(self._cell_of(lat, lon), []).append((lat, lon))
+        self._cached_weights = lru_cache(maxsize=8192)(self._weights)
+
+    @classmethod
+    def from_csv(cls, path=GRID_POINTS_CSV, cell=1.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            points = [(float(row['lat']), float(row['lon'])) for row in csv.DictReader(f)]
+        return cls(points, cell=cell)
+
+    def _cell_of(self, lat, lon):
+        return (math.floor(lat / self.cell), math.floor(lon / self.cell))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, point):
+        return (float(point[0]), float(point[1])) in self._exact
+
+    def nearest(self, lat, lon, k=1, max_distance_km=None):
+        """最寄りの k 地点を [(lat, lon, distance_km), ...]（近い順）で返す"""
+        if not self.points:
+            return []
+        ci, cj = self._cell_of(lat, lon)
+        found = []
+        max_ring = int(180 / self.cell) + 1
+        for ring in range(max_ring):
+            for i in range(ci - ring, ci + ring + 1):
+                for j in range(cj - ring, cj + ring + 1):
+                    if max(abs(i - ci), abs(j - cj)) != ring:
+                        continue
+                    for plat, plon in self._buckets.get((i, j), ()):
+                        found.append((plat, plon, distance_km(lat, lon, plat, plon)))
+            if len(found) >= k:
+                found.sort(key=lambda p: p[2])
+                # リング ring+1 以降の地点は少なくとも ring セル分離れている
+                cos_min = math.cos(math.radians(min(89.0, abs(lat) + (ring + 1) * self.cell)))
+                lower_bound = ring * self.cell * KM_PER_DEGREE * cos_min
+                if found[k - 1][2] <= lower_bound:
+                    break
+            if max_distance_km is not None and ring > 0:
+                cos_min = math.cos(math.radians(min(89.0, abs(lat) + (ring + 1) * self.cell)))
+                if ring * self.cell * KM_PER_DEGREE * cos_min > max_distance_km:
+                    break
+        found.sort(key=lambda p: p[2])
+        if max_distance_km is not None:
+            found = [p for p in found if p[2] <= max_distance_km]
+        return found[:k]
+
+    def snap(self, lat, lon, max_distance_km=GRID_MAX_DISTANCE_KM):
+        """最寄りのグリッド地点 (lat, lon)。max_distance_km 以内になければ None"""
+        if (lat, lon) in self._exact:
+            return (float(lat), float(lon))
+        match = self.nearest(lat, lon, k=1, max_distance_km=max_distance_km)
+        return (match[0][0], match[0][1]) if match else None
+
+    def weights(self, lat, lon, max_distance_km=GRID_MAX_DISTANCE_KM):
+        """座標を補間するためのグリッド地点と重み [(lat, lon, weight), ...]（重みの合計は 1）。
+        近くにグリッド地点がなければ空リスト"""
+        return self._cached_weights(round(float(lat), 4), round(float(lon), 4), max_distance_km)
+
+    def _weights(self, lat, lon, max_distance_km):
+        if (lat, lon) in self._exact:
+            return ((lat, lon, 1.0),)
+
+        # 四隅のグリッド地点が揃っていれば双一次補間
+        lat0 = math.floor(lat / self.cell) * self.cell
+        lon0 = math.floor(lon / self.cell) * self.cell
+        lat1, lon1 = lat0 + self.cell, lon0 + self.cell
+        corners = [(lat0, lon0), (lat0, lon1), (lat1, lon0), (lat1, lon1)]
+        if all(c in self._exact for c in corners):
+            ty = (lat - lat0) / self.cell
+            tx = (lon - lon0) / self.cell
+            bilinear = [(1 - ty) * (1 - tx), (1 - ty) * tx, ty * (1 - tx), ty * tx]
+            return tuple((c[0], c[1], w) for c, w in zip(corners, bilinear) if w > 0)
+
+        # 海岸沿いなど四隅が欠ける場所は近傍地点の逆距離加重
+        neighbors = self.nearest(lat, lon, k=IDW_NEIGHBORS, max_distance_km=max_distance_km)
+        if not neighbors:
+            return ()
+        if neighbors[0][2] < 1e-6:
+            return ((neighbors[0][0], neighbors[0][1], 1.0),)
+        raw = [1.0 / (d ** IDW_POWER) for _, _, d in neighbors]
+        total = sum(raw)
+        return tuple((p[0], p[1], w / total) for p, w in zip(neighbors, raw))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_grid_index():
+    """プロセス共通のグリッドインデックス（初回に CSV から構築）"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = GridIndex.from_csv()
+    return _index
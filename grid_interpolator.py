@@ -0,0 +1,88 @@
+"""
+等値線描画用の再利用できる補間器。
+
+scipy.interpolate.griddata(method="linear") → NaN 部分を method="nearest" で穴埋め、と
+同じ結果を、地点集合ごとに 1 回だけ作る疎行列（目標グリッド × 地点）で求める。
+  - Delaunay 三角形分割と、目標グリッドの各点を含む三角形の重心座標 → 線形補間の重み
+  - 凸包の外の点は最寄り地点（cKDTree）の重み 1
+フレームごとの補間は 1 回の疎行列 × ベクトル積になり、三角形分割の作り直しがなくなる。
+scipy は補間器を作るときに読み込む（GRID_RESOLUTION だけを使う描画プロセスなどの起動を軽くする）。
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 目標グリッドの 1 辺の点数（従来の np.mgrid[...:200j, ...:200j] と同じ）
+GRID_RESOLUTION = 200
+
+
+class GridInterpolator:
+    """地点 (lat, lon) から min～max の範囲の resolution × resolution グリッドへの補間"""
+
+    def __init__(self, lat, lon, resolution=GRID_RESOLUTION):
+        from scipy.sparse import csr_matrix
+        from scipy.spatial import Delaunay, QhullError, cKDTree
+
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        points = np.column_stack([lat, lon])
+        step = complex(0, resolution)
+        self.grid_lat, self.grid_lon = np.mgrid[lat.min():lat.max():step, lon.min():lon.max():step]
+        self.shape = self.grid_lat.shape
+        self.n_points = len(points)
+        targets = np.column_stack([self.grid_lat.ravel(), self.grid_lon.ravel()])
+
+        try:
+            tri = Delaunay(points)
+            simplex = tri.find_simplex(targets)
+        except (QhullError, ValueError):
+            # 地点が 3 未満・一直線上なら全点を最寄り地点で埋める
+            tri, simplex = None, np.full(len(targets), -1)
+        inside = np.flatnonzero(simplex >= 0)
+        outside = np.flatnonzero(simplex < 0)
+
+        rows, cols, weights = [], [], []
+        if len(inside):
+            transform = tri.transform[simplex[inside]]
+            b = np.einsum('ijk,ik->ij', transform[:, :2], targets[inside] - transform[:, 2])
+            rows.append(np.repeat(inside, 3))
+            cols.append(tri.simplices[simplex[inside]].ravel())
+            weights.append(np.column_stack([b, 1.0 - b.sum(axis=1)]).ravel())
+        if len(outside):
+            _, nearest = cKDTree(points).query(targets[outside])
+            rows.append(outside)
+            cols.append(nearest)
+            weights.append(np.ones(len(outside)))
+        self.weights = csr_matrix(
+            (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(len(targets), self.n_points)
+        )
+
+    def __call__(self, values):
+        """地点ごとの値をグリッドに補間する（値は地点と同じ順）"""
+        return (self.weights @ np.asarray(values, dtype=float)).reshape(self.shape)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 16
+
+
+def get_interpolator(lat, lon, resolution=GRID_RESOLUTION):
+    """地点集合ごとに使い回す補間器（最近使った _CACHE_SIZE 個を保持）"""
+    lat = np.ascontiguousarray(lat, dtype=float)
+    lon = np.ascontiguousarray(lon, dtype=float)
+    key = (lat.tobytes(), lon.tobytes(), resolution)
+    with _cache_lock:
+        interpolator = _cache.get(key)
+        if interpolator is not None:
+            _cache.move_to_end(key)
+            return interpolator
+    interpolator = GridInterpolator(lat, lon, resolution)
+    with _cache_lock:
+        _cache[key] = interpolator
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return interpolator
@@ -0,0 +1,242 @@
+"""
+DB スキーマのマイグレーション。
+
+スキーマの版（MIGRATIONS の番号）と害虫カタログ（pests.json の名前・発育開始温度・説明）のハッシュを
+schema_state テーブル（1 行）に記録し、Database() の構築時は ensure_schema がこの 1 行を読むだけにする。
+コードの版が DB より新しいか、カタログのハッシュが変わったときだけ、アドバイザリロックを取ってから
+未適用のマイグレーションと害虫の同期を 1 つのトランザクションで実行する
+（同時に起動した gunicorn ワーカーや cron のプロセスのうち 1 つだけが実行し、残りはロックの後で読み直して何もしない）。
+
+デプロイ時は python migrations.py で明示的に適用できる（--status は状態の表示だけ）。
+マイグレーションを足すときは MIGRATIONS の末尾に (番号, 説明, [SQL, ...]) を追加する（適用済みのものは変えない）。
+"""
+
+import json
+import hashlib
+import logging
+import argparse
+
+import psycopg2.errors
+
+from gdd_store import PESTS_FILE
+
+logger = logging.getLogger(__name__)
+
+# マイグレーション中の排他（pg_advisory_xact_lock のキー）
+LOCK_KEY = 0x61677230
+
+STATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS schema_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    pest_catalog TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+MIGRATIONS = [
+    (1, '初期スキーマ（気温・グリッド・害虫・積算温度・再計算開始日・累積GDD）', [
+        '''
+        CREATE TABLE IF NOT EXISTS temperature_data (
+            id SERIAL PRIMARY KEY,
+            date TIMESTAMP NOT NULL,
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            temperature DOUBLE PRECISION NOT NULL,
+            source TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(date, latitude, longitude)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_temp_lat_lon_date ON temperature_data (latitude, longitude, date)',
+        '''
+        CREATE TABLE IF NOT EXISTS grid_points (
+            id SERIAL PRIMARY KEY,
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            region_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(latitude, longitude)
+        )
+        ''',
+        # nameにUNIQUE制約で重複防止
+        '''
+        CREATE TABLE IF NOT EXISTS pests (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            threshold_temp DOUBLE PRECISION NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS accumulated_temperature (
+            date TIMESTAMP NOT NULL,
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            accumulated_temp DOUBLE PRECISION NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (date, latitude, longitude)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_acc_lat_lon_date ON accumulated_temperature (latitude, longitude, date)',
+        # 地点ごとの積算温度の再計算開始日（TemperatureBulkLoader が記録し、
+        # calculate_accumulated_temperature.py の差分更新が消費する）
+        '''
+        CREATE TABLE IF NOT EXISTS temperature_revisions (
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            from_date DATE NOT NULL,
+            PRIMARY KEY (latitude, longitude)
+        )
+        ''',
+        # 地点×基準温度ごとの累積GDD（gdd_store.py が更新）
+        '''
+        CREATE TABLE IF NOT EXISTS gdd_cumulative (
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            base_temp DOUBLE PRECISION NOT NULL,
+            date DATE NOT NULL,
+            cum_gdd DOUBLE PRECISION NOT NULL,
+            day_count INTEGER NOT NULL,
+            PRIMARY KEY (latitude, longitude, base_temp, date)
+        )
+        ''',
+    ]),
+    (2, 'pests.name の重複を除いて UNIQUE 制約を付ける（制約のない古い DB 向け）', [
+        '''
+        DELETE FROM pests
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM pests GROUP BY name
+        )
+        ''',
+        '''
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.table_constraints
+                WHERE table_name = 'pests' AND constraint_type = 'UNIQUE'
+            ) THEN
+                ALTER TABLE pests ADD CONSTRAINT pests_name_unique UNIQUE (name);
+            END IF;
+        END $$
+        ''',
+    ]),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# pests.json がないときの害虫
+DEFAULT_PESTS = [
+    ('シバツトガ', 10.0, '芝生の主要な害虫。発育開始温度は10℃。'),
+    ('コガネムシ', 12.0, '芝生の根を食害する害虫。発育開始温度は12℃。'),
+    ('スジキリヨトウ', 11.0, '芝生の葉を食害する害虫。発育開始温度は11℃。'),
+]
+
+
+def pest_catalog(pests_file=PESTS_FILE):
+    """pests テーブルに入れる害虫 [(name, threshold_temp, description), ...]"""
+    try:
+        with open(pests_file, 'r', encoding='utf-8') as f:
+            pests = json.load(f)['pests']
+    except FileNotFoundError:
+        logger.warning(f"pests.json not found at {pests_file}, using default data")
+        return list(DEFAULT_PESTS)
+    return [(pest['name'], float(pest['base_temp']), pest['description']) for pest in pests]
+
+
+def catalog_hash(catalog):
+    return hashlib.sha256(json.dumps(catalog, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def read_state(conn, cur):
+    """記録されたスキーマの版と害虫カタログのハッシュ（schema_state がなければ (0, None)）"""
+    try:
+        cur.execute('SELECT version, pest_catalog FROM schema_state WHERE id = 1')
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return 0, None
+    row = cur.fetchone()
+    return (row['version'], row['pest_catalog']) if row else (0, None)
+
+
+def sync_pests(cur, catalog):
+    """カタログの害虫を追加し、発育開始温度・説明が変わったものを更新する（カタログにない害虫は消さない）"""
+    for pest in catalog:
+        cur.execute('''
+            INSERT INTO pests (name, threshold_temp, description)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (name) DO UPDATE
+            SET threshold_temp = EXCLUDED.threshold_temp, description = EXCLUDED.description
+            WHERE pests.threshold_temp IS DISTINCT FROM EXCLUDED.threshold_temp
+               OR pests.description IS DISTINCT FROM EXCLUDED.description
+        ''', pest)
+
+
+def migrate(conn, cur, catalog, digest):
+    """ロックを取って状態を読み直し、未適用のマイグレーションと害虫の同期を実行する。戻り値は ensure_schema と同じ"""
+    cur.execute('SELECT pg_advisory_xact_lock(%s)', (LOCK_KEY,))
+    cur.execute(STATE_TABLE)
+    version, stored = read_state(conn, cur)
+    applied = []
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        for sql in statements:
+            cur.execute(sql)
+        logger.info(f"マイグレーション {number} を適用: {description}")
+        applied.append(number)
+    if stored != digest:
+        sync_pests(cur, catalog)
+        logger.info(f"害虫カタログを同期: {len(catalog)} 件（{stored} → {digest}）")
+        applied.append('pests')
+    if applied:
+        cur.execute('''
+            INSERT INTO schema_state (id, version, pest_catalog, updated_at)
+            VALUES (1, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (id) DO UPDATE
+            SET version = EXCLUDED.version, pest_catalog = EXCLUDED.pest_catalog, updated_at = EXCLUDED.updated_at
+        ''', (max(version, LATEST_VERSION), digest))
+    conn.commit()
+    return applied
+
+
+def ensure_schema(conn, pests_file=PESTS_FILE):
+    """スキーマと害虫カタログを最新にする。最新なら schema_state を 1 回読むだけ。
+    戻り値: 実行したこと（マイグレーションの番号と、害虫を同期したら 'pests'）のリスト"""
+    catalog = pest_catalog(pests_file)
+    digest = catalog_hash(catalog)
+    with conn.cursor() as cur:
+        version, stored = read_state(conn, cur)
+        if version > LATEST_VERSION:
+            logger.warning(f"DB のスキーマの版 {version} がこのコードの版 {LATEST_VERSION} より新しい")
+        if version >= LATEST_VERSION and stored == digest:
+            return []
+        return migrate(conn, cur, catalog, digest)
+
+
+def main():
+    from database import get_connection
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    parser = argparse.ArgumentParser(description='DB スキーマのマイグレーションを適用する')
+    parser.add_argument('--status', action='store_true', help='記録された版と未適用のマイグレーションを表示するだけ')
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        if args.status:
+            with conn.cursor() as cur:
+                version, stored = read_state(conn, cur)
+            digest = catalog_hash(pest_catalog())
+            pending = [number for number, _, _ in MIGRATIONS if number > version]
+            print(f"schema version: {version} (latest {LATEST_VERSION}), pending: {pending or 'none'}")
+            print(f"pest catalog: {stored} ({'up to date' if stored == digest else 'will sync ' + digest})")
+        else:
+            applied = ensure_schema(conn)
+            print(f"applied: {applied}" if applied else "schema is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+NASA POWER API の並列・レート制限付きクライアント。
+
+- スレッドプールで複数地点を同時取得（同時実行数は設定可能）
+- トークンバケットで上流へのリクエストレートを制限
+- スレッドごとに keep-alive の requests.Session を使い回す
+- 429 / 5xx / タイムアウト / 接続エラーはジッター付き指数バックオフで再試行
+- 実行ごとのリクエスト数・レイテンシのパーセンタイル・リトライ数を集計
+- 共通クライアントは nasa_power_cache のディスクキャッシュを通し、未取得の日だけを取りに行く
+
+環境変数:
+  NASA_POWER_CONCURRENCY  同時リクエスト数（既定 4）
+  NASA_POWER_RATE         1 秒あたりの最大リクエスト数（既定 2.0）
+  NASA_POWER_BURST        バースト許容量（既定 4）
+  NASA_POWER_MAX_RETRIES  再試行回数（既定 4）
+  NASA_POWER_TIMEOUT      1 リクエストのタイムアウト秒（既定 30）
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+POWER_DAILY_POINT_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+
+NASA_POWER_CONCURRENCY = int(os.environ.get("NASA_POWER_CONCURRENCY", "4"))
+NASA_POWER_RATE = float(os.environ.get("NASA_POWER_RATE", "2.0"))
+NASA_POWER_BURST = int(os.environ.get("NASA_POWER_BURST", "4"))
+NASA_POWER_MAX_RETRIES = int(os.environ.get("NASA_POWER_MAX_RETRIES", "4"))
+NASA_POWER_TIMEOUT = float(os.environ.get("NASA_POWER_TIMEOUT", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# 応答時間のパーセンタイルを求める直近のリクエスト数（Web ワーカーのように長く生きるプロセスでも増え続けない）
+LATENCY_WINDOW = 10000
+
+
+def build_power_url(lat, lon, start_date, end_date):
+    """日次・地点の T2M 取得 URL を組み立てる（日付は YYYYMMDD）"""
+    return (
+        POWER_DAILY_POINT_URL +
+        f"?parameters=T2M"
+        f"&start={start_date}"
+        f"&end={end_date}"
+        f"&latitude={lat}"
+        f"&longitude={lon}"
+        f"&community=AG"
+        f"&format=JSON"
+    )
+
+
+def parse_power_response(data):
+    """API レスポンス(JSON)を date, temp 列の DataFrame に変換"""
+    import pandas as pd
+    records = data['properties']['parameter']['T2M']
+    df = pd.DataFrame(records.items(), columns=["date", "temp"])
+    df["date"] = pd.to_datetime(df["date"])
+    df["temp"] = df["temp"].astype(float)
+    return df
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット（rate 個/秒で補充、最大 capacity 個）"""
+
+    def __init__(self, rate, capacity):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを 1 つ取得する。足りなければ補充されるまで待つ。待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class FetchStats:
+    """取得処理の集計（スレッドセーフ）。応答時間は直近 latency_window 件だけを持つ"""
+
+    def __init__(self, latency_window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.throttle_wait = 0.0
+        self.status_counts = {}
+        self.latencies = deque(maxlen=latency_window)
+
+    def record_request(self, latency, status):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            key = str(status)
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_result(self, ok):
+        with self._lock:
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+
+    def record_throttle(self, waited):
+        with self._lock:
+            self.throttle_wait += waited
+
+    def percentile(self, q):
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return 0.0
+        idx = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+        return values[idx]
+
+    def summary(self):
+        return {
+            'requests': self.requests,
+            'successes': self.successes,
+            'failures': self.failures,
+            'retries': self.retries,
+            'status_counts': dict(self.status_counts),
+            'throttle_wait_s': round(self.throttle_wait, 2),
+            'latency_p50_s': round(self.percentile(50), 3),
+            'latency_p90_s': round(self.percentile(90), 3),
+            'latency_p99_s': round(self.percentile(99), 3),
+        }
+
+
+class NasaPowerClient:
+    """NASA POWER の並列取得エンジン"""
+
+    def __init__(self, concurrency=NASA_POWER_CONCURRENCY, rate=NASA_POWER_RATE,
+                 burst=NASA_POWER_BURST, max_retries=NASA_POWER_MAX_RETRIES,
+                 timeout=NASA_POWER_TIMEOUT, backoff_base=1.0, backoff_max=60.0,
+                 session_factory=None, cache=None):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst)
+        self.stats = FetchStats()  # クライアント生成以降の累計
+        self._session_factory = session_factory or self._new_session
+        self._local = threading.local()
+        self.cache = cache
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _session(self):
+        """ワーカースレッドごとの keep-alive セッション"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._session_factory()
+            self._local.session = session
+        return session
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _record(self, stats_list, method, *args):
+        for stats in stats_list:
+            getattr(stats, method)(*args)
+
+    def fetch(self, lat, lon, start_date, end_date, timeout=None, stats=None):
+        """1 地点・期間の気温 DataFrame を取得。取得できなければ None"""
+        if self.cache is None:
+            return self._fetch_remote(lat, lon, start_date, end_date, timeout, stats)
+        return self.cache.get(
+            lat, lon, start_date, end_date,
+            lambda la, lo, s, e: self._fetch_remote(la, lo, s, e, timeout, stats)
+        )
+
+    def _fetch_remote(self, lat, lon, start_date, end_date, timeout=None, stats=None):
+        """API から直接取得する（キャッシュを経由しない）"""
+        url = build_power_url(lat, lon, start_date, end_date)
+        stats_list = [self.stats] + ([stats] if stats is not None else [])
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            self._record(stats_list, 'record_throttle', self.bucket.acquire())
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                response = self._session().get(url, timeout=timeout)
+                self._record(stats_list, 'record_request', time.perf_counter() - started, response.status_code)
+                if response.status_code == 404:
+                    logger.warning(f"No data available for lat={lat}, lon={lon}: {response.text[:200]}")
+                    self._record(stats_list, 'record_result', False)
+                    return None
+                if response.status_code not in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    df = parse_power_response(response.json())
+                    self._record(stats_list, 'record_result', True)
+                    return df
+                retry_after = response.headers.get('Retry-After')
+                reason = f"HTTP {response.status_code}"
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._record(stats_list, 'record_request', time.perf_counter() - started, type(e).__name__)
+                reason = type(e).__name__
+            except Exception as e:
+                logger.error(f"Error fetching data for lat={lat}, lon={lon}: {e} (URL: {url})")
+                self._record(stats_list, 'record_result', False)
+                return None
+
+            if attempt >= self.max_retries:
+                logger.error(f"Giving up on lat={lat}, lon={lon} after {attempt + 1} attempts ({reason})")
+                self._record(stats_list, 'record_result', False)
+                return None
+            delay = self._backoff(attempt, retry_after)
+            logger.warning(f"{reason} for lat={lat}, lon={lon}; retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            self._record(stats_list, 'record_retry')
+            time.sleep(delay)
+            attempt += 1
+
+    def fetch_many(self, points, start_date, end_date, timeout=None, stats=None):
+        """複数地点を並列取得し、完了した順に (lat, lon, df) を返すジェネレータ"""
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='nasa-power') as executor:
+            futures = {
+                executor.submit(self.fetch, lat, lon, start_date, end_date, timeout, stats): (lat, lon)
+                for lat, lon in points
+            }
+            for future in as_completed(futures):
+                lat, lon = futures[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    logger.error(f"Unexpected error fetching lat={lat}, lon={lon}: {e}")
+                    df = None
+                yield lat, lon, df
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """プロセス共通のクライアント（レート制限とセッションを共有）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from nasa_power_cache import NASA_POWER_CACHE, PowerResponseCache
+                _client = NasaPowerClient(cache=PowerResponseCache() if NASA_POWER_CACHE else None)
+    return _client
+
+
+def fetch_point(lat, lon, start_date, end_date, timeout=None):
+    """共通クライアントで 1 地点を取得する"""
+    return get_client().fetch(lat, lon, start_date, end_date, timeout=timeout)
@@ -0,0 +1,206 @@
+"""
+NASA POWER レスポンスのディスクキャッシュ。
+
+地点ごとに 1 ファイル（JSON）で日別の気温を保持し、要求された期間のうち
+キャッシュにない日・期限切れの日だけを連続区間にまとめて取得する。
+重なる・隣接する期間の要求は同じファイルにマージされる。
+
+- NASA POWER は直近の数日分を後から改訂するため、取得時点で
+  revise_days 日以内だった日は「暫定値」として ttl 秒で期限切れにする
+- 欠測値（-999）や返ってこなかった日は値を保存せず、ttl 秒だけ「欠測」として覚える
+- 合計サイズが max_bytes を超えたら、最も長く使われていない地点から削除する
+
+環境変数:
+  NASA_POWER_CACHE            0 で無効化（既定 1）
+  NASA_POWER_CACHE_DIR        保存先（既定 cache/nasa_power）
+  NASA_POWER_CACHE_MAX_MB     合計サイズ上限 MB（既定 200）
+  NASA_POWER_CACHE_REVISE_DAYS 暫定値とみなす直近日数（既定 7）
+  NASA_POWER_CACHE_TTL_HOURS  暫定値の有効時間（既定 20）
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NASA_POWER_CACHE = os.environ.get("NASA_POWER_CACHE", "1") != "0"
+NASA_POWER_CACHE_DIR = os.environ.get("NASA_POWER_CACHE_DIR", os.path.join(BASE_DIR, 'cache', 'nasa_power'))
+NASA_POWER_CACHE_MAX_MB = float(os.environ.get("NASA_POWER_CACHE_MAX_MB", "200"))
+NASA_POWER_CACHE_REVISE_DAYS = int(os.environ.get("NASA_POWER_CACHE_REVISE_DAYS", "7"))
+NASA_POWER_CACHE_TTL_HOURS = float(os.environ.get("NASA_POWER_CACHE_TTL_HOURS", "20"))
+
+DATE_FMT = '%Y%m%d'
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value[:10].replace('-', ''), DATE_FMT).date()
+    if isinstance(value, datetime):
+        return value.date()
+    if hasattr(value, 'date') and callable(value.date):
+        return value.date()
+    return value
+
+
+def missing_ranges(dates, gap_merge=0):
+    """日付リスト（昇順）を連続区間 [(start, end), ...] にまとめる。
+    gap_merge 日以下の隙間は 1 区間にまとめる（リクエスト数を減らすため）"""
+    ranges = []
+    for d in dates:
+        if ranges and (d - ranges[-1][1]).days <= gap_merge + 1:
+            ranges[-1][1] = d
+        else:
+            ranges.append([d, d])
+    return [(s, e) for s, e in ranges]
+
+
+class PowerResponseCache:
+    """地点 × 日付単位の NASA POWER 気温キャッシュ"""
+
+    def __init__(self, cache_dir=NASA_POWER_CACHE_DIR, max_bytes=NASA_POWER_CACHE_MAX_MB * 1024 * 1024,
+                 revise_days=NASA_POWER_CACHE_REVISE_DAYS, ttl=NASA_POWER_CACHE_TTL_HOURS * 3600,
+                 gap_merge=7, clock=time.time):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revise_days = revise_days
+        self.ttl = ttl
+        self.gap_merge = gap_merge
+        self._clock = clock
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._size_lock = threading.Lock()
+        self._total_bytes = None
+        self.stats = {'hits': 0, 'partial': 0, 'misses': 0, 'fetched_ranges': 0, 'evicted': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _key(self, lat, lon):
+        return f"{float(lat):.4f}_{float(lon):.4f}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _lock_for(self, key):
+        with self._locks_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # LRU 用にアクセス時刻を更新
+            return entry
+        except FileNotFoundError:
+            return {'values': {}, 'provisional': {}, 'missing': {}}
+        except (ValueError, OSError) as e:
+            logger.warning(f"Discarding unreadable cache file {path}: {e}")
+            return {'values': {}, 'provisional': {}, 'missing': {}}
+
+    def _save(self, key, entry):
+        path = self._path(key)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        self._add_bytes(os.path.getsize(path) - old_size)
+        self._evict(keep=key)
+
+    def _add_bytes(self, delta):
+        with self._size_lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(
+                    entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.name.endswith('.json')
+                )
+            else:
+                self._total_bytes += delta
+
+    def _evict(self, keep=None):
+        with self._size_lock:
+            if self._total_bytes is None or self._total_bytes <= self.max_bytes:
+                return
+            files = sorted(
+                (e for e in os.scandir(self.cache_dir) if e.name.endswith('.json') and e.name != f"{keep}.json"),
+                key=lambda e: e.stat().st_mtime
+            )
+            for entry in files:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                self._total_bytes -= size
+                self.stats['evicted'] += 1
+
+    def _is_fresh(self, entry, day_key, now):
+        if day_key in entry['values']:
+            fetched_at = entry['provisional'].get(day_key)
+            return fetched_at is None or now - fetched_at < self.ttl
+        missing_at = entry.setdefault('missing', {}).get(day_key)
+        return missing_at is not None and now - missing_at < self.ttl
+
+    def get(self, lat, lon, start_date, end_date, fetch_fn):
+        """期間 [start_date, end_date] の気温を返す（date, temp 列の DataFrame）。
+        足りない日だけ fetch_fn(lat, lon, 'YYYYMMDD', 'YYYYMMDD') で取得してマージする"""
+        import pandas as pd
+        start, end = _to_date(start_date), _to_date(end_date)
+        key = self._key(lat, lon)
+        with self._lock_for(key):
+            entry = self._load(key)
+            now = self._clock()
+            days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+            stale = [d for d in days if not self._is_fresh(entry, d.strftime(DATE_FMT), now)]
+
+            if not stale:
+                self.stats['hits'] += 1
+            else:
+                self.stats['partial' if len(stale) < len(days) else 'misses'] += 1
+                changed = False
+                today = datetime.fromtimestamp(now).date()
+                for range_start, range_end in missing_ranges(stale, self.gap_merge):
+                    df = fetch_fn(lat, lon, range_start.strftime(DATE_FMT), range_end.strftime(DATE_FMT))
+                    self.stats['fetched_ranges'] += 1
+                    if df is None:
+                        continue  # 取得失敗: 既存（期限切れ含む）の値をそのまま使う
+                    received = set()
+                    for d, temp in zip(df['date'], df['temp']):
+                        day = _to_date(d)
+                        day_key = day.strftime(DATE_FMT)
+                        if temp is None or float(temp) <= -900:
+                            continue
+                        received.add(day_key)
+                        entry['values'][day_key] = float(temp)
+                        entry['missing'].pop(day_key, None)
+                        if (today - day).days <= self.revise_days:
+                            entry['provisional'][day_key] = now
+                        else:
+                            entry['provisional'].pop(day_key, None)
+                    for i in range((range_end - range_start).days + 1):
+                        day_key = (range_start + timedelta(days=i)).strftime(DATE_FMT)
+                        if day_key not in received and day_key not in entry['values']:
+                            entry['missing'][day_key] = now
+                    changed = True
+                if changed:
+                    self._save(key, entry)
+
+            values = entry['values']
+            rows = [(d, values[d.strftime(DATE_FMT)]) for d in days if d.strftime(DATE_FMT) in values]
+
+        if not rows:
+            return None
+        df = pd.DataFrame(rows, columns=['date', 'temp'])
+        df['date'] = pd.to_datetime(df['date'])
+        df['temp'] = df['temp'].astype(float)
+        return df
@@ -0,0 +1,194 @@
+"""
+日次バッチのステージをプロセス内で実行する DAG ランナー。
+
+各ステージは依存ステージの戻り値を受け取り、(値, 処理行数) を返す関数。
+依存が済んだステージから順にスレッドで実行するので、互いに依存しないステージ
+（静的マップとアニメーションなど）は並列に走る。接続は database の共有プールを使う。
+
+ステージに fingerprint 関数があれば、その戻り値と上流ステージのフィンガープリントを
+まとめたハッシュを前回成功時の値と比べ、同じで出力ファイルも揃っていれば実行を省く。
+フィンガープリントは成功したステージの分だけ状態ファイルに保存する。
+
+環境変数:
+  PIPELINE_STATE_FILE  フィンガープリントの保存先（既定 cache/pipeline_state.json）
+  PIPELINE_WORKERS     同時に実行するステージ数（既定 2）
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PIPELINE_STATE_FILE = os.environ.get("PIPELINE_STATE_FILE", os.path.join(BASE_DIR, 'cache', 'pipeline_state.json'))
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", "2"))
+
+
+class PipelineError(RuntimeError):
+    """1 つ以上のステージが失敗した"""
+
+    def __init__(self, failed, summary):
+        super().__init__(f"Pipeline stages failed: {', '.join(failed)}")
+        self.failed = failed
+        self.summary = summary
+
+
+class Stage:
+    """パイプラインの 1 ステージ
+
+    run(inputs) は {依存ステージ名: 値} を受け取り (値, 処理行数) を返す。
+    fingerprint(inputs) は入力の状態を表す JSON 化できる値を返す（None なら毎回実行）。
+    outputs はスキップしてよい条件として存在を確認するファイル。
+    スキップしたステージの値は None として下流に渡る。
+    """
+
+    def __init__(self, name, run, deps=(), fingerprint=None, outputs=()):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.fingerprint = fingerprint
+        self.outputs = tuple(outputs)
+
+
+class SharedResult:
+    """並列ステージ間で共有する値。最初に要求したステージが 1 回だけ計算する"""
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._lock = threading.Lock()
+        self._done = False
+        self._value = None
+
+    def get(self):
+        with self._lock:
+            if not self._done:
+                self._value = self._compute()
+                self._done = True
+            return self._value
+
+
+def load_state(path=PIPELINE_STATE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=PIPELINE_STATE_FILE):
+    """状態ファイルを一時ファイル経由で置き換える（途中で落ちても壊さない）"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def combine_fingerprint(own, upstream):
+    """ステージ自身の入力状態と上流のフィンガープリントを 1 つのハッシュにまとめる"""
+    payload = json.dumps([own, sorted(upstream.items())], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Pipeline:
+    """ステージの DAG を依存順・並列に実行する"""
+
+    def __init__(self, stages, state_file=PIPELINE_STATE_FILE, max_workers=PIPELINE_WORKERS, force=False):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown or later stage: {dep}")
+            self.stages[stage.name] = stage
+        self.state_file = state_file
+        self.max_workers = max(1, max_workers)
+        self.force = force
+
+    def _execute(self, stage, inputs, upstream, previous):
+        """1 ステージを実行（またはスキップ）して (値, 記録, フィンガープリント) を返す"""
+        started = time.perf_counter()
+        fingerprint = None
+        if stage.fingerprint is not None or upstream:
+            own = stage.fingerprint(inputs) if stage.fingerprint is not None else None
+            fingerprint = combine_fingerprint(own, upstream)
+        if (not self.force and stage.fingerprint is not None and fingerprint == previous
+                and all(os.path.exists(path) for path in stage.outputs)):
+            logger.info(f"[{stage.name}] 入力に変更がないためスキップします")
+            return None, {'stage': stage.name, 'status': 'skipped', 'seconds': 0.0, 'rows': 0}, fingerprint
+
+        logger.info(f"[{stage.name}] 開始")
+        value, rows = stage.run(inputs)
+        seconds = round(time.perf_counter() - started, 2)
+        logger.info(f"[{stage.name}] 完了: {rows} rows, {seconds:.2f}s")
+        return value, {'stage': stage.name, 'status': 'ok', 'seconds': seconds, 'rows': rows}, fingerprint
+
+    def run(self):
+        """全ステージを実行し、ステージごとの記録（実行順）と合計時間のサマリーを返す。
+        失敗したステージがあれば、その下流を実行せずに残りを終えてから PipelineError を送出する"""
+        started = time.perf_counter()
+        state = load_state(self.state_file)
+        values, fingerprints, records = {}, {}, {}
+        pending = dict(self.stages)
+        failed = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if any(dep in failed or records.get(dep, {}).get('status') == 'blocked' for dep in stage.deps):
+                        records[name] = {'stage': name, 'status': 'blocked', 'seconds': 0.0, 'rows': 0}
+                        del pending[name]
+                        continue
+                    if all(dep in values for dep in stage.deps):
+                        inputs = {dep: values[dep] for dep in stage.deps}
+                        upstream = {dep: fingerprints[dep] for dep in stage.deps if fingerprints.get(dep)}
+                        future = executor.submit(self._execute, stage, inputs, upstream, state.get(name))
+                        running[future] = (name, time.perf_counter())
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, submitted = running.pop(future)
+                    try:
+                        value, record, fingerprint = future.result()
+                    except Exception as e:
+                        logger.exception(f"[{name}] 失敗: {e}")
+                        failed.append(name)
+                        state.pop(name, None)
+                        records[name] = {'stage': name, 'status': 'failed',
+                                         'seconds': round(time.perf_counter() - submitted, 2), 'rows': 0,
+                                         'error': str(e)}
+                        continue
+                    values[name] = value
+                    fingerprints[name] = fingerprint
+                    records[name] = record
+                    if record['status'] == 'ok' and fingerprint is not None:
+                        state[name] = fingerprint
+
+        save_state(state, self.state_file)
+        summary = {
+            'stages': [records[name] for name in self.stages],
+            'total_seconds': round(time.perf_counter() - started, 2),
+        }
+        logger.info(f"pipeline summary: {json.dumps(summary, ensure_ascii=False)}")
+        if failed:
+            raise PipelineError(failed, summary)
+        return summary
@@ -1,13 +1,15 @@
 import folium
 import pandas as pd
 import numpy as np
-from scipy.interpolate import griddata
 from scipy.ndimage import gaussian_filter
 import matplotlib.pyplot as plt
 import os
 import matplotlib.font_manager as fm
 import datetime
 import json
+import argparse
+from grid_interpolator import get_interpolator
+from contour_vectors import band_regions, regions_to_geojson
 
 # 日本語フォントを明示的に指定
 plt.rcParams['font.family'] = 'Meiryo'  # Windowsの場合
@@ -24,8 +26,8 @@ def load_pests_from_json():
         print(f"Error: {pests_file} not found")
         return []
 
-def generate_map(pest):
-    """害虫ごとの地図を生成"""
+def generate_map(pest, vector=False):
+    """害虫ごとの地図を生成（vector=True なら等値線の帯を画像ではなく GeoJSON のポリゴンで重ねる）"""
     pest_id = pest['id']
     pest_name = pest['name']
     thresholds = pest['thresholds']
@@ -51,14 +53,10 @@ def generate_map(pest):
 
     print(f"{pest_id}: grid_temp min={np.nanmin(temp)}, max={np.nanmax(temp)}, nan count={np.isnan(temp).sum()}, total={temp.size}")
 
-    # グリッド生成と補間（linear + nearest穴埋めで不均一グリッド対応）
-    grid_lat, grid_lon = np.mgrid[min(lat):max(lat):200j, min(lon):max(lon):200j]
-    grid_temp = griddata((lat, lon), temp, (grid_lat, grid_lon), method="linear")
-    # NaN部分をnearest補間で穴埋め
-    nan_mask = np.isnan(grid_temp)
-    if np.any(nan_mask):
-        grid_nearest = griddata((lat, lon), temp, (grid_lat, grid_lon), method="nearest")
-        grid_temp[nan_mask] = grid_nearest[nan_mask]
+    # グリッド生成と補間（linear + nearest穴埋めで不均一グリッド対応。害虫間で補間器を使い回す）
+    interpolator = get_interpolator(lat, lon)
+    grid_lat, grid_lon = interpolator.grid_lat, interpolator.grid_lon
+    grid_temp = interpolator(temp)
     # ガウシアンスムージングで等値線を滑らかにする
     grid_temp = gaussian_filter(grid_temp, sigma=4)
 
@@ -83,19 +81,20 @@ def generate_map(pest):
         # 足りない場合は最後の色で埋める
         colors += [colors[-1]] * (len(levels)-1 - len(colors))
 
-    # 画像保存（透明背景）
-    fig, ax = plt.subplots(figsize=(8, 6))
-    # カラー指定でcontourf
-    try:
-        cs = ax.contourf(grid_lon, grid_lat, grid_temp, levels=levels, colors=colors, alpha=0.7)
-        lines = plt.contour(grid_lon, grid_lat, grid_temp, levels=levels, colors='black', linewidths=0.5)
-        plt.clabel(lines, inline=True, fontsize=8, fmt="%.0f")
-    except Exception as e:
-        print(f"{pest_id}: contour error: {e}")
-
-    ax.axis('off')
-    plt.savefig(f"data/{pest_id}_contours.png", bbox_inches="tight", pad_inches=0, transparent=True)
-    plt.close()
+    if not vector:
+        # 画像保存（透明背景）
+        fig, ax = plt.subplots(figsize=(8, 6))
+        # カラー指定でcontourf
+        try:
+            cs = ax.contourf(grid_lon, grid_lat, grid_temp, levels=levels, colors=colors, alpha=0.7)
+            lines = plt.contour(grid_lon, grid_lat, grid_temp, levels=levels, colors='black', linewidths=0.5)
+            plt.clabel(lines, inline=True, fontsize=8, fmt="%.0f")
+        except Exception as e:
+            print(f"{pest_id}: contour error: {e}")
+
+        ax.axis('off')
+        plt.savefig(f"data/{pest_id}_contours.png", bbox_inches="tight", pad_inches=0, transparent=True)
+        plt.close()
 
     # 凡例を別の画像として保存（コンパクトに生成）
     fig_legend, ax_legend = plt.subplots(figsize=(2.5, 1.5))
@@ -136,14 +135,32 @@ def generate_map(pest):
         max_zoom=12
     )
 
-    # 等高線画像を日本全体に重ねる
-    image_overlay = folium.raster_layers.ImageOverlay(
-        name=f"{pest_name} 積算温度 等高線",
-        image=f"data/{pest_id}_contours.png",
-        bounds=[[24.0, 122.0], [46.0, 146.0]],  # 日本全体
-        opacity=0.6,
-    )
-    image_overlay.add_to(m)
+    if vector:
+        # 帯（値が閾値以上の領域）を下から不透明で重ね、ペイン全体に透明度をかける
+        folium.map.CustomPane("contours", z_index=450).add_to(m)
+        m.get_root().header.add_child(folium.Element(
+            "<style>.leaflet-contours-pane { opacity: 0.42; }</style>"))
+        folium.GeoJson(
+            regions_to_geojson(band_regions(grid_lat, grid_lon, grid_temp, levels), levels, colors),
+            name=f"{pest_name} 積算温度 等高線",
+            style_function=lambda feature: {
+                "fillColor": feature["properties"]["color"],
+                "fillOpacity": 1,
+                "stroke": feature["properties"]["band"] > 0,
+                "color": "#000000",
+                "weight": 0.5,
+            },
+            pane="contours",
+        ).add_to(m)
+    else:
+        # 等高線画像を日本全体に重ねる
+        image_overlay = folium.raster_layers.ImageOverlay(
+            name=f"{pest_name} 積算温度 等高線",
+            image=f"data/{pest_id}_contours.png",
+            bounds=[[24.0, 122.0], [46.0, 146.0]],  # 日本全体
+            opacity=0.6,
+        )
+        image_overlay.add_to(m)
     folium.LayerControl().add_to(m)
 
     # 出力
@@ -152,6 +169,10 @@ def generate_map(pest):
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vector', action='store_true', help='等値線を画像ではなくベクター（GeoJSON）で重ねる')
+    args = parser.parse_args()
+
     # pests.jsonから害虫データを読み込み
     pests = load_pests_from_json()
     
@@ -164,7 +185,7 @@ def main():
     # 各害虫の地図を生成
     for pest in pests:
         print(f"\n{pest['name']}の地図を生成中...")
-        generate_map(pest)
+        generate_map(pest, vector=args.vector)
     
     print("\n[完了] すべての害虫地図の生成が完了しました！")
 
@@ -0,0 +1,172 @@
+"""
+output/・data/ の静的ファイルの配信と事前圧縮。
+
+配信（serve_static）:
+  - 事前に作った <ファイル>.br / <ファイル>.gz を Accept-Encoding に応じて返す（リクエストごとには圧縮しない。
+    元のファイルより古い圧縮版は使わない）
+  - ETag は内容の SHA-256（圧縮版は符号化ごとに別の値）。If-None-Match が一致すれば 304 を返す
+  - 名前に内容のハッシュを含むファイル（animation_chunks/）と、版（?v=<ハッシュ 12 桁>）付きの URL
+    （フレーム PNG）は 1 年・immutable でキャッシュさせる。それ以外（HTML・マニフェスト・凡例など）は
+    no-cache（ブラウザ・CDN は毎回 ETag で再検証し、変わっていなければ 304 で済む）
+
+事前圧縮（precompress）: python static_assets.py で output/ と data/ の圧縮版を作る。
+圧縮版は Git に入れないので、Render のビルドコマンドで実行する。brotli パッケージがなければ .gz だけを作る。
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from animation_chunks import CHUNKS_DIR, HASH_LENGTH
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, 'output')
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# (Content-Encoding, 圧縮版の拡張子)。先にあるものを優先する
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+VARIANT_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+# 圧縮する拡張子（PNG などもともと圧縮されている形式は除く）と、圧縮しない小さいファイルの上限
+COMPRESSIBLE = {'.html', '.json', '.js', '.css', '.svg', '.csv', '.txt', '.bin'}
+MIN_SIZE = 1024
+# 元の 90% 以下にならない圧縮版は作らない
+MAX_RATIO = 0.9
+
+IMMUTABLE_DIRS = (CHUNKS_DIR,)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+VERSION_PATTERN = re.compile(f"[0-9a-f]{{{HASH_LENGTH}}}")
+
+# 元のファイル → (mtime_ns, サイズ, ETag)
+_etags = {}
+
+
+def compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE
+
+
+def _compress(encoding, data):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _encodings():
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def compress_file(path):
+    """path の圧縮版を作る（元より新しい圧縮版があればそのまま）。戻り値: 書いた圧縮版の数"""
+    size = os.path.getsize(path)
+    mtime = os.path.getmtime(path)
+    data = None
+    written = 0
+    for encoding, suffix in _encodings():
+        variant = path + suffix
+        if os.path.exists(variant) and os.path.getmtime(variant) >= mtime:
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        compressed = _compress(encoding, data)
+        if len(compressed) > size * MAX_RATIO:
+            if os.path.exists(variant):
+                os.remove(variant)
+            continue
+        with open(variant + '.tmp', 'wb') as f:
+            f.write(compressed)
+        os.replace(variant + '.tmp', variant)
+        written += 1
+    return written
+
+
+def precompress(directory):
+    """directory 以下の圧縮できるファイルの圧縮版を作り、元のファイルがなくなった圧縮版を消す。
+    戻り値: 書いた圧縮版の数"""
+    written = removed = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(VARIANT_SUFFIXES):
+                if not os.path.exists(os.path.splitext(path)[0]):
+                    os.remove(path)
+                    removed += 1
+            elif compressible(name) and os.path.getsize(path) >= MIN_SIZE:
+                written += compress_file(path)
+    logger.info(f"圧縮版: {directory} に {written} 個作成、{removed} 個削除")
+    return written
+
+
+def file_etag(path, stat):
+    """元のファイルの内容の SHA-256（mtime とサイズが変わるまで使い回す）"""
+    cached = _etags.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    etag = digest.hexdigest()[:32]
+    _etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+    return etag
+
+
+def choose_variant(path, stat, accept_encodings):
+    """Accept-Encoding で受け付けられる、元より新しい圧縮版。戻り値: (Content-Encoding, パス)（なければ (None, path)）"""
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] <= 0:
+            continue
+        try:
+            variant_stat = os.stat(path + suffix)
+        except OSError:
+            continue
+        if variant_stat.st_mtime_ns >= stat.st_mtime_ns:
+            return encoding, path + suffix
+    return None, path
+
+
+def is_immutable(filename, version):
+    """内容が変われば URL も変わるファイルか"""
+    return filename.startswith(tuple(d + '/' for d in IMMUTABLE_DIRS)) or bool(
+        version and VERSION_PATTERN.fullmatch(version))
+
+
+def serve_static(directory, filename):
+    """directory の filename を返す（圧縮版の選択・ETag・304・キャッシュ期間は上記）"""
+    path = safe_join(directory, filename)
+    if path is None or filename.endswith(VARIANT_SUFFIXES) or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    etag = file_etag(path, stat)
+    encoding, serve_path = choose_variant(path, stat, request.accept_encodings)
+    if encoding:
+        etag += '-' + encoding
+
+    immutable = is_immutable(filename, request.args.get('v'))
+    response = send_file(serve_path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         etag=etag, conditional=True, max_age=IMMUTABLE_MAX_AGE if immutable else None)
+    if immutable:
+        response.cache_control.immutable = True
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if compressible(filename):
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for directory in (OUTPUT_DIR, DATA_DIR):
+        precompress(directory)
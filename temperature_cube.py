@@ -0,0 +1,217 @@
+"""
+日次気温のメモリマップ キューブ（地点 × 日, float32）。
+
+python temperature_cube.py が temperature_data 全体を 1 回読んで書き出し、app.py は np.load(mmap_mode='r') で開く。
+gunicorn の各ワーカーは OS のページキャッシュを共有し、地点・期間の切り出しはコピーなしの NumPy ビューになる。
+書き出しは Render のビルドコマンドで行う（Web ワーカーでは書き出さない）。日次バッチ（GitHub Actions）が
+取り込み後に出力をコミットすると Render が再デプロイするので、キューブは毎晩の取り込みの後に作り直される
+（Actions の実行環境で作っても Render には届かない）。
+
+読み手は /api/gdd の補間計算（gdd_store.compute_gdd_many）だけ。マップ・アニメーションは日次気温ではなく
+累積GDDストア（gdd_cumulative）から読むので、キューブを使わない。
+
+float32 から DB の float64 と同じ値に戻すため、matrix は小数 VALUE_DECIMALS 桁に丸めて返す。
+NASA POWER の T2M は小数 2 桁なので丸めで元の値に戻り、/api/gdd の結果はキューブと DB のどちらから
+読んでも変わらない（それより細かい値は 1 日あたり最大 0.005℃ ずれる）。
+
+ディレクトリ構成（CUBE_DIR）:
+  versions/<版>/temps.npy   気温（地点 × 日, float32, 欠測は NaN）
+  versions/<版>/points.npy  地点の (lat, lon)（float64, 行の順）
+  versions/<版>/dates.npy   日付（datetime64[D], 列の順・連続）
+  CURRENT                   現在の版の名前
+版は一時ディレクトリに書いてから rename し、最後に CURRENT を os.replace で差し替える。
+読み手は CURRENT が変わったら新しい版を開き直し、参照を丸ごと差し替える（古い版を開いている
+処理はそのまま使い終えられる）。古い版は keep 個を残して削除する。
+
+環境変数:
+  TEMPERATURE_CUBE_DIR             保存先（既定 cache/temperature_cube）
+  TEMPERATURE_CUBE_RELOAD_SECONDS  読み手が新しい版を確認する間隔（既定 60）
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TEMPERATURE_CUBE_DIR = os.environ.get("TEMPERATURE_CUBE_DIR", os.path.join(BASE_DIR, 'cache', 'temperature_cube'))
+TEMPERATURE_CUBE_RELOAD_SECONDS = float(os.environ.get("TEMPERATURE_CUBE_RELOAD_SECONDS", "60"))
+
+# matrix が float32 の値を丸める小数の桁数（NASA POWER の T2M の桁数）
+VALUE_DECIMALS = 2
+
+
+class TemperatureCube:
+    """メモリマップで開いた 1 つの版"""
+
+    def __init__(self, path, version=None):
+        self.path = path
+        self.version = version or os.path.basename(path)
+        self.temps = np.load(os.path.join(path, 'temps.npy'), mmap_mode='r')
+        self.points = np.load(os.path.join(path, 'points.npy'))
+        self.dates = np.load(os.path.join(path, 'dates.npy'))
+        self.first_date = self.dates[0].item() if len(self.dates) else None
+        self.last_date = self.dates[-1].item() if len(self.dates) else None
+        self._index = {(float(lat), float(lon)): i for i, (lat, lon) in enumerate(self.points)}
+
+    def __len__(self):
+        return len(self.points)
+
+    def point_index(self, lat, lon):
+        """地点の行番号（キューブにない地点は None）"""
+        return self._index.get((float(lat), float(lon)))
+
+    def covers(self, start_date, end_date):
+        return self.first_date is not None and self.first_date <= start_date and end_date <= self.last_date
+
+    def _columns(self, start_date, end_date):
+        return (start_date - self.first_date).days, (end_date - self.first_date).days + 1
+
+    def series(self, lat, lon, start_date, end_date):
+        """1 地点の [start_date, end_date] の日次気温（コピーなしのビュー）。地点がなければ None"""
+        i = self.point_index(lat, lon)
+        if i is None:
+            return None
+        s, e = self._columns(start_date, end_date)
+        return self.temps[i, s:e]
+
+    def matrix(self, points, start_date, end_date):
+        """複数地点の 地点 × 日 の気温（float64 のコピー、キューブにない地点・日は NaN）。
+        Database.get_temperature_matrix_for_points と同じ形で、値は小数 VALUE_DECIMALS 桁に丸めて DB の値に揃える"""
+        n_days = (end_date - start_date).days + 1
+        matrix = np.full((len(points), max(n_days, 0)), np.nan)
+        if not len(points) or n_days <= 0 or self.first_date is None:
+            return matrix
+        rows = np.array([self._index.get((float(lat), float(lon)), -1) for lat, lon in points])
+        present = rows >= 0
+        s, e = self._columns(start_date, end_date)
+        cs, ce = max(s, 0), min(e, len(self.dates))
+        if present.any() and cs < ce:
+            matrix[present, cs - s:ce - s] = np.round(self.temps[rows[present], cs:ce].astype(np.float64),
+                                                      VALUE_DECIMALS)
+        return matrix
+
+
+def write_cube(points, first_date, temps, cube_dir=TEMPERATURE_CUBE_DIR, keep=2):
+    """地点 × 日 の気温配列を新しい版として書き出し、CURRENT を切り替える。戻り値: 版の名前"""
+    versions_dir = os.path.join(cube_dir, 'versions')
+    os.makedirs(versions_dir, exist_ok=True)
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    staging = tempfile.mkdtemp(dir=versions_dir, prefix='.tmp-')
+    try:
+        temps = np.asarray(temps, dtype=np.float32)
+        np.save(os.path.join(staging, 'temps.npy'), temps)
+        np.save(os.path.join(staging, 'points.npy'), np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        dates = np.datetime64(first_date, 'D') + np.arange(temps.shape[1])
+        np.save(os.path.join(staging, 'dates.npy'), dates)
+        os.rename(staging, os.path.join(versions_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    fd, tmp = tempfile.mkstemp(dir=cube_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(cube_dir, 'CURRENT'))
+
+    # 古い版を削除（開いている読み手のマップは unlink 後も有効）
+    old = sorted(v for v in os.listdir(versions_dir) if not v.startswith('.'))[:-keep]
+    for v in old:
+        shutil.rmtree(os.path.join(versions_dir, v), ignore_errors=True)
+    return version
+
+
+def build_cube(db, cube_dir=TEMPERATURE_CUBE_DIR, chunk_rows=50000):
+    """temperature_data 全体をサーバーサイドカーソル（Database.stream_columns）で 1 回読み、キューブの新しい版を書き出す。
+    戻り値: (版の名前, 読んだ行数)。データがなければ (None, 0)"""
+    started = time.perf_counter()
+    with db.connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute('SELECT MIN(date)::date, MAX(date)::date FROM temperature_data WHERE temperature > -900')
+            first_date, last_date = cur.fetchone()
+    if first_date is None:
+        return None, 0
+    chunks = []
+    for chunk in db.stream_columns('temperature_data', ('latitude', 'longitude', 'date', 'temperature'),
+                                   chunk_rows=chunk_rows):
+        days = (chunk['date'] - np.datetime64(first_date, 'D')).astype(np.float64)
+        chunks.append(np.column_stack([chunk['latitude'], chunk['longitude'], days, chunk['temperature']]))
+
+    data = np.concatenate(chunks)
+    points, point_i = np.unique(data[:, :2], axis=0, return_inverse=True)
+    temps = np.full((len(points), (last_date - first_date).days + 1), np.nan, dtype=np.float32)
+    temps[point_i.ravel(), data[:, 2].astype(int)] = data[:, 3]
+    version = write_cube(points, first_date, temps, cube_dir=cube_dir)
+    logger.info(f"Temperature cube {version}: {len(points)} points x {temps.shape[1]} days "
+                f"({first_date} ~ {last_date}), {len(data)} rows in {time.perf_counter() - started:.2f}s")
+    return version, len(data)
+
+
+def current_version(cube_dir=TEMPERATURE_CUBE_DIR):
+    try:
+        with open(os.path.join(cube_dir, 'CURRENT'), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def open_cube(cube_dir=TEMPERATURE_CUBE_DIR):
+    """現在の版を開く（まだ書き出されていなければ None）"""
+    version = current_version(cube_dir)
+    if version is None:
+        return None
+    return TemperatureCube(os.path.join(cube_dir, 'versions', version), version)
+
+
+_cube = None
+_cube_checked = None
+_cube_lock = threading.Lock()
+
+
+def get_cube(cube_dir=TEMPERATURE_CUBE_DIR, reload_seconds=TEMPERATURE_CUBE_RELOAD_SECONDS):
+    """プロセス共通のキューブ。reload_seconds ごとに CURRENT を確認し、版が変わっていれば開き直す。
+    開けなければ直前の版（なければ None）を返す"""
+    global _cube, _cube_checked
+    now = time.monotonic()
+    if _cube_checked is not None and now - _cube_checked < reload_seconds:
+        return _cube
+    with _cube_lock:
+        if _cube_checked is None or now - _cube_checked >= reload_seconds:
+            _cube_checked = now
+            version = current_version(cube_dir)
+            if version is not None and (_cube is None or _cube.version != version):
+                try:
+                    _cube = TemperatureCube(os.path.join(cube_dir, 'versions', version), version)
+                    logger.info(f"Temperature cube {version} opened ({len(_cube)} points, "
+                                f"{_cube.first_date} ~ {_cube.last_date})")
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Failed to open temperature cube {version}: {e}")
+    return _cube
+
+
+def main():
+    """python temperature_cube.py: DB から新しい版を書き出す（Render のビルドコマンドで実行する）。
+    DB に届かなければ警告だけで正常終了する（アプリは DB から読む）"""
+    from database import Database
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        version, rows = build_cube(Database())
+    except Exception as e:
+        logger.warning(f"Temperature cube was not built, /api/gdd will read from the database: {e}")
+        return
+    if version is None:
+        logger.warning("temperature_data is empty, temperature cube was not built")
+
+
+if __name__ == '__main__':
+    main()
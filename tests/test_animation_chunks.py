@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from animation_chunks import CHUNKS_DIR, frame_version, load_chunk, prune_chunks, write_chunk
+from animation_points import decode_point_temps
+
+
+class TestAnimationChunks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp.name
+        self.coords = [(35.0, 139.0), (43.0, 141.3)]
+        self.temps = np.array([[10.0, 25.5, np.nan], [0.0, 3.2, 8.1]])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, temps, year=2025):
+        return write_chunk(self.output_dir, year, ['2025-01-07', '2025-01-14', '2025-01-21'], self.coords, temps,
+                           vectors={'shibatuga': b'{"frames":[]}'},
+                           frame_versions={'shibatuga': [frame_version('a' * 64)] * 3})
+
+    def test_round_trip(self):
+        entry = self.write(self.temps)
+        self.assertEqual((entry["year"], entry["frames"]), (2025, 3))
+        chunk = load_chunk(self.output_dir, entry)
+        with open(os.path.join(self.output_dir, chunk["points"]["file"]), 'rb') as f:
+            coords, temps = decode_point_temps(f.read(), chunk["points"])
+        np.testing.assert_allclose(coords, self.coords, atol=1e-4)
+        np.testing.assert_allclose(temps, self.temps, atol=0.05)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, chunk["vectors"]["shibatuga"])))
+        self.assertEqual(chunk["frame_versions"]["shibatuga"][0], 'a' * 12)
+
+    def test_name_follows_content(self):
+        first = self.write(self.temps)
+        self.assertEqual(self.write(self.temps), first)
+        changed = self.temps.copy()
+        changed[1, 2] += 1
+        self.assertNotEqual(self.write(changed)["file"], first["file"])
+
+    def test_prune_keeps_referenced_files(self):
+        old = {"chunks": [self.write(self.temps + 2)]}
+        current = {"chunks": [self.write(self.temps + 1)]}
+        stale = {"chunks": [self.write(self.temps)]}
+        removed = prune_chunks(self.output_dir, current, old)
+        self.assertEqual(removed, 2)  # stale のチャンクと地点データ（ベクターは共有）
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, stale["chunks"][0]["file"])))
+        for manifest in (current, old):
+            self.assertTrue(os.path.exists(os.path.join(self.output_dir, manifest["chunks"][0]["file"])))
+        self.assertEqual(len(os.listdir(os.path.join(self.output_dir, CHUNKS_DIR))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+from animation_points import decode_point_temps, encode_point_temps, points_header
+
+
+class TestAnimationPoints(unittest.TestCase):
+    def test_round_trip(self):
+        """0.1 刻みに量子化され、年の切り替わり（値が 0 付近に戻る）や欠測も復元できる"""
+        coords = [(35.5, 139.25), (26.0, 127.75)]
+        temps = np.array([[10.04, 80.0, 3000.0, 12.5, 90.0],
+                          [np.nan, 20.0, np.nan, np.nan, 60.1]])
+        data = encode_point_temps(coords, temps, {0, 3})
+        self.assertEqual(len(data), 2 * 8 + 2 * 5 * 2)
+        decoded_coords, decoded = decode_point_temps(data, points_header(2, 5, {0, 3}))
+        np.testing.assert_array_equal(decoded_coords, coords)
+        np.testing.assert_allclose(decoded, [[10.0, 80.0, 3000.0, 12.5, 90.0],
+                                             [np.nan, 20.0, np.nan, np.nan, 60.1]], atol=1e-9)
+
+    def test_missing_weeks_do_not_break_deltas(self):
+        """欠測をはさんで値が大きく進んでも、直前の既知値からの差分なので収まる"""
+        temps = [[100.0] + [np.nan] * 8 + [3200.0]]
+        data = encode_point_temps([(35.0, 139.0)], temps, {0})
+        _, decoded = decode_point_temps(data, points_header(1, 10, {0}))
+        np.testing.assert_allclose(decoded, temps)
+
+    def test_delta_overflow(self):
+        with self.assertRaises(ValueError):
+            encode_point_temps([(35.0, 139.0)], [[0.0, 4000.0]], {0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import threading
+import psycopg2
+import psycopg2.extensions
+from database import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.fail_queries:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_queries = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+
+        def connect():
+            conn = FakeConnection()
+            self.created.append(conn)
+            return conn
+
+        self.pool = ConnectionPool(minconn=0, maxconn=2, timeout=0.2,
+                                   healthcheck_interval=0, connect=connect)
+
+    def test_reuses_connection_and_commits(self):
+        """返却した接続は再利用され、正常終了時に commit される"""
+        with self.pool.connection() as conn1:
+            pass
+        with self.pool.connection() as conn2:
+            pass
+        self.assertIs(conn1, conn2)
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(conn1.commits, 2)
+        self.assertEqual(self.pool.stats()['checkouts'], 2)
+
+    def test_nested_checkout_shares_thread_connection(self):
+        """同一スレッドの入れ子呼び出しは同じ接続を使う"""
+        with self.pool.connection() as outer:
+            with self.pool.connection() as inner:
+                self.assertIs(outer, inner)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+    def test_dedicated_checkout_is_not_shared(self):
+        """dedicated=True の接続は同じスレッドの他の呼び出しと共有せず、それぞれ commit される"""
+        with self.pool.connection(dedicated=True) as stream:
+            with self.pool.connection() as other:
+                self.assertIsNot(stream, other)
+                with self.pool.connection() as nested:
+                    self.assertIs(nested, other)
+            self.assertEqual(other.commits, 1)
+        self.assertEqual(stream.commits, 1)
+        self.assertEqual(self.pool.stats()['size'], 2)
+
+    def test_abandoned_generator_is_not_an_error(self):
+        """接続を借りたジェネレーターを途中で閉じても、エラーに数えずに接続を返す"""
+        def rows():
+            with self.pool.connection(dedicated=True):
+                yield 1
+                yield 2
+
+        stream = rows()
+        next(stream)
+        stream.close()
+        stats = self.pool.stats()
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_timeout_when_exhausted(self):
+        """上限まで貸し出し中なら待機後に PoolTimeout"""
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with self.pool.connection():
+                held.set()
+                release.wait(2)
+
+        workers = [threading.Thread(target=hold) for _ in range(2)]
+        for w in workers:
+            w.start()
+        while self.pool.stats()['in_use'] < 2:
+            held.wait(0.01)
+        with self.assertRaises(PoolTimeout):
+            with self.pool.connection():
+                pass
+        release.set()
+        for w in workers:
+            w.join()
+        stats = self.pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_broken_connection_is_recycled(self):
+        """OperationalError の後の接続は破棄され、次回は新しい接続になる"""
+        with self.assertRaises(psycopg2.OperationalError):
+            with self.pool.connection() as conn:
+                raise psycopg2.OperationalError("connection lost")
+        self.assertTrue(conn.closed)
+        with self.pool.connection() as conn2:
+            self.assertIsNot(conn, conn2)
+        stats = self.pool.stats()
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['discarded'], 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        """ヘルスチェックに失敗したアイドル接続は作り直す"""
+        with self.pool.connection() as conn:
+            pass
+        conn.fail_queries = True
+        with self.pool.connection() as conn2:
+            self.assertIsNot(conn, conn2)
+        self.assertEqual(self.pool.stats()['healthcheck_failures'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from contour_vectors import band_regions, encode_regions, regions_to_geojson, simplify_ring, vector_transform
+from frame_renderer import field_grid
+
+
+def decode_ring(ring, transform):
+    xy = np.cumsum(np.array(ring).reshape(-1, 2), axis=0)
+    return np.column_stack([transform["translate"][0] + xy[:, 0] * transform["scale"][0],
+                            transform["translate"][1] + xy[:, 1] * transform["scale"][1]])
+
+
+def ring_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+class TestContourVectors(unittest.TestCase):
+    def setUp(self):
+        self.bounds = (30.0, 40.0, 130.0, 140.0)
+        self.grid_lat, self.grid_lon = field_grid(self.bounds, 50)
+        # 中心 (35, 135) で最大の山形の場
+        self.field = 1000 - 100 * np.hypot(self.grid_lat - 35, self.grid_lon - 135)
+        self.levels = [0, 500, 800, 2000]
+        self.colors = ['#00FF00', '#FFFF00', '#FF0000']
+
+    def test_simplify_keeps_corners(self):
+        """直線上の点は間引かれ、角は残る"""
+        side = np.linspace(0, 1, 11)[:-1]
+        square = np.vstack([np.column_stack([side, 0 * side]), np.column_stack([1 + 0 * side, side]),
+                            np.column_stack([1 - side, 1 + 0 * side]), np.column_stack([0 * side, 1 - side]),
+                            [[0, 0]]])
+        simplified = simplify_ring(square, 0.01)
+        self.assertEqual(len(simplified), 5)
+        self.assertEqual(ring_area(simplified[:-1]), 1.0)
+
+    def test_regions_are_nested_and_round_trip(self):
+        """帯 0 は範囲全体、上の帯ほど狭い円。量子化・差分符号化しても形が保たれる"""
+        regions = band_regions(self.grid_lat, self.grid_lon, self.field, self.levels)
+        self.assertEqual([band for band, _ in regions], [0, 1, 2])
+        transform = vector_transform(self.bounds, 50)
+        frame = encode_regions(regions, transform)
+        areas = [ring_area(decode_ring(polygons[0][0], transform)) for _, polygons in frame]
+        self.assertAlmostEqual(areas[0], 100.0, places=6)
+        # 値 500 以上 → 半径 5 の円、800 以上 → 半径 2 の円（範囲で切れる分と間引きの誤差を許す）
+        self.assertAlmostEqual(areas[1], min(np.pi * 25, 100.0), delta=3.0)
+        self.assertAlmostEqual(areas[2], np.pi * 4, delta=0.5)
+        self.assertTrue(all(len(polygons[0][0]) < 200 for _, polygons in frame))
+
+    def test_out_of_range_values_fall_in_end_bands(self):
+        """閾値の範囲外の値も両端の帯に入る（contourf(extend='both') と同じ）"""
+        regions = band_regions(self.grid_lat, self.grid_lon, self.field + 5000, self.levels)
+        self.assertEqual([band for band, _ in regions], [0, 1, 2])
+        geojson = regions_to_geojson(regions, self.levels, self.colors)
+        self.assertEqual([f["properties"]["color"] for f in geojson["features"]], self.colors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from frame_renderer import FrameRenderer, field_digest, frame_key, load_manifest, render_raster_frame, save_manifest
+
+
+class TestFrameRenderer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.fields = rng.uniform(0, 400, (3, 20, 20))
+        self.bounds = np.array([[30.0, 40.0, 130.0, 140.0]] * 3)
+        self.levels, self.colors = [0, 100, 200, 300], ['#00FF00', '#FFFF00', '#FF0000']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def render(self, workers, name):
+        frames_dir = os.path.join(self.tmpdir, name)
+        os.makedirs(frames_dir)
+        with FrameRenderer(workers=workers, renderer='matplotlib') as renderer:
+            count = renderer.render(self.fields, self.bounds, [(self.levels, self.colors, frames_dir, [0, 2])])
+        self.assertEqual(count, 2)
+        return frames_dir
+
+    def test_parallel_output_matches_serial(self):
+        """プロセスプールで描いても直列と同じ PNG になる（スキップしたフレームは描かない）"""
+        serial = self.render(1, 'serial')
+        parallel = self.render(2, 'parallel')
+        self.assertEqual(sorted(os.listdir(parallel)), ['frame_000.png', 'frame_002.png'])
+        for name in os.listdir(serial):
+            with open(os.path.join(serial, name), 'rb') as a, open(os.path.join(parallel, name), 'rb') as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_frame_key_tracks_inputs(self):
+        """場・範囲・閾値・色のどれかが変わるとキーが変わる"""
+        digest = field_digest(self.fields[0], self.bounds[0])
+        key = frame_key(digest, self.levels, self.colors, 'raster')
+        self.assertEqual(key, frame_key(field_digest(self.fields[0].copy(), self.bounds[0]), self.levels, self.colors, 'raster'))
+        self.assertNotEqual(key, frame_key(field_digest(self.fields[1], self.bounds[0]), self.levels, self.colors, 'raster'))
+        self.assertNotEqual(key, frame_key(field_digest(self.fields[0], self.bounds[0] + 0.5), self.levels, self.colors, 'raster'))
+        self.assertNotEqual(key, frame_key(digest, [0, 100, 250, 300], self.colors, 'raster'))
+        self.assertNotEqual(key, frame_key(digest, self.levels, ['#00FF00', '#FFFF00', '#0000FF'], 'raster'))
+        self.assertNotEqual(key, frame_key(digest, self.levels, self.colors, 'matplotlib'))
+
+    def test_raster_frame_bands(self):
+        """帯ごとの色で塗られ、北が上・範囲外は両端の帯の色になる"""
+        field = np.tile(np.linspace(-50, 350, 20)[:, None], (1, 20))  # 南 -50 → 北 350
+        path = os.path.join(self.tmpdir, 'frame.png')
+        render_raster_frame(field, self.levels, self.colors, path, isolines=False)
+        image = np.array(Image.open(path).convert('RGBA'))
+        self.assertEqual(image.shape, (39, 39, 4))
+        np.testing.assert_array_equal(image[0, 0], [255, 0, 0, 178])    # 北端（200 以上）
+        np.testing.assert_array_equal(image[-1, 0], [0, 255, 0, 178])   # 南端（0 未満）
+        self.assertEqual(len(np.unique(image.reshape(-1, 4), axis=0)), 3)
+
+        render_raster_frame(field, self.levels, self.colors, path, isolines=True)
+        image = np.array(Image.open(path).convert('RGBA'))
+        lines = np.flatnonzero((image[:, 0] == [0, 0, 0, 255]).all(axis=1))
+        self.assertEqual(len(lines), 2)  # 100 と 200 の境目
+
+    def test_unknown_renderer(self):
+        with self.assertRaises(ValueError):
+            FrameRenderer(renderer='svg')
+
+    def test_manifest_round_trip(self):
+        self.assertEqual(load_manifest(self.tmpdir), {})
+        save_manifest(self.tmpdir, {'frame_000.png': 'abc'})
+        self.assertEqual(load_manifest(self.tmpdir), {'frame_000.png': 'abc'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from datetime import date, datetime, timedelta
+import numpy as np
+from gdd_store import gdd_from_series, interpolated_gdd_many, load_base_temps
+
+
+class TestGddStore(unittest.TestCase):
+    def test_base_temps_cover_pests_and_spray(self):
+        """pests.json の基準温度と薬剤用の 0℃ を重複なしで保持する"""
+        self.assertEqual(load_base_temps(), [-5.6, 0.0, 5.6, 10.0, 13.0])
+
+    def test_gdd_from_series(self):
+        dates = [datetime(2026, 4, d) for d in range(1, 6)]
+        temps = [12.0, 8.0, -999.0, 15.5, 20.0]
+        # 4/2～4/5: max(0, 8-10) + (欠測) + 5.5 + 10
+        self.assertEqual(gdd_from_series(dates, temps, date(2026, 4, 2), date(2026, 4, 5), 10), (15.5, 3))
+        self.assertEqual(gdd_from_series([], [], date(2026, 4, 1), date(2026, 4, 5)), (0.0, 0))
+
+    def test_interpolated_gdd_renormalizes_missing_points(self):
+        """欠測のある日は残りの地点の重みで平均する"""
+        points = [(35.0, 139.0), (36.0, 139.0)]
+        weights = ((35.0, 139.0, 0.25), (36.0, 139.0, 0.75))
+        temps = np.array([
+            [14.0, 20.0, np.nan],
+            [10.0, np.nan, np.nan],
+        ])
+        # 4/1: 0.25*14 + 0.75*10 = 11.0, 4/2: 20.0 のみ, 4/3: データなし
+        gdd, days = interpolated_gdd_many(temps, points, [weights], date(2026, 4, 1),
+                                          [date(2026, 4, 1)], date(2026, 4, 3), [10])
+        self.assertAlmostEqual(gdd[0], 11.0)
+        self.assertEqual(days[0], 2)
+
+    def test_batch_matches_single_site(self):
+        """バッチ計算の結果は 1 地点ずつ計算した結果とビット単位で一致する"""
+        rng = np.random.default_rng(0)
+        points = [(35.0, 139.0), (35.0, 140.0), (36.0, 139.0), (36.0, 140.0)]
+        temps = rng.uniform(-5, 30, size=(4, 400))
+        temps[rng.random(temps.shape) < 0.05] = np.nan
+        first = date(2025, 9, 1)
+        end = first + timedelta(days=399)
+        sites = [
+            (((35.0, 139.0, 1.0),), date(2026, 3, 1), 10.0),
+            (((35.0, 139.0, 0.1), (35.0, 140.0, 0.2), (36.0, 139.0, 0.3), (36.0, 140.0, 0.4)), first, 5.6),
+            (((36.0, 140.0, 0.5), (35.0, 140.0, 0.5)), date(2026, 6, 15), 0.0),
+        ]
+        gdds, days = interpolated_gdd_many(temps, points, [s[0] for s in sites], first,
+                                           [s[1] for s in sites], end, [s[2] for s in sites])
+        for (weights, start, base), gdd, n in zip(sites, gdds, days):
+            offset = (start - first).days
+            single = interpolated_gdd_many(temps[:, offset:], points, [weights], start, [start], end, [base])
+            self.assertEqual(gdd, single[0][0])
+            self.assertEqual(n, single[1][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+import numpy as np
+import generate_maps
+
+
+class FakeDatabase:
+    @contextmanager
+    def connection(self):
+        yield None
+
+
+class TestGenerateAllMaps(unittest.TestCase):
+    def setUp(self):
+        # Database.get_pests() が返す pests テーブルの行と同じ形
+        self.pests = [
+            {'id': 1, 'name': 'シバツトガ', 'threshold_temp': 10.0, 'description': '', 'created_at': datetime(2025, 1, 1)},
+            {'id': 2, 'name': 'スジキリヨトウ', 'threshold_temp': 11.0, 'description': '', 'created_at': datetime(2025, 1, 1)},
+        ]
+        self.points = [(35.0, 139.0), (43.0, 141.3)]
+
+    def test_uses_threshold_temp_of_db_rows(self):
+        values = {10.0: np.array([[120.0, np.nan]]), 11.0: np.array([[80.0, 40.0]])}
+        with mock.patch.object(generate_maps, 'sample_cumulative_gdd',
+                               return_value=(self.points, [None, None], values)) as sample, \
+                mock.patch.object(generate_maps, 'generate_pest_map') as render:
+            plotted = generate_maps.generate_all_maps(pests=self.pests, db=FakeDatabase())
+        self.assertEqual(sample.call_args[0][1], [10.0, 11.0])
+        self.assertEqual(plotted, 3)
+        self.assertEqual([call[0][0]['name'] for call in render.call_args_list], ['シバツトガ', 'スジキリヨトウ'])
+        np.testing.assert_array_equal(render.call_args_list[1][0][2], [80.0, 40.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import random
+from grid_index import GridIndex, distance_km
+
+
+class TestGridIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = GridIndex.from_csv()
+
+    def test_nearest_matches_brute_force(self):
+        """ランダムな座標で全探索と同じ最寄り地点を返す"""
+        rnd = random.Random(0)
+        for _ in range(200):
+            lat, lon = rnd.uniform(23, 47), rnd.uniform(121, 147)
+            expected = sorted(self.index.points, key=lambda p: distance_km(lat, lon, p[0], p[1]))[:3]
+            got = [(p[0], p[1]) for p in self.index.nearest(lat, lon, k=3)]
+            self.assertEqual(got, expected)
+
+    def test_snap(self):
+        self.assertEqual(self.index.snap(35.68, 139.76), (36.0, 140.0))
+        self.assertEqual(self.index.snap(24.0, 122.0), (24.0, 122.0))
+        # 太平洋のど真ん中はグリッドから遠いので None
+        self.assertIsNone(self.index.snap(30.0, 160.0))
+
+    def test_weights(self):
+        """四隅が揃えば双一次補間、グリッド上なら重み 1"""
+        self.assertEqual(self.index.weights(36.0, 140.0), ((36.0, 140.0, 1.0),))
+        weights = self.index.weights(35.25, 139.5)
+        self.assertEqual(len(weights), 4)
+        self.assertAlmostEqual(sum(w for _, _, w in weights), 1.0)
+        self.assertAlmostEqual(dict(((a, b), w) for a, b, w in weights)[(35.0, 139.0)], 0.375)
+        self.assertEqual(self.index.weights(30.0, 160.0), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from scipy.interpolate import griddata
+from grid_index import GridIndex
+from grid_interpolator import GridInterpolator, get_interpolator
+
+
+def griddata_linear_nearest(lat, lon, values, grid_lat, grid_lon):
+    grid = griddata((lat, lon), values, (grid_lat, grid_lon), method="linear")
+    nan_mask = np.isnan(grid)
+    grid[nan_mask] = griddata((lat, lon), values, (grid_lat, grid_lon), method="nearest")[nan_mask]
+    return grid
+
+
+class TestGridInterpolator(unittest.TestCase):
+    def setUp(self):
+        points = np.array(GridIndex.from_csv().points)
+        self.lat, self.lon = points[:, 0], points[:, 1]
+
+    def test_matches_griddata(self):
+        """griddata(linear) + nearest 穴埋めと同じ値になる"""
+        interpolator = GridInterpolator(self.lat, self.lon, resolution=80)
+        rng = np.random.default_rng(0)
+        for _ in range(3):
+            values = rng.uniform(0, 2000, len(self.lat))
+            expected = griddata_linear_nearest(self.lat, self.lon, values,
+                                               interpolator.grid_lat, interpolator.grid_lon)
+            np.testing.assert_allclose(interpolator(values), expected, atol=1e-9)
+
+    def test_degenerate_points_fall_back_to_nearest(self):
+        interpolator = GridInterpolator([35.0, 36.0], [139.0, 140.0], resolution=5)
+        grid = interpolator([1.0, 2.0])
+        self.assertEqual(grid[0, 0], 1.0)
+        self.assertEqual(grid[-1, -1], 2.0)
+
+    def test_cached_per_point_set(self):
+        first = get_interpolator(self.lat, self.lon, resolution=20)
+        self.assertIs(get_interpolator(self.lat.copy(), self.lon.copy(), resolution=20), first)
+        self.assertIsNot(get_interpolator(self.lat[:-1], self.lon[:-1], resolution=20), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,15 @@
+import unittest
+from bench_imports import BUDGETS, measure, targets
+
+
+class TestImportBudget(unittest.TestCase):
+    def test_no_heavy_packages_on_startup(self):
+        """Web ワーカー・パイプライン・描画プロセスの起動で pandas・matplotlib などを読み込まない
+        （時間の予算は環境で変わるので python bench_imports.py で確かめる）"""
+        for name, modules in targets().items():
+            _, _, loaded = measure(modules)
+            self.assertEqual([package for package in BUDGETS[name][1] if package in loaded], [], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+import psycopg2.errors
+from migrations import LATEST_VERSION, MIGRATIONS, ensure_schema
+
+
+class FakeCursor:
+    """schema_state の 1 行だけを覚えていて、実行した SQL を記録する"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self.conn.executed.append(sql)
+        if sql.startswith('SELECT version, pest_catalog FROM schema_state'):
+            if self.conn.state is None and not self.conn.state_table:
+                raise psycopg2.errors.UndefinedTable('relation "schema_state" does not exist')
+            self.row = self.conn.state
+        elif sql.startswith('CREATE TABLE IF NOT EXISTS schema_state'):
+            self.conn.state_table = True
+        elif sql.startswith('INSERT INTO schema_state'):
+            self.conn.state = {'version': params[0], 'pest_catalog': params[1]}
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeConnection:
+    def __init__(self):
+        self.state = None
+        self.state_table = False
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pests_file = os.path.join(self.tmp.name, 'pests.json')
+        self.write_pests(10.0)
+        self.conn = FakeConnection()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_pests(self, base_temp):
+        with open(self.pests_file, 'w', encoding='utf-8') as f:
+            json.dump({'pests': [{'name': 'シバツトガ', 'base_temp': base_temp, 'description': '芝の害虫'}]}, f)
+
+    def pest_upserts(self):
+        return [sql for sql in self.conn.executed if sql.startswith('INSERT INTO pests')]
+
+    def test_fresh_database_applies_everything_once(self):
+        applied = ensure_schema(self.conn, self.pests_file)
+        self.assertEqual(applied, [number for number, _, _ in MIGRATIONS] + ['pests'])
+        self.assertEqual(self.conn.state['version'], LATEST_VERSION)
+        self.assertEqual(len(self.pest_upserts()), 1)
+        self.assertTrue(any('pg_advisory_xact_lock' in sql for sql in self.conn.executed))
+
+        self.conn.executed = []
+        self.assertEqual(ensure_schema(self.conn, self.pests_file), [])
+        self.assertEqual(len(self.conn.executed), 1)  # 版とカタログのハッシュを読むだけ
+
+    def test_changed_catalog_only_syncs_pests(self):
+        ensure_schema(self.conn, self.pests_file)
+        self.write_pests(11.0)
+        self.conn.executed = []
+        self.assertEqual(ensure_schema(self.conn, self.pests_file), ['pests'])
+        self.assertEqual(len(self.pest_upserts()), 1)
+        self.assertFalse(any(sql.startswith('CREATE TABLE IF NOT EXISTS temperature_data')
+                             for sql in self.conn.executed))
+
+    def test_applies_only_pending_migrations(self):
+        ensure_schema(self.conn, self.pests_file)
+        self.conn.state['version'] = LATEST_VERSION - 1
+        self.assertEqual(ensure_schema(self.conn, self.pests_file), [LATEST_VERSION])
+        self.assertEqual(self.conn.state['version'], LATEST_VERSION)
+
+
+if __name__ == '__main__':
+    unittest.main()
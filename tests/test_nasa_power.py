@@ -0,0 +1,102 @@
+import unittest
+import time
+import requests
+from nasa_power import NasaPowerClient, TokenBucket, FetchStats
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.text = ''
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """あらかじめ用意した応答（または例外）を順に返す"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        item = self.responses.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+PAYLOAD = {'properties': {'parameter': {'T2M': {'20260101': 5.5, '20260102': -999.0}}}}
+
+
+class TestNasaPowerClient(unittest.TestCase):
+    def make_client(self, responses, **kwargs):
+        self.session = FakeSession(responses)
+        return NasaPowerClient(concurrency=2, rate=1000, burst=10, max_retries=2,
+                               backoff_base=0.001, session_factory=lambda: self.session, **kwargs)
+
+    def test_retries_on_429_and_timeout(self):
+        """429 とタイムアウトは再試行し、最終的に成功すれば DataFrame を返す"""
+        client = self.make_client([
+            FakeResponse(429, headers={'Retry-After': '0'}),
+            requests.exceptions.Timeout('read timeout'),
+            FakeResponse(200, PAYLOAD),
+        ])
+        stats = FetchStats()
+        df = client.fetch(35.0, 139.0, '20260101', '20260102', stats=stats)
+        self.assertEqual(list(df['temp']), [5.5, -999.0])
+        summary = stats.summary()
+        self.assertEqual(summary['requests'], 3)
+        self.assertEqual(summary['retries'], 2)
+        self.assertEqual(summary['successes'], 1)
+
+    def test_gives_up_after_max_retries(self):
+        """再試行回数を使い切ったら None"""
+        client = self.make_client([FakeResponse(503)] * 3)
+        self.assertIsNone(client.fetch(35.0, 139.0, '20260101', '20260102'))
+        self.assertEqual(self.session.calls, 3)
+        self.assertEqual(client.stats.failures, 1)
+
+    def test_404_is_not_retried(self):
+        client = self.make_client([FakeResponse(404)])
+        self.assertIsNone(client.fetch(35.0, 139.0, '20260101', '20260102'))
+        self.assertEqual(self.session.calls, 1)
+
+    def test_fetch_many_returns_every_point(self):
+        client = self.make_client([FakeResponse(200, PAYLOAD) for _ in range(4)])
+        points = [(24.0, 122.0), (25.0, 123.0), (26.0, 124.0), (27.0, 125.0)]
+        results = list(client.fetch_many(points, '20260101', '20260102'))
+        self.assertEqual(sorted((lat, lon) for lat, lon, _ in results), points)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_enforced_after_burst(self):
+        """バーストを使い切った後は rate 個/秒に制限される"""
+        bucket = TokenBucket(rate=50, capacity=2)
+        started = time.monotonic()
+        for _ in range(7):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+
+class TestFetchStats(unittest.TestCase):
+    def test_latencies_are_bounded(self):
+        """長く生きるクライアントでも応答時間は直近 latency_window 件だけを持つ"""
+        stats = FetchStats(latency_window=3)
+        for latency in (10.0, 1.0, 2.0, 3.0):
+            stats.record_request(latency, 200)
+        self.assertEqual(list(stats.latencies), [1.0, 2.0, 3.0])
+        self.assertEqual(stats.requests, 4)
+        self.assertEqual(stats.percentile(100), 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import tempfile
+import shutil
+import pandas as pd
+from datetime import date, datetime, timedelta
+from nasa_power_cache import PowerResponseCache, missing_ranges
+
+
+def make_fetch(calls, missing=()):
+    """要求された期間の各日に 日付の日 を気温として返す偽の取得関数"""
+    def fetch(lat, lon, start, end):
+        calls.append((start, end))
+        days = pd.date_range(start, end)
+        temps = [-999.0 if d.strftime('%Y%m%d') in missing else float(d.day) for d in days]
+        return pd.DataFrame({'date': days, 'temp': temps})
+    return fetch
+
+
+class TestPowerResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.now = datetime(2026, 6, 30, 12, 0).timestamp()
+        self.cache = PowerResponseCache(cache_dir=self.tmpdir, revise_days=7, ttl=3600,
+                                        gap_merge=0, clock=lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_only_uncovered_days_are_fetched(self):
+        """重なる期間の再要求では未取得の日だけを取りに行く"""
+        calls = []
+        fetch = make_fetch(calls)
+        self.cache.get(35.0, 139.0, '20260101', '20260110', fetch)
+        df = self.cache.get(35.0, 139.0, '20260105', '20260115', fetch)
+        self.assertEqual(calls, [('20260101', '20260110'), ('20260111', '20260115')])
+        self.assertEqual(len(df), 11)
+        self.assertEqual(df['temp'].iloc[0], 5.0)
+
+        self.cache.get(35.0, 139.0, '20260101', '20260115', fetch)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    def test_recent_days_expire_after_ttl(self):
+        """直近の暫定値は TTL 経過後に取り直す"""
+        calls = []
+        fetch = make_fetch(calls)
+        self.cache.get(35.0, 139.0, '20260601', '20260629', fetch)
+        self.now += 7200
+        self.cache.get(35.0, 139.0, '20260601', '20260629', fetch)
+        self.assertEqual(calls[-1], ('20260623', '20260629'))
+
+    def test_missing_values_are_negative_cached(self):
+        """欠測値は返さず、TTL の間は再取得しない"""
+        calls = []
+        fetch = make_fetch(calls, missing={'20260629'})
+        df = self.cache.get(35.0, 139.0, '20260620', '20260629', fetch)
+        self.assertEqual(len(df), 9)
+        self.cache.get(35.0, 139.0, '20260620', '20260629', fetch)
+        self.assertEqual(len(calls), 1)
+
+    def test_size_based_eviction(self):
+        """上限サイズを超えたら古い地点から削除する"""
+        cache = PowerResponseCache(cache_dir=self.tmpdir, max_bytes=1, clock=lambda: self.now)
+        fetch = make_fetch([])
+        cache.get(35.0, 139.0, '20260101', '20260110', fetch)
+        cache.get(36.0, 140.0, '20260101', '20260110', fetch)
+        self.assertEqual(cache.stats['evicted'], 1)
+
+
+class TestMissingRanges(unittest.TestCase):
+    def test_gaps_are_merged(self):
+        d = [date(2026, 1, 1) + timedelta(days=i) for i in (0, 1, 2, 5, 20)]
+        self.assertEqual(missing_ranges(d), [(d[0], d[2]), (d[3], d[3]), (d[4], d[4])])
+        self.assertEqual(missing_ranges(d, gap_merge=3), [(d[0], d[3]), (d[4], d[4])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pipeline import Pipeline, PipelineError, SharedResult, Stage
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.tmpdir, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_pipeline(self, stages, **kwargs):
+        return Pipeline(stages, state_file=self.state_file, **kwargs)
+
+    def test_values_flow_downstream(self):
+        """依存ステージの戻り値が下流に渡り、処理行数がサマリーに載る"""
+        pipeline = self.make_pipeline([
+            Stage('a', lambda inputs: ([1, 2, 3], 3)),
+            Stage('b', lambda inputs: (sum(inputs['a']), len(inputs['a'])), deps=['a']),
+        ])
+        summary = pipeline.run()
+        self.assertEqual([(s['stage'], s['status'], s['rows']) for s in summary['stages']],
+                         [('a', 'ok', 3), ('b', 'ok', 3)])
+
+    def test_independent_stages_run_in_parallel(self):
+        """互いに依存しないステージは同時に実行される"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def meet(inputs):
+            barrier.wait()
+            return None, 0
+
+        pipeline = self.make_pipeline([
+            Stage('root', lambda inputs: (None, 0)),
+            Stage('left', meet, deps=['root']),
+            Stage('right', meet, deps=['root']),
+        ], max_workers=2)
+        summary = pipeline.run()
+        self.assertTrue(all(s['status'] == 'ok' for s in summary['stages']))
+
+    def test_unchanged_fingerprint_skips_stage(self):
+        """入力が前回成功時と同じなら省き、上流の変化は下流に伝わる"""
+        calls = []
+        source = {'version': 1}
+
+        def stages():
+            return [
+                Stage('load', lambda inputs: (calls.append('load'), 1), fingerprint=lambda inputs: dict(source)),
+                Stage('render', lambda inputs: (calls.append('render'), 1), deps=['load'],
+                      fingerprint=lambda inputs: 'render-v1'),
+            ]
+
+        self.make_pipeline(stages()).run()
+        summary = self.make_pipeline(stages()).run()
+        self.assertEqual(calls, ['load', 'render'])
+        self.assertEqual([s['status'] for s in summary['stages']], ['skipped', 'skipped'])
+
+        source['version'] = 2
+        self.make_pipeline(stages()).run()
+        self.assertEqual(calls, ['load', 'render', 'load', 'render'])
+
+        self.make_pipeline(stages(), force=True).run()
+        self.assertEqual(len(calls), 6)
+
+    def test_missing_output_reruns_stage(self):
+        """フィンガープリントが同じでも出力ファイルがなければ実行する"""
+        output = os.path.join(self.tmpdir, 'out.txt')
+        calls = []
+
+        def render(inputs):
+            calls.append(1)
+            with open(output, 'w') as f:
+                f.write('x')
+            return None, 1
+
+        stage = lambda: [Stage('render', render, fingerprint=lambda inputs: 'same', outputs=[output])]
+        self.make_pipeline(stage()).run()
+        self.make_pipeline(stage()).run()
+        self.assertEqual(len(calls), 1)
+        os.remove(output)
+        self.make_pipeline(stage()).run()
+        self.assertEqual(len(calls), 2)
+
+    def test_failure_blocks_downstream_only(self):
+        """失敗したステージの下流は実行せず、無関係なステージは最後まで走る"""
+        def boom(inputs):
+            raise ValueError('boom')
+
+        ran = []
+        pipeline = self.make_pipeline([
+            Stage('root', lambda inputs: (None, 0)),
+            Stage('bad', boom, deps=['root'], fingerprint=lambda inputs: 'x'),
+            Stage('after_bad', lambda inputs: (ran.append('after_bad'), 0), deps=['bad']),
+            Stage('good', lambda inputs: (ran.append('good'), 0), deps=['root']),
+        ])
+        with self.assertRaises(PipelineError) as ctx:
+            pipeline.run()
+        self.assertEqual(ran, ['good'])
+        statuses = {s['stage']: s['status'] for s in ctx.exception.summary['stages']}
+        self.assertEqual(statuses, {'root': 'ok', 'bad': 'failed', 'after_bad': 'blocked', 'good': 'ok'})
+
+    def test_unknown_dependency_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make_pipeline([Stage('b', lambda inputs: (None, 0), deps=['a'])])
+
+
+class TestSharedResult(unittest.TestCase):
+    def test_computed_once_across_threads(self):
+        calls = []
+        shared = SharedResult(lambda: calls.append(1) or 'value')
+        threads = [threading.Thread(target=shared.get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(shared.get(), 'value')
+        self.assertEqual(len(calls), 1)
+
+
+class FakeDatabase:
+    def get_pests(self):
+        # pests テーブルの行と同じ形（基準温度は threshold_temp）
+        return [{'id': 1, 'name': 'シバツトガ', 'threshold_temp': 10.0, 'description': ''}]
+
+
+class TestBuildPipeline(unittest.TestCase):
+    def test_maps_fingerprint_reads_pest_rows(self):
+        from fetch_and_update import build_pipeline
+
+        pipeline = build_pipeline(FakeDatabase())
+        fingerprint = pipeline.stages['maps'].fingerprint({})
+        self.assertEqual(fingerprint['pests'], [('シバツトガ', 10.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import gzip
+import os
+import tempfile
+import unittest
+from flask import Flask
+from static_assets import precompress, serve_static
+
+
+class TestStaticAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, 'animation_chunks'))
+        self.body = ('{"dates": [' + ', '.join('"2025-01-07"' for _ in range(200)) + ']}').encode()
+        for name in ('animation_data.json', 'animation_chunks/2025-0123456789ab.json'):
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(self.body)
+        app = Flask(__name__)
+        app.add_url_rule('/output/<path:filename>', 'output', lambda filename: serve_static(self.root, filename))
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_serves_precompressed_variant(self):
+        precompress(self.root)
+        response = self.client.get('/output/animation_data.json', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), self.body)
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        plain = self.client.get('/output/animation_data.json')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.data, self.body)
+        self.assertNotEqual(plain.headers['ETag'], response.headers['ETag'])
+
+    def test_conditional_request(self):
+        etag = self.client.get('/output/animation_data.json').headers['ETag']
+        response = self.client.get('/output/animation_data.json', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+
+    def test_cache_control(self):
+        chunk = self.client.get('/output/animation_chunks/2025-0123456789ab.json')
+        self.assertIn('immutable', chunk.headers['Cache-Control'])
+        versioned = self.client.get('/output/animation_data.json?v=0123456789ab')
+        self.assertIn('immutable', versioned.headers['Cache-Control'])
+        timestamped = self.client.get('/output/animation_data.json?v=1760000000000')
+        self.assertNotIn('immutable', timestamped.headers['Cache-Control'])
+
+    def test_stale_and_orphan_variants(self):
+        precompress(self.root)
+        path = os.path.join(self.root, 'animation_data.json')
+        with open(path, 'wb') as f:
+            f.write(b'{}')
+        os.utime(path, ns=(os.stat(path).st_mtime_ns + 10 ** 9,) * 2)
+        response = self.client.get('/output/animation_data.json', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.data, b'{}')
+        os.remove(os.path.join(self.root, 'animation_chunks/2025-0123456789ab.json'))
+        precompress(self.root)
+        self.assertEqual(os.listdir(os.path.join(self.root, 'animation_chunks')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from contextlib import contextmanager
+from datetime import date
+import numpy as np
+from database import Database
+
+
+class FakeCursor:
+    """名前付きカーソルの代わり。fetchmany ごとに rows を size 行ずつ返す"""
+
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.conn.cursor_names.append(name)
+        self.rows = list(conn.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.queries.append((sql, params))
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.cursor_names = []
+
+    def cursor(self, name=None, cursor_factory=None):
+        return FakeCursor(self, name)
+
+
+class TestStreamColumns(unittest.TestCase):
+    def setUp(self):
+        self.conn = FakeConnection([(date(2025, 1, d), 10.0 + d) for d in range(1, 6)])
+        self.db = object.__new__(Database)
+
+        self.dedicated = []
+
+        @contextmanager
+        def connection(dedicated=False):
+            self.dedicated.append(dedicated)
+            yield self.conn
+        self.db.connection = connection
+
+    def test_yields_column_chunks(self):
+        chunks = list(self.db.stream_columns('temperature_data', ('date', 'temperature'), chunk_rows=2))
+        self.assertEqual([len(c['date']) for c in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0]['date'].dtype, np.dtype('datetime64[D]'))
+        np.testing.assert_array_equal(np.concatenate([c['temperature'] for c in chunks]), [11, 12, 13, 14, 15])
+        sql, params = self.conn.queries[0]
+        self.assertTrue(sql.startswith('SELECT t.date::date, t.temperature FROM temperature_data t'))
+        self.assertEqual(params, [])
+
+    def test_each_stream_has_its_own_connection_and_cursor(self):
+        """同時に開いたストリームは専用の接続を借り、カーソル名も重ならない"""
+        first = self.db.stream_columns('temperature_data', ('date',), chunk_rows=2)
+        second = self.db.stream_columns('temperature_data', ('date',), chunk_rows=2)
+        next(first)
+        next(second)
+        list(first)
+        list(second)
+        self.assertEqual(self.dedicated, [True, True])
+        self.assertEqual(len(set(self.conn.cursor_names)), 2)
+        self.assertTrue(all(name.startswith('stream_temperature_data_') for name in self.conn.cursor_names))
+
+    def test_filters_by_points_and_dates(self):
+        list(self.db.stream_columns('temperature_data', ('date', 'temperature'), start_date=date(2025, 1, 1),
+                                    end_date=date(2025, 1, 31), points=[(35.0, 139.0)]))
+        sql, params = self.conn.queries[0]
+        self.assertIn('unnest(', sql)
+        self.assertIn('t.date < %s::date + 1', sql)
+        self.assertEqual(params, [[35.0], [139.0], date(2025, 1, 1), date(2025, 1, 31)])
+
+    def test_rejects_unknown_columns(self):
+        with self.assertRaises(ValueError):
+            list(self.db.stream_columns('temperature_data', ('date', 'created_at; DROP TABLE pests')))
+
+
+if __name__ == '__main__':
+    unittest.main()
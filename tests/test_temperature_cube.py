@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+import numpy as np
+import temperature_cube
+from temperature_cube import open_cube, write_cube
+
+
+class TestTemperatureCube(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.points = [(35.0, 139.0), (36.0, 140.0)]
+        self.temps = np.array([[1.0, 2.0, np.nan, 4.0], [10.0, 11.0, 12.0, 13.0]])
+        write_cube(self.points, date(2026, 4, 1), self.temps, cube_dir=self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_series_is_zero_copy_view(self):
+        cube = open_cube(self.tmpdir)
+        series = cube.series(36.0, 140.0, date(2026, 4, 2), date(2026, 4, 3))
+        np.testing.assert_array_equal(series, [11.0, 12.0])
+        self.assertTrue(np.shares_memory(series, cube.temps))
+        self.assertEqual(cube.last_date, date(2026, 4, 4))
+        self.assertIsNone(cube.series(0.0, 0.0, date(2026, 4, 1), date(2026, 4, 1)))
+
+    def test_matrix_pads_unknown_points_and_days(self):
+        """キューブにない地点・期間外の日は NaN（DB の行列と同じ形）"""
+        cube = open_cube(self.tmpdir)
+        matrix = cube.matrix([(36.0, 140.0), (0.0, 0.0), (35.0, 139.0)], date(2026, 3, 31), date(2026, 4, 2))
+        self.assertEqual(matrix.shape, (3, 3))
+        np.testing.assert_array_equal(matrix[0], [np.nan, 10.0, 11.0])
+        self.assertTrue(np.isnan(matrix[1]).all())
+        np.testing.assert_array_equal(matrix[2], [np.nan, 1.0, 2.0])
+        self.assertTrue(cube.covers(date(2026, 4, 1), date(2026, 4, 4)))
+        self.assertFalse(cube.covers(date(2026, 4, 1), date(2026, 4, 5)))
+
+    def test_new_version_replaces_current(self):
+        """新しい版を書くと CURRENT が切り替わり、古い版は keep 個まで残る"""
+        first = open_cube(self.tmpdir)
+        write_cube(self.points, date(2026, 4, 1), self.temps + 1, cube_dir=self.tmpdir, keep=2)
+        write_cube(self.points, date(2026, 4, 1), self.temps + 2, cube_dir=self.tmpdir, keep=2)
+        latest = open_cube(self.tmpdir)
+        self.assertNotEqual(first.version, latest.version)
+        self.assertEqual(latest.series(35.0, 139.0, date(2026, 4, 1), date(2026, 4, 1))[0], 3.0)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir, 'versions'))), 2)
+
+    def test_get_cube_reloads_on_new_version(self):
+        temperature_cube._cube = None
+        temperature_cube._cube_checked = None
+        try:
+            cube = temperature_cube.get_cube(cube_dir=self.tmpdir, reload_seconds=0)
+            self.assertIs(temperature_cube.get_cube(cube_dir=self.tmpdir, reload_seconds=0), cube)
+            write_cube(self.points, date(2026, 4, 1), self.temps, cube_dir=self.tmpdir)
+            reloaded = temperature_cube.get_cube(cube_dir=self.tmpdir, reload_seconds=0)
+            self.assertNotEqual(reloaded.version, cube.version)
+        finally:
+            temperature_cube._cube = None
+            temperature_cube._cube_checked = None
+
+    def test_values_are_stored_as_float32(self):
+        cube = open_cube(self.tmpdir)
+        self.assertEqual(cube.temps.dtype, np.float32)
+
+    def test_matrix_rounds_back_to_database_values(self):
+        """小数 2 桁の気温（NASA POWER の T2M）は float32 から丸めると DB の float64 と同じ値になる"""
+        temps = np.array([[12.34, -3.07, 0.01, 25.99], [13.57, 18.62, -0.55, 33.33]])
+        write_cube(self.points, date(2026, 4, 1), temps, cube_dir=self.tmpdir)
+        cube = open_cube(self.tmpdir)
+        matrix = cube.matrix(self.points, date(2026, 4, 1), date(2026, 4, 4))
+        self.assertEqual(matrix.dtype, np.float64)
+        np.testing.assert_array_equal(matrix, temps)
+
+    def test_main_does_not_fail_without_database(self):
+        """ビルドで DB に届かなくてもデプロイを止めない（アプリは DB から読む）"""
+        with mock.patch('database.Database', side_effect=RuntimeError('no database')), \
+                mock.patch('logging.basicConfig'), self.assertLogs('temperature_cube', level='WARNING'):
+            temperature_cube.main()
+
+if __name__ == '__main__':
+    unittest.main()
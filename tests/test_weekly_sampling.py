@@ -0,0 +1,25 @@
+import unittest
+from datetime import date
+import numpy as np
+from generate_animation_data import get_weekly_accumulated_temps, remap_index
+
+
+class TestWeeklySampling(unittest.TestCase):
+    def test_keeps_points_with_early_data_as_arrays(self):
+        points = [(30.0, 130.0), (31.0, 129.0), (32.0, 128.5)]
+        first_dates = [date(2025, 1, 1), None, date(2025, 3, 1)]
+        values = {0.0: np.array([[1.0, np.nan, 2.0], [np.nan, np.nan, 3.0]])}
+        season = ([date(2025, 1, 7), date(2025, 1, 14)], (points, first_dates, values))
+        dates, coords, data = get_weekly_accumulated_temps(None, date(2025, 1, 1), date(2025, 1, 14), [0.0],
+                                                           season=season)
+        self.assertEqual(coords, [(30.0, 130.0)])
+        np.testing.assert_array_equal(data[0.0], [[1.0], [np.nan]])
+
+    def test_remap_index(self):
+        merged = [(30.0, 130.0), (30.0, 131.0), (31.0, 129.0)]
+        np.testing.assert_array_equal(remap_index([(30.0, 131.0), (31.0, 129.0)], merged), [1, 2])
+        self.assertEqual(len(remap_index([], merged)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()